@@ -0,0 +1,43 @@
+"""
+    This file is part of TraceConversionTool.
+    Copyright (c) 2022 Dennis Ziebart
+
+    TraceConversionTool is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    TraceConversionTool is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with TraceConversionTool.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import sys
+
+import pytest
+
+# The modules of the tool are flat files in the directory above the tests
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPOSITORY)
+
+import trace_conversion_tool_model as model  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def config():
+    """
+    Loads the config file of the repository for every test and restores it afterwards. The conversion cache and
+    the statistics memo are disabled, so every test computes its results
+    """
+    model.config.clear()
+    model.load_config(os.path.join(REPOSITORY, 'config.properties'))
+    model.config.set('cache', 'conversion_cache_size', '0')
+    model.config.set('statistics', 'memo_size', '0')
+    model.config.set('statistics', 'sidecar', 'false')
+    yield model.config
+    model.config.clear()
@@ -0,0 +1,59 @@
+"""
+    This file is part of TraceConversionTool.
+    Copyright (c) 2022 Dennis Ziebart
+
+    TraceConversionTool is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    TraceConversionTool is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with TraceConversionTool.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import numpy as np
+
+import trace_conversion_tool_model as model
+
+# Appending rows continues the statistics from the traceheader. With exact medians the stored values of a JSON
+# trace are parsed again, they must be read like load_trace reads them
+
+
+def write_raw_trace(filename, flags):
+    with open(filename, 'w') as raw:
+        raw.write('time,flag\n')
+        for row, flag in enumerate(flags):
+            raw.write(str(row) + ',' + ('true' if flag else 'false') + '\n')
+
+
+def test_append_to_json_trace_with_boolean_column(tmp_path):
+    model.config.set('statistics', 'median_strategy', 'exact')
+    stored_flags = [row % 3 != 0 for row in range(50)]
+    new_flags = [row % 2 == 1 for row in range(21)]
+    write_raw_trace(str(tmp_path / 'stored.csv'), stored_flags)
+    write_raw_trace(str(tmp_path / 'new.csv'), new_flags)
+    write_raw_trace(str(tmp_path / 'all.csv'), stored_flags + new_flags)
+    trace_filename = str(tmp_path / 'flags_sf.json')
+    model.convert_trace(str(tmp_path / 'stored.csv'), [1], ['flag'], 'flags', 'append test', 'user', [''], '',
+                        trace_filename)
+    with open(trace_filename) as trace_file:
+        assert 'true' in trace_file.read()
+
+    assert model.append_to_trace(trace_filename, str(tmp_path / 'new.csv'), [1], '.6f') == len(new_flags)
+
+    expected = model.convert_trace(str(tmp_path / 'all.csv'), [1], ['flag'], 'flags', 'append test', 'user', [''],
+                                   '', str(tmp_path / 'expected_sf.json')).trace
+    trace = model.load_trace(trace_filename)
+    np.testing.assert_array_equal(np.asarray(trace.tracebody.tracedata[0], dtype=float),
+                                  np.asarray(stored_flags + new_flags, dtype=float))
+    statistics = trace.traceheader.statistical_characteristics
+    expected_statistics = expected.traceheader.statistical_characteristics
+    for statistic in ('mean', 'median', 'variance'):
+        np.testing.assert_allclose(float(getattr(statistics, statistic)[0]),
+                                   float(getattr(expected_statistics, statistic)[0]), atol=1e-6)
+    assert model.hash_check(trace_filename).valid
@@ -0,0 +1,61 @@
+"""
+    This file is part of TraceConversionTool.
+    Copyright (c) 2022 Dennis Ziebart
+
+    TraceConversionTool is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    TraceConversionTool is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with TraceConversionTool.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+
+import numpy as np
+
+import trace_conversion_tool_model as model
+
+# The conversion cache is opt-in: the config file of the repository disables it, a size limit enables it
+
+
+def write_raw_trace(filename):
+    with open(filename, 'w') as raw:
+        raw.write('time,value\n')
+        for row in range(500):
+            raw.write(str(row) + ',' + repr(float(np.sin(row))) + '\n')
+
+
+def convert(raw_filename, result_filename):
+    return model.convert_trace(raw_filename, [1], ['value'], 'cached', 'cache test', 'user', [''], '',
+                               result_filename)
+
+
+def test_conversion_cache_is_disabled_by_default():
+    model.config.clear()
+    model.load_config(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'config.properties'))
+    assert model.conversion_cache_settings()[1] == 0
+    model.config.remove_option('cache', 'conversion_cache_size')
+    assert model.conversion_cache_settings()[1] == 0
+
+
+def test_enabled_conversion_cache_gives_the_same_trace(tmp_path):
+    model.config.set('cache', 'conversion_cache_dir', str(tmp_path / 'cache'))
+    model.config.set('cache', 'conversion_cache_size', '16')
+    raw_filename = str(tmp_path / 'raw.csv')
+    write_raw_trace(raw_filename)
+    first = convert(raw_filename, str(tmp_path / 'first_sf.json'))
+    second = convert(raw_filename, str(tmp_path / 'second_sf.json'))
+    assert len(os.listdir(str(tmp_path / 'cache'))) == 1
+    assert second.trace.traceheader.statistical_characteristics == \
+        first.trace.traceheader.statistical_characteristics
+    stored = model.load_trace(str(tmp_path / 'second_sf.json'))
+    np.testing.assert_array_equal(np.asarray(stored.tracebody.tracedata[0], dtype=float),
+                                  np.asarray(first.trace.tracebody.tracedata[0], dtype=float))
+    assert model.hash_check(str(tmp_path / 'second_sf.json')).valid
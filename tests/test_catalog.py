@@ -0,0 +1,52 @@
+"""
+    This file is part of TraceConversionTool.
+    Copyright (c) 2022 Dennis Ziebart
+
+    TraceConversionTool is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    TraceConversionTool is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with TraceConversionTool.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+
+import trace_conversion_tool_catalog as catalog
+import trace_conversion_tool_model as model
+
+# Updating the catalog must not fail if traces are deleted while it runs, for example by a batch conversion writing
+# into the same directory
+
+
+def convert(directory, name):
+    raw_filename = os.path.join(directory, name + '.csv')
+    with open(raw_filename, 'w') as raw:
+        raw.write('time,value\n')
+        for row in range(20):
+            raw.write(str(row) + ',' + str(row % 7) + '\n')
+    result_filename = os.path.join(directory, name + '_sf.json')
+    model.convert_trace(raw_filename, [1], ['value'], name, 'catalog test', 'user', [''], '', result_filename)
+    return result_filename
+
+
+def test_trace_deleted_after_listing_is_removed_from_the_catalog(tmp_path, monkeypatch):
+    directory = str(tmp_path)
+    filenames = [convert(directory, 'first'), convert(directory, 'second')]
+    connection = catalog.open_catalog(catalog.catalog_filename(directory))
+    try:
+        assert catalog.update_catalog(connection, directory).added == 2
+        # The second trace disappears between listing the directory and reading its size
+        os.remove(filenames[1])
+        monkeypatch.setattr(catalog, 'trace_files', lambda listed_directory: filenames)
+        result = catalog.update_catalog(connection, directory)
+        assert (result.added, result.updated, result.removed, result.unchanged) == (0, 0, 1, 1)
+        assert [entry.path for entry in catalog.catalog_entries(connection)] == [os.path.abspath(filenames[0])]
+    finally:
+        connection.close()
@@ -0,0 +1,52 @@
+"""
+    This file is part of TraceConversionTool.
+    Copyright (c) 2022 Dennis Ziebart
+
+    TraceConversionTool is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    TraceConversionTool is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with TraceConversionTool.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import pytest
+
+import trace_conversion_tool_cli as cli
+import trace_conversion_tool_model as model
+
+# The command line tool reads config.properties next to the script by default and stops before running any task if
+# the config file can't be read
+
+
+def write_raw_trace(filename):
+    with open(filename, 'w') as raw:
+        raw.write('time,value\n')
+        for row in range(20):
+            raw.write(str(row) + ',' + str(row * row) + '\n')
+
+
+def test_missing_config_file_stops_the_tool(tmp_path, capsys):
+    with pytest.raises(SystemExit) as stopped:
+        cli.main(['--config', str(tmp_path / 'missing.properties'), 'check-hash', str(tmp_path)])
+    assert stopped.value.code == 2
+    assert 'config file ' + str(tmp_path / 'missing.properties') + ' not found' in capsys.readouterr().err
+
+
+def test_default_config_file_is_found_from_any_directory(tmp_path, monkeypatch):
+    write_raw_trace(str(tmp_path / 'raw.csv'))
+    monkeypatch.chdir(tmp_path)
+    model.config.clear()
+    assert cli.main(['--workers', '1', 'convert', 'raw.csv', '--columns', '0;1', '--output-dir', str(tmp_path)]) == 0
+    assert model.hash_check(str(tmp_path / ('raw' + model.config.get('files', 'trace_file_suffix')))).valid
+
+
+def test_trace_file_suffixes_without_files_section():
+    model.config.remove_section('files')
+    assert cli.trace_file_suffixes() == ['_sf.json', '_sf.bin']
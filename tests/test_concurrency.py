@@ -0,0 +1,107 @@
+"""
+    This file is part of TraceConversionTool.
+    Copyright (c) 2022 Dennis Ziebart
+
+    TraceConversionTool is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    TraceConversionTool is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with TraceConversionTool.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import concurrent.futures
+import os
+
+import numpy as np
+
+import trace_conversion_tool_model as model
+
+# Stress test for conversions running in parallel threads, like the jobs of the GUI do. Every conversion builds its
+# own Trace, so the results must not depend on what the other threads convert at the same time
+
+TRACES = 32
+ROWS = 3000
+WORKERS = 6
+ROUNDS = 4
+
+
+def write_raw_trace(filename, seed):
+    """
+    Writes a raw CSV trace whose values differ for every seed, with NaN values and an integer column
+    :param filename: Result filename
+    :param seed: Seed of the random values
+    """
+    rng = np.random.default_rng(seed)
+    floats = rng.normal(seed, 1 + seed % 5, ROWS)
+    floats[rng.integers(0, ROWS, 10)] = np.nan
+    integers = rng.integers(-1000 * (seed + 1), 1000 * (seed + 1), ROWS)
+    with open(filename, 'w') as raw:
+        raw.write('time,value,count\n')
+        for row in range(ROWS):
+            raw.write(str(row) + ',' + ('' if np.isnan(floats[row]) else repr(float(floats[row]))) + ',' +
+                      str(integers[row]) + '\n')
+
+
+def convert(raw_filename, result_filename, seed):
+    """
+    :return: ConversionResult of the raw trace with a description that differs for every trace
+    """
+    return model.convert_trace(raw_filename, [1, 2], ['value', 'count'], 'trace ' + str(seed), 'stress test',
+                               'user ' + str(seed), ['information ' + str(seed)], '', result_filename,
+                               binary=seed % 2 == 1)
+
+
+def result_name(directory, seed):
+    return os.path.join(directory, 'trace' + str(seed) + ('_sf.bin' if seed % 2 else '_sf.json'))
+
+
+def assert_same_trace(filename, expected_filename):
+    """
+    Compares tracedata, statistics and descriptions of two traces and checks the hash value of the first one
+    """
+    trace = model.load_trace(filename)
+    expected = model.load_trace(expected_filename)
+    assert len(trace.tracebody.tracedata) == len(expected.tracebody.tracedata)
+    for column, expected_column in zip(trace.tracebody.tracedata, expected.tracebody.tracedata):
+        np.testing.assert_array_equal(np.asarray(column, dtype=float), np.asarray(expected_column, dtype=float))
+    assert trace.traceheader.statistical_characteristics == expected.traceheader.statistical_characteristics
+    assert trace.tracebody.tracedata_description == expected.tracebody.tracedata_description
+    metainformation = trace.traceheader.metainformation
+    expected_metainformation = expected.traceheader.metainformation
+    for field in ('original_name', 'description', 'source', 'user', 'additional_information'):
+        assert getattr(metainformation, field) == getattr(expected_metainformation, field)
+    assert model.hash_check(filename).valid
+
+
+def test_parallel_conversions_match_sequential_conversions(tmp_path):
+    raw_directory, sequential_directory = tmp_path / 'raw', tmp_path / 'sequential'
+    raw_directory.mkdir()
+    sequential_directory.mkdir()
+    raw_filenames = [str(raw_directory / ('raw' + str(seed) + '.csv')) for seed in range(TRACES)]
+    for seed, raw_filename in enumerate(raw_filenames):
+        write_raw_trace(raw_filename, seed)
+        convert(raw_filename, result_name(str(sequential_directory), seed), seed)
+
+    for round_number in range(ROUNDS):
+        parallel_directory = tmp_path / ('parallel' + str(round_number))
+        parallel_directory.mkdir()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=WORKERS) as executor:
+            # Every round submits the traces in another order
+            seeds = np.random.default_rng(round_number).permutation(TRACES).tolist()
+            futures = {executor.submit(convert, raw_filenames[seed], result_name(str(parallel_directory), seed),
+                                       seed): seed for seed in seeds}
+            for future in concurrent.futures.as_completed(futures):
+                seed = futures[future]
+                result = future.result()
+                assert result.filename == result_name(str(parallel_directory), seed)
+                assert result.statistics_computed
+                assert result.trace.traceheader.metainformation.description == 'trace ' + str(seed)
+        for seed in range(TRACES):
+            assert_same_trace(result_name(str(parallel_directory), seed), result_name(str(sequential_directory), seed))
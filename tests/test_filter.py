@@ -0,0 +1,45 @@
+"""
+    This file is part of TraceConversionTool.
+    Copyright (c) 2022 Dennis Ziebart
+
+    TraceConversionTool is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    TraceConversionTool is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with TraceConversionTool.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import pytest
+
+import trace_conversion_tool_model as model
+
+# Filter expressions follow the NaN and inf rules of NumPy, also where only constants are combined
+
+
+def statistics(mean):
+    return {"mean": [str(mean)], "median": ["1"], "skewness": ["0"], "kurtosis": ["3"], "autocorrelation": ["0.5"],
+            "variance": ["2"]}
+
+
+SELECTED_FILES = [statistics(-1e308), statistics(5), statistics(1e308)]
+SELECTED_FILENAMES = ['traces/low_sf.json', 'traces/middle_sf.json', 'traces/high_sf.json']
+
+
+@pytest.mark.parametrize('expression, expected', [
+    ('mean > 1/0', []),
+    ('mean < 1/0', ['traces/low_sf.json', 'traces/middle_sf.json', 'traces/high_sf.json']),
+    ('mean > 10**1000', []),
+    ('mean > -10**1000', ['traces/low_sf.json', 'traces/middle_sf.json', 'traces/high_sf.json']),
+    ('mean/0 > 1', ['traces/middle_sf.json', 'traces/high_sf.json']),
+    ('mean > 1 % 0', []),
+])
+def test_constant_arithmetic_gives_nan_and_inf(expression, expected):
+    results = model.filter_traces_by_expression(SELECTED_FILES, expression, SELECTED_FILENAMES)
+    assert [result[0] for result in results] == expected
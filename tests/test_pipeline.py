@@ -0,0 +1,60 @@
+"""
+    This file is part of TraceConversionTool.
+    Copyright (c) 2022 Dennis Ziebart
+
+    TraceConversionTool is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    TraceConversionTool is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with TraceConversionTool.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import pytest
+
+import trace_conversion_tool_model as model
+import trace_conversion_tool_pipeline as pipeline
+
+# Delimiters parsed line by line (regular expressions and fixed-width columns) read the file in chunks of
+# csv_chunk_size lines. Blank lines are skipped like the C engine does, also when a whole chunk consists of them
+
+ROWS = ['a;;b', '1;;2', '3;;4', '', '5;;6']
+FIXED_WIDTH_ROWS = ['a    b', '1    2', '3    4', '', '5    6']
+
+
+def write_lines(filename, lines):
+    with open(filename, 'w') as file:
+        file.write('\n'.join(lines) + '\n')
+
+
+def prepare(tmp_path, lines, delimiter):
+    """
+    :return: PreparationResult and the lines of the result file
+    """
+    write_lines(str(tmp_path / 'raw.txt'), lines)
+    result = pipeline.run_recipe([{"step": "convert_to_csv", "delimiter": delimiter, "keep_header": True}],
+                                 str(tmp_path / 'raw.txt'), str(tmp_path / 'result.csv'))
+    with open(str(tmp_path / 'result.csv')) as result_file:
+        return result, result_file.read().splitlines()
+
+
+@pytest.mark.parametrize('lines, delimiter', [(ROWS, ';;'), (FIXED_WIDTH_ROWS, 'fixed')])
+def test_chunks_of_blank_lines_are_skipped(tmp_path, lines, delimiter):
+    model.config.set('conversion', 'csv_chunk_size', '2')
+    # Blank chunks in the middle and at the end of the file
+    result, result_lines = prepare(tmp_path, lines[:3] + ['', '   '] + lines[3:] + ['', '', ' ', ''], delimiter)
+    assert result.rows == 3
+    assert result_lines == ['a,b', '1,2', '3,4', '5,6']
+
+
+@pytest.mark.parametrize('delimiter', [';;', 'fixed'])
+def test_file_with_only_blank_lines_is_empty(tmp_path, delimiter):
+    model.config.set('conversion', 'csv_chunk_size', '2')
+    with pytest.raises(model.InvalidDataError, match='No lines are left to prepare'):
+        prepare(tmp_path, ['', ' ', '', ''], delimiter)
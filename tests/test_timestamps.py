@@ -0,0 +1,42 @@
+"""
+    This file is part of TraceConversionTool.
+    Copyright (c) 2022 Dennis Ziebart
+
+    TraceConversionTool is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    TraceConversionTool is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with TraceConversionTool.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import pandas as pd
+
+import trace_conversion_tool_model as model
+import trace_conversion_tool_timestamp_benchmark as timestamp_benchmark
+
+# column_to_epoch must give the same unix timestamps as converting each cell on its own, for naive local formats,
+# formats with %z, ISO-8601 and unix timestamps, in local time and in UTC. Offsets are only applied in UTC
+
+
+def test_column_to_epoch_matches_per_cell_conversion():
+    for seed in range(3):
+        assert timestamp_benchmark.check_equivalence(rows=4000, seed=seed) > 0
+
+
+def test_offsets_are_only_applied_in_utc_mode():
+    previous = timestamp_benchmark.use_time_zone('UTC')
+    try:
+        column = pd.Series(['2024-01-01 12:00:00+0200', None], dtype=object)
+        for time_format in ('%Y-%m-%d %H:%M:%S%z', 'ISO8601'):
+            # Local mode reads the wall-clock time like date_time_to_epoch, UTC mode applies the offset
+            assert model.column_to_epoch(column, time_format)[0] == 1704110400.0
+            assert model.column_to_epoch(column, time_format, utc=True)[0] == 1704103200.0
+    finally:
+        timestamp_benchmark.use_time_zone(previous)
@@ -0,0 +1,199 @@
+"""
+    This file is part of TraceConversionTool.
+    Copyright (c) 2022 Dennis Ziebart
+
+    TraceConversionTool is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    TraceConversionTool is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with TraceConversionTool.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import json
+import struct
+
+import numpy as np
+
+import trace_conversion_tool_hashing as hashing
+
+# Binary container for traces in standard format. The file starts with a preamble (magic bytes, format version and
+# length of the header), followed by the header as tab-indented JSON. It holds the traceheader and the tracebody
+# with the tracedata description and, instead of the values, dtype, length and offset of every tracedata column.
+# The columns follow as little-endian arrays, each aligned to 64 bytes. Offsets are relative to the aligned end of
+# the header. The hash value covers the whole file except the hash value itself, the header records the algorithm.
+
+MAGIC = b'TRACEBIN'
+VERSION = 1
+# Magic bytes, version and header length
+PREAMBLE = struct.Struct('<8sII')
+ALIGNMENT = 64
+# Size of the blocks written at once
+HASH_CHUNK_SIZE = 1 << 20
+
+_HASH_FIELD = b'\n\t\t\t"hash value": "'
+
+
+def _aligned(size):
+    """
+    :param size: Number of bytes
+    :return: Next multiple of ALIGNMENT
+    """
+    return -(-size // ALIGNMENT) * ALIGNMENT
+
+
+def is_binary_trace(filename):
+    """
+    :param filename: Any file
+    :return: True if the file starts with the magic bytes of the binary container
+    """
+    try:
+        with open(filename, 'rb') as file:
+            return file.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def column_array(column):
+    """
+    :param column: List or NumPy array with numbers
+    :return: Column as little-endian NumPy array
+    """
+    values = np.asarray(column)
+    if values.dtype.kind not in 'biuf':
+        raise TypeError("Tracedata column does not contain numbers")
+    return values.astype(values.dtype.newbyteorder('<'), copy=False)
+
+
+def write_binary_trace(document, filename, appended=None, algorithm=hashing.DEFAULT_ALGORITHM):
+    """
+    Writes a trace into the binary container and stores its hash value in the same pass
+    :param document: Trace as dictionary with the keys of the standard format
+    :param filename: Result filename
+    :param appended: List with values appended to each tracedata column if given. The columns are written part by
+    part, so memory mapped columns are copied without being loaded. Integer columns become floats if the
+    appended values are floats
+    :param algorithm: Hash algorithm, see hashing.ALGORITHMS
+    """
+    hash_object = hashing.new_hash(algorithm)
+    placeholder = '0' * hash_object.digest_size * 2
+    columns = [[column_array(column)] for column in document["tracebody"]["tracedata"]]
+    if appended is not None:
+        if len(appended) != len(columns):
+            raise ValueError("Number of appended columns differs from the tracedata")
+        for parts, values in zip(columns, appended):
+            parts.append(column_array(values))
+    header = dict(document)
+    header["traceheader"] = dict(document["traceheader"])
+    header["traceheader"]["metainformation"] = dict(document["traceheader"]["metainformation"])
+    header["traceheader"]["metainformation"]["hash value"] = placeholder
+    header["traceheader"]["metainformation"]["hash algorithm"] = algorithm
+    header["tracebody"] = dict(document["tracebody"])
+    descriptors = []
+    offset = 0
+    for parts in columns:
+        dtype = np.result_type(*parts).newbyteorder('<')
+        length = sum(len(part) for part in parts)
+        descriptors.append({"dtype": dtype.str, "length": length, "offset": offset})
+        offset = _aligned(offset + length * dtype.itemsize)
+    header["tracebody"]["tracedata"] = descriptors
+    header_bytes = json.dumps(header, indent='\t').encode('UTF-8')
+    hash_start = PREAMBLE.size + header_bytes.index(_HASH_FIELD) + len(_HASH_FIELD)
+    preamble = PREAMBLE.pack(MAGIC, VERSION, len(header_bytes))
+    data_start = _aligned(PREAMBLE.size + len(header_bytes))
+    with open(filename, 'wb') as file:
+        def write(part):
+            hash_object.update(part)
+            file.write(part)
+
+        write(preamble)
+        # The placeholder of the hash value is the only part that is not hashed
+        header_start = hash_start - PREAMBLE.size
+        write(header_bytes[:header_start])
+        file.write(header_bytes[header_start:header_start + len(placeholder)])
+        write(header_bytes[header_start + len(placeholder):])
+        write(bytes(data_start - PREAMBLE.size - len(header_bytes)))
+        for parts, descriptor in zip(columns, descriptors):
+            write(bytes(descriptor["offset"] - (file.tell() - data_start)))
+            dtype = np.dtype(descriptor["dtype"])
+            values_per_chunk = max(HASH_CHUNK_SIZE // dtype.itemsize, 1)
+            for part in parts:
+                for start in range(0, len(part), values_per_chunk):
+                    write(part[start:start + values_per_chunk].astype(dtype, copy=False).tobytes())
+        file.seek(hash_start)
+        file.write(hash_object.hexdigest().encode('UTF-8'))
+
+
+def read_binary_header(filename):
+    """
+    Reads the preamble and the header of a binary trace without touching the tracedata
+    :param filename: Binary trace
+    :return: Header as dictionary, offset of the first column and byte range of the hash value
+    """
+    with open(filename, 'rb') as file:
+        preamble = file.read(PREAMBLE.size)
+        if len(preamble) != PREAMBLE.size:
+            raise ValueError("Not a binary trace")
+        magic, version, header_length = PREAMBLE.unpack(preamble)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a binary trace")
+        header_bytes = file.read(header_length)
+    header = json.loads(header_bytes)
+    hash_start = PREAMBLE.size + header_bytes.index(_HASH_FIELD) + len(_HASH_FIELD)
+    hash_range = (hash_start, hash_start + len(header["traceheader"]["metainformation"]["hash value"]))
+    return header, _aligned(PREAMBLE.size + header_length), hash_range
+
+
+def read_binary_trace(filename):
+    """
+    Reads a binary trace
+    :param filename: Binary trace
+    :return: Trace as dictionary with the keys of the standard format and the tracedata columns as NumPy arrays
+    """
+    document, data_start, hash_range = read_binary_header(filename)
+    columns = []
+    with open(filename, 'rb') as file:
+        for descriptor in document["tracebody"]["tracedata"]:
+            file.seek(data_start + descriptor["offset"])
+            columns.append(np.fromfile(file, dtype=np.dtype(descriptor["dtype"]), count=descriptor["length"]))
+    document["tracebody"]["tracedata"] = columns
+    return document
+
+
+def map_binary_trace(filename):
+    """
+    Maps a binary trace into memory. The tracedata columns are read-only views of the mapping, pages are only read
+    from disk when the values are accessed. The file must not be overwritten while the columns are in use
+    :param filename: Binary trace
+    :return: Trace as dictionary with the keys of the standard format and the tracedata columns as NumPy arrays
+    """
+    document, data_start, hash_range = read_binary_header(filename)
+    mapping = np.memmap(filename, dtype=np.uint8, mode='r')
+    columns = []
+    for descriptor in document["tracebody"]["tracedata"]:
+        dtype = np.dtype(descriptor["dtype"])
+        start = data_start + descriptor["offset"]
+        end = start + descriptor["length"] * dtype.itemsize
+        if end > len(mapping):
+            raise ValueError("Tracedata column exceeds the file")
+        columns.append(mapping[start:end].view(dtype))
+    document["tracebody"]["tracedata"] = columns
+    return document
+
+
+def hash_from_binary_trace(filename, progress=None):
+    """
+    Computes the hash value of a binary trace. All bytes except the stored hash value are hashed
+    :param filename: Binary trace
+    :param progress: Called with the fraction of bytes hashed
+    :return: Computed hash value
+    """
+    header, data_start, hash_range = read_binary_header(filename)
+    algorithm = header["traceheader"]["metainformation"].get("hash algorithm", hashing.DEFAULT_ALGORITHM)
+    return hashing.hash_file(filename, hash_range, algorithm, progress)
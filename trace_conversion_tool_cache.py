@@ -0,0 +1,285 @@
+"""
+    This file is part of TraceConversionTool.
+    Copyright (c) 2022 Dennis Ziebart
+
+    TraceConversionTool is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    TraceConversionTool is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with TraceConversionTool.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import collections
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+
+import trace_conversion_tool_hashing as hashing
+
+# The conversion cache keeps the results of converting a raw file on disk. An entry is a directory named after the
+# key, which is computed from the content of the raw file and every parameter that changes the results. It holds
+# the tracedata columns as .npy files, a JSON document with the statistics and, once the trace was saved as JSON,
+# the text of the tracedata. Entries are written into a temporary directory first and renamed, so processes
+# converting at the same time never see half an entry. Reading an entry updates its modification time, the
+# entries used least recently are removed when the cache grows beyond its size limit.
+# The cache is only an optimization: entries that can't be read or written are treated as missing.
+# The statistics memo keeps the statistics computed from the tracedata of the traces checked or restored last, by
+# a key computed from the bytes of the tracedata. Validating a trace again or restoring its traceheader afterwards
+# takes them from there. Optionally each entry is also stored in a sidecar file next to its trace
+
+# Changes whenever the layout of the entries changes, so older entries are not used
+CACHE_VERSION = 1
+
+# File of an entry with the JSON document
+ENTRY_DOCUMENT = 'entry.json'
+
+# File of an entry with the tracedata as written into JSON traces
+JSON_TRACEDATA = 'tracedata.json'
+
+# Statistics memo entries by key, the entry used least recently first
+_statistics_memo = collections.OrderedDict()
+
+# Jobs of the GUI use the statistics memo from several threads
+_statistics_memo_lock = threading.Lock()
+
+
+def content_key(filename, parameters, algorithm=hashing.DEFAULT_ALGORITHM):
+    """
+    :param filename: Raw file
+    :param parameters: Dictionary with every parameter that changes the results, values must be JSON serializable
+    :param algorithm: Hash algorithm for the content of the file, see hashing.ALGORITHMS
+    :return: Key of the entry as hexadecimal string, None if the file can't be read
+    """
+    try:
+        content = hashing.hash_file(filename, (0, 0), algorithm)
+    except OSError:
+        return None
+    return _key(content, dict(parameters, algorithm=algorithm))
+
+
+def statistics_key(tracedata_hash, parameters):
+    """
+    :param tracedata_hash: Hash value of the bytes of the tracedata in a trace
+    :param parameters: Dictionary with the layout of these bytes and the parameters of the statistics, values must
+    be JSON serializable
+    :return: Key of the statistics memo entry as hexadecimal string
+    """
+    return _key(tracedata_hash, parameters)
+
+
+def _key(content, parameters):
+    """
+    :param content: Hash value of the content
+    :param parameters: Dictionary with JSON serializable values
+    :return: Key as hexadecimal string
+    """
+    description = json.dumps({"version": CACHE_VERSION, "content": content, "parameters": parameters},
+                             sort_keys=True)
+    return hashlib.sha256(description.encode('UTF-8')).hexdigest()
+
+
+def _column_filename(entry, i):
+    """
+    :param entry: Directory of an entry
+    :param i: Index of a tracedata column
+    :return: Filename of the column
+    """
+    return os.path.join(entry, 'column_' + str(i) + '.npy')
+
+
+def load_entry(directory, key):
+    """
+    Reads an entry and marks it as used
+    :param directory: Cache directory
+    :param key: Result of content_key
+    :return: List with the tracedata columns as NumPy arrays and the document of the entry, None if there is no
+    valid entry
+    """
+    entry = os.path.join(directory, key)
+    try:
+        with open(os.path.join(entry, ENTRY_DOCUMENT)) as document_file:
+            document = json.load(document_file)
+        columns = [np.load(_column_filename(entry, i), allow_pickle=False) for i in range(document["columns"])]
+        os.utime(entry)
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    return columns, document
+
+
+def store_entry(directory, key, columns, document, size_limit):
+    """
+    Adds an entry, an existing entry with the same key is kept
+    :param directory: Cache directory, created if missing
+    :param key: Result of content_key
+    :param columns: Tracedata columns as NumPy arrays with numbers
+    :param document: Dictionary that can be stored as JSON
+    :param size_limit: Number of bytes all entries may take, see evict
+    :return: True if the entry is in the cache
+    """
+    if any(np.asarray(column).dtype.kind not in 'biuf' for column in columns) or \
+            sum(np.asarray(column).nbytes for column in columns) > size_limit:
+        return False
+    try:
+        os.makedirs(directory, exist_ok=True)
+        temporary = tempfile.mkdtemp(prefix='.' + key + '.', suffix='.tmp', dir=directory)
+    except OSError:
+        return False
+    try:
+        for i, column in enumerate(columns):
+            np.save(_column_filename(temporary, i), np.asarray(column), allow_pickle=False)
+        with open(os.path.join(temporary, ENTRY_DOCUMENT), 'w') as document_file:
+            json.dump(dict(document, columns=len(columns)), document_file)
+        os.rename(temporary, os.path.join(directory, key))
+    except OSError:
+        # Also if another process added the entry in the meantime
+        shutil.rmtree(temporary, ignore_errors=True)
+        return os.path.isdir(os.path.join(directory, key))
+    evict(directory, size_limit)
+    return True
+
+
+def entry_file(directory, key, name):
+    """
+    :param directory: Cache directory
+    :param key: Result of content_key
+    :param name: Name of a file of the entry, for example JSON_TRACEDATA
+    :return: Filename of the file, None if the entry doesn't have it
+    """
+    filename = os.path.join(directory, key, name)
+    return filename if os.path.isfile(filename) else None
+
+
+@contextlib.contextmanager
+def new_entry_file(directory, key, name, size_limit):
+    """
+    Adds a file to an existing entry. The file is written to a temporary file and only added if the with block
+    finishes without an error and the entry still exists
+    :param directory: Cache directory
+    :param key: Result of content_key
+    :param name: Name of the file in the entry
+    :param size_limit: Number of bytes all entries may take, see evict
+    :return: Context manager giving the temporary file opened for writing bytes
+    """
+    try:
+        descriptor, temporary_filename = tempfile.mkstemp(prefix='.' + name + '.', suffix='.tmp', dir=directory)
+    except OSError:
+        with open(os.devnull, 'wb') as file:
+            yield file
+        return
+    try:
+        with os.fdopen(descriptor, 'wb') as file:
+            yield file
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(temporary_filename)
+        raise
+    try:
+        os.replace(temporary_filename, os.path.join(directory, key, name))
+    except OSError:
+        # The entry was removed in the meantime
+        with contextlib.suppress(OSError):
+            os.remove(temporary_filename)
+        return
+    evict(directory, size_limit)
+
+
+def _entry_size(entry):
+    """
+    :param entry: Directory of an entry
+    :return: Number of bytes of its files
+    """
+    size = 0
+    for file in os.scandir(entry):
+        size += file.stat().st_size
+    return size
+
+
+def evict(directory, size_limit):
+    """
+    Removes the entries used least recently until all entries together take at most size_limit bytes
+    :param directory: Cache directory
+    :param size_limit: Number of bytes all entries may take
+    """
+    entries = []
+    try:
+        for entry in os.scandir(directory):
+            # Temporary files and directories start with a dot
+            if entry.is_dir() and not entry.name.startswith('.'):
+                entries.append((entry.stat().st_mtime_ns, _entry_size(entry.path), entry.path))
+    except OSError:
+        # Entries removed by another process while they were counted
+        return
+    total = sum(size for mtime_ns, size, path in entries)
+    for mtime_ns, size, path in sorted(entries):
+        if total <= size_limit:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+
+
+def memoized_statistics(key, memo_size, sidecar=None):
+    """
+    :param key: Result of statistics_key
+    :param memo_size: Number of entries kept in memory
+    :param sidecar: Sidecar file of the trace to look into if the memo has no entry, None to skip it
+    :return: Entry as dictionary, None if there is none for the key
+    """
+    with _statistics_memo_lock:
+        if key in _statistics_memo:
+            _statistics_memo.move_to_end(key)
+            return _statistics_memo[key]
+    if sidecar is None:
+        return None
+    try:
+        with open(sidecar) as sidecar_file:
+            entry = json.load(sidecar_file)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(entry, dict) or entry.get("key") != key:
+        # Written for other tracedata
+        return None
+    memoize_statistics(key, entry, memo_size)
+    return entry
+
+
+def memoize_statistics(key, entry, memo_size, sidecar=None):
+    """
+    Adds or replaces a statistics memo entry, the entries used least recently are dropped beyond memo_size
+    :param key: Result of statistics_key
+    :param entry: Dictionary that can be stored as JSON, it must not be changed afterwards
+    :param memo_size: Number of entries kept in memory
+    :param sidecar: Sidecar file the entry is written to as well, None to only keep it in memory
+    """
+    entry = dict(entry, key=key)
+    with _statistics_memo_lock:
+        _statistics_memo[key] = entry
+        _statistics_memo.move_to_end(key)
+        while len(_statistics_memo) > max(memo_size, 0):
+            _statistics_memo.popitem(last=False)
+    if sidecar is None:
+        return
+    directory, name = os.path.split(os.path.abspath(sidecar))
+    try:
+        descriptor, temporary_filename = tempfile.mkstemp(prefix='.' + name + '.', suffix='.tmp', dir=directory)
+    except OSError:
+        return
+    try:
+        with os.fdopen(descriptor, 'w') as sidecar_file:
+            json.dump(entry, sidecar_file)
+        os.replace(temporary_filename, sidecar)
+    except (OSError, ValueError):
+        with contextlib.suppress(OSError):
+            os.remove(temporary_filename)
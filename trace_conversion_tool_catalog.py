@@ -0,0 +1,205 @@
+"""
+    This file is part of TraceConversionTool.
+    Copyright (c) 2022 Dennis Ziebart
+
+    TraceConversionTool is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    TraceConversionTool is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with TraceConversionTool.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import dataclasses
+import glob
+import json
+import os
+import sqlite3
+
+import numpy as np
+
+import trace_conversion_tool_filter as tracefilter
+import trace_conversion_tool_model as model
+
+# The catalog is an SQLite database with one row per converted trace. It holds the traceheader of each trace
+# together with size and modification time of the file. Updating the catalog only reads the traceheader of new
+# or modified traces, so filtering many traces doesn't open any trace file
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS traces (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    hash_value TEXT NOT NULL,
+    original_name TEXT NOT NULL,
+    description TEXT NOT NULL,
+    source TEXT NOT NULL,
+    user TEXT NOT NULL,
+    additional_information TEXT NOT NULL,
+    creation_time TEXT NOT NULL,
+    statistical_characteristics TEXT NOT NULL
+)
+'''
+
+
+@dataclasses.dataclass(frozen=True)
+class CatalogUpdateResult:
+    """Result of update_catalog"""
+    added: int
+    updated: int
+    removed: int
+    unchanged: int
+    # Filenames and error messages of traces whose traceheader could not be read
+    failed: tuple
+
+
+@dataclasses.dataclass(frozen=True)
+class CatalogEntry:
+    """Traceheader of a trace as stored in the catalog"""
+    path: str
+    size: int
+    mtime_ns: int
+    traceheader: model.Traceheader
+
+
+def catalog_filename(directory):
+    """
+    :param directory: Directory with converted traces
+    :return: Filename of the catalog of the directory, see catalog_file in the config file
+    """
+    return os.path.join(directory, model.config.get('catalog', 'catalog_file', fallback='.trace_catalog.sqlite'))
+
+
+def open_catalog(filename):
+    """
+    Opens the catalog and creates it if it doesn't exist
+    :param filename: Catalog file
+    :return: sqlite3.Connection
+    """
+    connection = sqlite3.connect(filename)
+    connection.execute(_SCHEMA)
+    return connection
+
+
+def trace_files(directory):
+    """
+    :param directory: Directory with converted traces
+    :return: Sorted list with the JSON and binary traces of the directory
+    """
+    files = set()
+    for key, fallback in (('trace_file_suffix', '_sf.json'), ('binary_trace_file_suffix', '_sf.bin')):
+        files.update(glob.glob(os.path.join(directory, '*' + model.config.get('files', key, fallback=fallback))))
+    return sorted(files)
+
+
+def update_catalog(connection, directory):
+    """
+    Brings the catalog up to date with the traces of a directory. Only traces with changed size or modification
+    time are read, entries of deleted traces are removed
+    :param connection: Catalog opened with open_catalog
+    :param directory: Directory with converted traces
+    :return: CatalogUpdateResult
+    """
+    known = {path: (size, mtime_ns) for path, size, mtime_ns in
+             connection.execute('SELECT path, size, mtime_ns FROM traces')}
+    added = updated = unchanged = 0
+    failed = []
+    current = set()
+    with connection:
+        for filename in trace_files(directory):
+            path = os.path.abspath(filename)
+            try:
+                status = os.stat(path)
+            except OSError:
+                # Deleted or renamed since the directory was listed, for example by a running conversion. Its
+                # entry is removed like the ones of the other deleted traces
+                continue
+            current.add(path)
+            if known.get(path) == (status.st_size, status.st_mtime_ns):
+                unchanged += 1
+                continue
+            try:
+                traceheader = model.read_traceheader(path)
+            except model.TraceConversionError as error:
+                failed.append((filename, error.title + ": " + error.message))
+                connection.execute('DELETE FROM traces WHERE path = ?', (path,))
+                continue
+            metainformation = traceheader.metainformation
+            statistics = traceheader.to_dict()["statistical characteristics"]
+            # The sufficient statistics are only needed for appending rows, not for filtering
+            statistics.pop("sufficient statistics", None)
+            connection.execute('INSERT OR REPLACE INTO traces VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                               (path, status.st_size, status.st_mtime_ns, metainformation.hash_value,
+                                metainformation.original_name, metainformation.description, metainformation.source,
+                                metainformation.user, json.dumps(metainformation.additional_information),
+                                metainformation.creation_time, json.dumps(statistics)))
+            if path in known:
+                updated += 1
+            else:
+                added += 1
+        directory_path = os.path.abspath(directory)
+        removed = [path for path in known if path not in current and os.path.dirname(path) == directory_path]
+        connection.executemany('DELETE FROM traces WHERE path = ?', [(path,) for path in removed])
+    return CatalogUpdateResult(added, updated, len(removed), unchanged, tuple(failed))
+
+
+def catalog_entries(connection, directory=None):
+    """
+    :param connection: Catalog opened with open_catalog
+    :param directory: Only entries of traces in this directory are returned if given
+    :return: List of CatalogEntry sorted by path
+    """
+    entries = []
+    for row in connection.execute('SELECT * FROM traces ORDER BY path'):
+        (path, size, mtime_ns, hash_value, original_name, description, source, user, additional_information,
+         creation_time, statistical_characteristics) = row
+        if directory is not None and os.path.dirname(path) != os.path.abspath(directory):
+            continue
+        metainformation = model.Metainformation(original_name, description, source, user,
+                                                json.loads(additional_information), creation_time, hash_value)
+        statistics = model.StatisticalCharacteristics.from_dict(json.loads(statistical_characteristics))
+        entries.append(CatalogEntry(path, size, mtime_ns, model.Traceheader(metainformation, statistics)))
+    return entries
+
+
+def load_catalog(directory):
+    """
+    Updates the catalog of a directory and returns its entries
+    :param directory: Directory with converted traces
+    :return: List of CatalogEntry and CatalogUpdateResult
+    """
+    try:
+        connection = open_catalog(catalog_filename(directory))
+        try:
+            result = update_catalog(connection, directory)
+            return catalog_entries(connection, directory), result
+        finally:
+            connection.close()
+    except sqlite3.Error as error:
+        raise model.InvalidInputError("Catalog invalid", "The catalog of the directory could not be used: " +
+                                      str(error))
+
+
+def select_traces(directory, expression):
+    """
+    Selects traces of a directory by their statistics in the catalog, without opening the traces
+    :param directory: Directory with converted traces
+    :param expression: Filter expression, see model.filter_traces_by_expression
+    :return: Sorted list with the paths of the traces where the expression holds for at least one tracedata column
+    """
+    try:
+        mask = tracefilter.compile_expression(expression)
+    except (SyntaxError, ValueError):
+        raise model.InvalidInputError("Expression invalid", "Please enter a valid expression")
+    entries, _ = load_catalog(directory)
+    if not entries:
+        return []
+    table = model.statistics_table([entry.traceheader.to_dict()["statistical characteristics"]
+                                    for entry in entries])
+    return sorted({entries[i].path for i in table["trace"][np.flatnonzero(mask(table))]})
@@ -0,0 +1,567 @@
+"""
+    This file is part of TraceConversionTool.
+    Copyright (c) 2022 Dennis Ziebart
+
+    TraceConversionTool is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    TraceConversionTool is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with TraceConversionTool.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import argparse
+import concurrent.futures
+import csv
+import glob
+import json
+import os
+import sys
+import time
+
+import trace_conversion_tool_catalog as catalog
+import trace_conversion_tool_hashing as hashing
+import trace_conversion_tool_model as model
+import trace_conversion_tool_pipeline as pipeline
+
+# Config file used without --config, next to this script so the tool can run from any directory
+CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.properties")
+
+# Columns of the summary file
+SUMMARY_FIELDS = ["file", "status", "output", "seconds", "message", "bytes"]
+
+# Columns of the mismatch report of validate
+MISMATCH_FIELDS = ["file", "check", "column", "stored", "computed", "message"]
+
+
+def collect_files(paths, patterns, recursive=False):
+    """
+    Expands files, glob patterns and directories into a sorted list of files
+    :param paths: List of files, glob patterns or directories
+    :param patterns: List of patterns for the files taken from a directory, for example ["*.csv"]
+    :param recursive: If True the files are also taken from all subdirectories of a directory
+    :return: List of filenames without duplicates
+    """
+    files = set()
+    for path in paths:
+        if os.path.isdir(path):
+            for pattern in patterns:
+                if recursive:
+                    files.update(glob.glob(os.path.join(path, '**', pattern), recursive=True))
+                else:
+                    files.update(glob.glob(os.path.join(path, pattern)))
+        elif glob.has_magic(path):
+            files.update(match for match in glob.glob(path, recursive=True) if os.path.isfile(match))
+        else:
+            files.add(path)
+    return sorted(files)
+
+
+def select_files(files, expression):
+    """
+    Keeps the converted traces whose statistics match a filter expression, the statistics are taken from the
+    catalog of each directory
+    :param files: List of converted traces
+    :param expression: Filter expression, see model.filter_traces_by_expression
+    :return: List of the matching files, in the order of files
+    """
+    selected = set()
+    for directory in sorted({os.path.dirname(os.path.abspath(filename)) for filename in files}):
+        selected.update(catalog.select_traces(directory, expression))
+    return [filename for filename in files if os.path.abspath(filename) in selected]
+
+
+def output_filename(filename, output_dir, old_suffixes, new_suffix):
+    """
+    :param filename: Input file
+    :param output_dir: Directory of the result file
+    :param old_suffixes: List of suffixes of the input file, the first matching one is replaced
+    :param new_suffix: Suffix of the result file
+    :return: Filename of the result file
+    """
+    name = os.path.basename(filename)
+    for old_suffix in old_suffixes:
+        if name.endswith(old_suffix):
+            name = name[:-len(old_suffix)]
+            break
+    return os.path.join(output_dir, name + new_suffix)
+
+
+def trace_file_suffixes():
+    """
+    :return: Suffixes of JSON and binary converted traces from the config
+    """
+    return [model.config.get('files', 'trace_file_suffix', fallback='_sf.json'),
+            model.config.get('files', 'binary_trace_file_suffix', fallback='_sf.bin')]
+
+
+def prepare_task(filename, options):
+    """
+    Prepares a raw file with the steps of a recipe
+    :param filename: Raw file
+    :param options: Dictionary with the parsed command line arguments
+    :return: Filename of the prepared CSV file and a message
+    """
+    result_filename = output_filename(filename, options["output_dir"] or os.path.dirname(filename),
+                                      [os.path.splitext(filename)[1]], ".csv")
+    if os.path.exists(result_filename) and not options["overwrite"]:
+        return result_filename, "skipped"
+    result = pipeline.run_recipe(options["steps"], filename, result_filename)
+    return result_filename, "prepared " + str(result.rows) + " rows"
+
+
+def convert_task(filename, options):
+    """
+    Converts a raw trace to standard format
+    :param filename: Raw trace in CSV format
+    :param options: Dictionary with the parsed command line arguments
+    :return: Filename of the converted trace and a message
+    """
+    suffix = trace_file_suffixes()[1 if options["binary"] else 0]
+    result_filename = output_filename(filename, options["output_dir"], [".csv"], suffix)
+    if os.path.exists(result_filename) and not options["overwrite"]:
+        return result_filename, "skipped"
+    result = model.convert_trace(filename, options["columns"], options["tracedata_description"],
+                                 options["description"], options["source"], options["user"],
+                                 options["additional_information"], options["statistics_format"], result_filename,
+                                 options["binary"])
+    if not result.statistics_computed:
+        return result_filename, "converted without statistics, less than five elements per column"
+    return result_filename, "converted"
+
+
+def extract_task(filename, options):
+    """
+    Extracts the tracedata of a converted trace for ProFiDo
+    :param filename: Converted trace
+    :param options: Dictionary with the parsed command line arguments
+    :return: Filename of the tracedata file and a message
+    """
+    result_filename = model.tracedata_filename(filename, options["output_dir"])
+    # Like make, only traces that changed since their tracedata was extracted are extracted again
+    if not options["overwrite"] and model.tracedata_up_to_date(filename, result_filename):
+        return result_filename, "skipped"
+    model.extract_tracedata(filename, result_filename, options["float_format"])
+    return result_filename, "extracted"
+
+
+def convert_format_task(filename, options):
+    """
+    Converts a converted trace between JSON and the binary format
+    :param filename: Converted trace
+    :param options: Dictionary with the parsed command line arguments
+    :return: Filename of the trace in the other format and a message
+    """
+    binary = options["to"] == "binary"
+    result_filename = output_filename(filename, options["output_dir"] or os.path.dirname(filename),
+                                      trace_file_suffixes(), trace_file_suffixes()[1 if binary else 0])
+    if os.path.abspath(result_filename) == os.path.abspath(filename):
+        raise model.InvalidInputError("Same file", "Input and result file are identical")
+    if os.path.exists(result_filename) and not options["overwrite"]:
+        return result_filename, "skipped"
+    model.convert_trace_format(filename, result_filename, binary)
+    return result_filename, "converted to " + options["to"]
+
+
+def restore_task(filename, options):
+    """
+    Recomputes statistics and hash value of a converted trace
+    :param filename: Converted trace
+    :param options: Dictionary with the parsed command line arguments
+    :return: Filename of the trace and a message
+    """
+    model.restore_traceheader(filename, options["statistics_format"])
+    return filename, "restored"
+
+
+def append_task(filename, options):
+    """
+    Appends the rows of a raw trace to a converted trace and continues its statistics
+    :param filename: Converted trace
+    :param options: Dictionary with the parsed command line arguments
+    :return: Filename of the trace and a message
+    """
+    rows = model.append_to_trace(filename, options["data"], options["columns"], options["statistics_format"])
+    return filename, "appended " + str(rows) + " rows"
+
+
+def hash_task(filename, options):
+    """
+    Compares the stored with the computed hash value of a converted trace
+    :param filename: Converted trace
+    :param options: Dictionary with the parsed command line arguments
+    :return: Filename of the trace and a message
+    """
+    result = model.hash_check(filename)
+    if not result.valid:
+        raise model.InvalidTraceError("Hash value check failed", "Stored Hash value: " + result.stored_hash +
+                                      " Computed Hash value: " + result.computed_hash)
+    return filename, "hash value valid"
+
+
+def validate_task(filename, options):
+    """
+    Checks hash value and statistics of a converted trace, reading it once
+    :param filename: Converted trace
+    :param options: Dictionary with the parsed command line arguments
+    :return: Filename of the trace, a message and a list with one row of the mismatch report per invalid check
+    """
+    result = model.validate_trace(filename, options["tolerance"])
+    mismatches = []
+    if not result.hash_check.valid:
+        mismatches.append({"file": filename, "check": "hash value", "column": "",
+                           "stored": result.hash_check.stored_hash, "computed": result.hash_check.computed_hash,
+                           "message": ""})
+    for mismatch in result.statistics_check.mismatches:
+        mismatches.append({"file": filename, "check": mismatch.statistic, "column": mismatch.column,
+                           "stored": mismatch.stored, "computed": mismatch.computed, "message": ""})
+    if mismatches:
+        return filename, "invalid " + ", ".join(mismatch["check"] + ("" if mismatch["column"] == "" else
+                                                                   " [" + str(mismatch["column"]) + "]")
+                                                for mismatch in mismatches), mismatches
+    return filename, "valid", mismatches
+
+
+# Command names and the task run for each file
+TASKS = {
+    "prepare": prepare_task,
+    "convert": convert_task,
+    "extract": extract_task,
+    "convert-format": convert_format_task,
+    "restore": restore_task,
+    "append": append_task,
+    "check-hash": hash_task,
+    "validate": validate_task,
+}
+
+
+def run_task(command, filename, options):
+    """
+    Runs one task inside a worker process and catches every error, so one invalid file doesn't stop the batch
+    :param command: Key of TASKS
+    :param filename: Input file
+    :param options: Dictionary with the parsed command line arguments
+    :return: Row of the summary as dictionary
+    """
+    if not model.config.sections():
+        # Worker processes started with spawn don't inherit the settings of the main process
+        model.load_config(options["config"])
+    if options["workers"] > 1:
+        # The files are already processed in parallel, so each file computes its statistics in one process
+        if not model.config.has_section('statistics'):
+            model.config.add_section('statistics')
+        model.config.set('statistics', 'workers', '1')
+    for option in ("median_strategy", "median_error"):
+        if options.get(option) is not None:
+            if not model.config.has_section('statistics'):
+                model.config.add_section('statistics')
+            model.config.set('statistics', option, str(options[option]))
+    if options.get("hash_algorithm") is not None:
+        if not model.config.has_section('hashing'):
+            model.config.add_section('hashing')
+        model.config.set('hashing', 'algorithm', options["hash_algorithm"])
+    start = time.perf_counter()
+    row = {"file": filename, "status": "ok", "output": "", "message": "", "bytes": 0, "mismatches": []}
+    try:
+        row["output"], row["message"], *mismatches = TASKS[command](filename, options)
+        if mismatches and mismatches[0]:
+            row["status"] = "failed"
+            row["mismatches"] = mismatches[0]
+        if row["message"] == "skipped":
+            row["status"] = "skipped"
+        elif os.path.isfile(row["output"]):
+            row["bytes"] = os.path.getsize(row["output"])
+    except model.TraceConversionError as error:
+        row["status"] = "failed"
+        row["message"] = error.title + ": " + error.message
+    except Exception as error:
+        row["status"] = "failed"
+        row["message"] = type(error).__name__ + ": " + str(error)
+    row["seconds"] = format(time.perf_counter() - start, '.3f')
+    return row
+
+
+def run_batch(command, files, options, workers):
+    """
+    Runs a task for every file in a process pool and reports the progress on stderr
+    :param command: Key of TASKS
+    :param files: List of input files
+    :param options: Dictionary with the parsed command line arguments
+    :param workers: Number of worker processes
+    :return: List with one summary row per file, in the order of files
+    """
+    rows = {}
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(run_task, command, filename, options): filename for filename in files}
+        for future in concurrent.futures.as_completed(futures):
+            row = future.result()
+            rows[futures[future]] = row
+            if row["status"] == "ok":
+                details = " (" + format(row["bytes"] / 1e6, '.1f') + " MB in " + row["seconds"] + " s)"
+            elif row["status"] == "failed":
+                details = " (" + row["message"] + ")"
+            else:
+                details = ""
+            print("[" + str(len(rows)) + "/" + str(len(files)) + "] " + row["status"] + " " + row["file"] + details,
+                  file=sys.stderr)
+    return [rows[filename] for filename in files]
+
+
+def write_summary(rows, filename):
+    """
+    Writes the per-file results as CSV file
+    :param rows: Summary rows returned by run_batch
+    :param filename: Result filename
+    """
+    with open(filename, 'w', newline='') as summary_file:
+        writer = csv.DictWriter(summary_file, fieldnames=SUMMARY_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def write_mismatches(rows, filename):
+    """
+    Writes the failed checks of a batch, as JSON file if the filename ends with .json and as CSV file otherwise.
+    Files that couldn't be checked at all get one row with the check "trace" and the error message
+    :param rows: Summary rows returned by run_batch
+    :param filename: Result filename
+    """
+    mismatches = []
+    for row in rows:
+        if row["mismatches"]:
+            mismatches.extend(row["mismatches"])
+        elif row["status"] == "failed":
+            mismatches.append({"file": row["file"], "check": "trace", "column": "", "stored": "", "computed": "",
+                               "message": row["message"]})
+    if filename.lower().endswith(".json"):
+        with open(filename, 'w') as mismatch_file:
+            json.dump(mismatches, mismatch_file, indent=4)
+        return
+    with open(filename, 'w', newline='') as mismatch_file:
+        writer = csv.DictWriter(mismatch_file, fieldnames=MISMATCH_FIELDS)
+        writer.writeheader()
+        writer.writerows(mismatches)
+
+
+def batch_report(command, rows, seconds):
+    """
+    Aggregates the per-file results of a batch
+    :param command: Key of TASKS
+    :param rows: Summary rows returned by run_batch
+    :param seconds: Wall-clock time of the whole batch
+    :return: Dictionary with the number of files per status, the bytes written, the throughput and the failures
+    """
+    succeeded = [row for row in rows if row["status"] == "ok"]
+    written = sum(row["bytes"] for row in succeeded)
+    return {
+        "command": command,
+        "files": len(rows),
+        "succeeded": len(succeeded),
+        "skipped": sum(row["status"] == "skipped" for row in rows),
+        "failed": sum(row["status"] == "failed" for row in rows),
+        "seconds": round(seconds, 3),
+        "bytes": written,
+        "megabytes per second": round(written / 1e6 / seconds, 3) if seconds > 0 else 0.0,
+        "files per second": round(len(succeeded) / seconds, 3) if seconds > 0 else 0.0,
+        "failures": [{"file": row["file"], "message": row["message"]} for row in rows if row["status"] == "failed"],
+    }
+
+
+def write_report(report, filename):
+    """
+    Writes the aggregated results as JSON file
+    :param report: Result of batch_report
+    :param filename: Result filename
+    """
+    with open(filename, 'w') as report_file:
+        json.dump(report, report_file, indent=4)
+
+
+def add_median_arguments(parser):
+    """
+    Adds the options choosing how medians are computed
+    :param parser: Parser of a command that computes statistics
+    """
+    parser.add_argument("--median-strategy", choices=["exact", "approximate"],
+                        help="exact median or an estimate in bounded memory (default: median_strategy of the config)")
+    parser.add_argument("--median-error", type=float,
+                        help="rank error of approximate medians, for example 0.01 (default: median_error of the "
+                             "config)")
+
+
+def add_hash_argument(parser):
+    """
+    Adds the option choosing the hash algorithm
+    :param parser: Parser of a command that writes traces
+    """
+    parser.add_argument("--hash-algorithm", choices=list(hashing.ALGORITHMS),
+                        help="algorithm of the hash values, blake3 and xxh3_128 need their packages (default: "
+                             "algorithm of the config)")
+
+
+def parse_arguments(arguments):
+    """
+    :param arguments: Command line arguments without the program name
+    :return: argparse.Namespace
+    """
+    config_parser = argparse.ArgumentParser(add_help=False)
+    config_parser.add_argument("--config", default=CONFIG_FILE,
+                               help="config file with directories, suffixes and defaults (default: config.properties "
+                                    "next to this script)")
+    config_file = config_parser.parse_known_args(arguments)[0].config
+    try:
+        model.load_config(config_file)
+    except model.InvalidInputError:
+        # Without the settings every task would fail on its own
+        config_parser.error("config file " + config_file + " not found")
+    parser = argparse.ArgumentParser(description="Converts, extracts, restores and checks traces without the GUI",
+                                     parents=[config_parser])
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="number of worker processes (default: number of CPUs)")
+    parser.add_argument("--summary", help="CSV file the per-file results are written to")
+    parser.add_argument("--report", help="JSON file the number of succeeded, skipped and failed files, the "
+                                         "throughput and the failures are written to")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    prepare = commands.add_parser("prepare", help="prepare raw files with the steps of a recipe in one pass")
+    prepare.add_argument("paths", nargs="+", help="raw files, glob patterns or directories")
+    prepare.add_argument("--recipe", required=True, help="recipe file saved in the Prepare File tab")
+    prepare.add_argument("--pattern", default="*.csv",
+                         help="pattern of the files taken from a directory (default: %(default)s)")
+    prepare.add_argument("--output-dir", default="",
+                         help="directory of the prepared CSV files (default: directory of each file)")
+    prepare.add_argument("--overwrite", action="store_true",
+                         help="overwrite existing CSV files, including the raw file if it is a CSV file")
+
+    convert = commands.add_parser("convert", help="convert raw CSV traces to standard format")
+    convert.add_argument("paths", nargs="+", help="CSV files, glob patterns or directories")
+    convert.add_argument("--columns", required=True, help="column indexes with tracedata separated by semicolon")
+    convert.add_argument("--tracedata-description", default="",
+                         help="description of each tracedata column separated by semicolon")
+    convert.add_argument("--description", default="", help="description of the traces")
+    convert.add_argument("--source", default="", help="source of the traces")
+    convert.add_argument("--user", default=model.config.get('entries', 'default_username_entry_ctt', fallback=""),
+                         help="your id or name")
+    convert.add_argument("--additional-information", default="",
+                         help="additional information, entries separated by semicolon")
+    convert.add_argument("--statistics-format", default="", help="format string for statistical characteristics")
+    convert.add_argument("--output-dir", default=model.config.get('directories', 'converted_traces_dir', fallback=""),
+                         help="directory of the converted traces (default: converted_traces_dir of the config)")
+    convert.add_argument("--binary", action="store_true", help="save the traces in the binary format instead of JSON")
+    add_median_arguments(convert)
+    add_hash_argument(convert)
+    convert.add_argument("--overwrite", action="store_true", help="overwrite existing converted traces")
+
+    extract = commands.add_parser("extract", help="extract tracedata of converted traces for ProFiDo")
+    extract.add_argument("paths", nargs="+", help="converted traces, glob patterns or directories")
+    extract.add_argument("--float-format",
+                         default=model.config.get('entries', 'default_float_format_entry_ett', fallback=""),
+                         help="format string for float numbers")
+    extract.add_argument("--output-dir", default=model.config.get('directories', 'tracedata_dir', fallback=""),
+                         help="directory of the tracedata files (default: tracedata_dir of the config)")
+    extract.add_argument("--where",
+                         help="only extract traces whose statistics match this filter expression, for example "
+                              "\"mean > 10 and variance < 5\". The statistics are taken from the catalog")
+    extract.add_argument("--overwrite", action="store_true",
+                         help="extract all traces, by default traces whose tracedata file is newer are skipped")
+
+    convert_format = commands.add_parser("convert-format", help="convert traces between JSON and the binary format")
+    convert_format.add_argument("paths", nargs="+", help="converted traces, glob patterns or directories")
+    convert_format.add_argument("--to", required=True, choices=["binary", "json"], help="format of the results")
+    convert_format.add_argument("--output-dir", default="",
+                                help="directory of the results (default: directory of each trace)")
+    add_hash_argument(convert_format)
+    convert_format.add_argument("--overwrite", action="store_true", help="overwrite existing results")
+
+    restore = commands.add_parser("restore", help="recompute statistics and hash value of converted traces")
+    restore.add_argument("paths", nargs="+", help="converted traces, glob patterns or directories")
+    restore.add_argument("--statistics-format", default="", help="format string for statistical characteristics")
+    add_median_arguments(restore)
+    add_hash_argument(restore)
+
+    append = commands.add_parser("append", help="append the rows of a raw CSV trace to converted traces, the "
+                                                "statistics are continued without reading all rows again")
+    append.add_argument("paths", nargs="+", help="converted traces, glob patterns or directories")
+    append.add_argument("--data", required=True, help="CSV file with the new rows")
+    append.add_argument("--columns", required=True,
+                        help="column indexes with tracedata separated by semicolon, one per tracedata column")
+    append.add_argument("--statistics-format", default="", help="format string for statistical characteristics")
+    add_hash_argument(append)
+
+    check_hash = commands.add_parser("check-hash", help="compare stored and computed hash values")
+    check_hash.add_argument("paths", nargs="+", help="converted traces, glob patterns or directories")
+
+    validate = commands.add_parser("validate", help="check hash values and statistics of converted traces, each "
+                                                    "trace is read once")
+    validate.add_argument("paths", nargs="*",
+                          default=[model.config.get('directories', 'converted_traces_dir', fallback="")],
+                          help="converted traces, glob patterns or directories, searched with all their "
+                               "subdirectories (default: converted traces directory of the config file)")
+    validate.add_argument("--tolerance", default="0.0001", help="relative tolerance for the statistics")
+    validate.add_argument("--mismatches",
+                          help="file the failed checks are written to, JSON if it ends with .json, otherwise CSV")
+    return parser.parse_args(arguments)
+
+
+def main(arguments=None):
+    """
+    Entry point of the command line tool
+    :param arguments: Command line arguments without the program name, sys.argv is used if None
+    :return: Exit code. 1 if any file failed
+    """
+    arguments = parse_arguments(sys.argv[1:] if arguments is None else arguments)
+    options = dict(vars(arguments))
+    if arguments.command in ("convert", "append"):
+        try:
+            options["columns"] = list(map(int, arguments.columns.split(";")))
+        except ValueError:
+            print("Column indexes need to be integers separated by a semicolon [;]", file=sys.stderr)
+            return 2
+    if arguments.command == "convert":
+        options["tracedata_description"] = arguments.tracedata_description.split(";")
+        options["additional_information"] = arguments.additional_information.split(";")
+        files = collect_files(arguments.paths, ["*.csv"])
+    elif arguments.command == "prepare":
+        try:
+            options["steps"] = pipeline.load_recipe(arguments.recipe)
+        except model.TraceConversionError as error:
+            print(error.title + ": " + error.message, file=sys.stderr)
+            return 2
+        files = collect_files(arguments.paths, [arguments.pattern])
+    else:
+        if not any(arguments.paths):
+            print("No converted traces given and no converted traces directory configured", file=sys.stderr)
+            return 2
+        files = collect_files(arguments.paths, ["*" + suffix for suffix in trace_file_suffixes()],
+                              arguments.command == "validate")
+    if getattr(arguments, "where", None):
+        try:
+            files = select_files(files, arguments.where)
+        except model.TraceConversionError as error:
+            print(error.title + ": " + error.message, file=sys.stderr)
+            return 2
+    start = time.perf_counter()
+    rows = run_batch(arguments.command, files, options, max(arguments.workers, 1))
+    report = batch_report(arguments.command, rows, time.perf_counter() - start)
+    if arguments.summary:
+        write_summary(rows, arguments.summary)
+    if arguments.report:
+        write_report(report, arguments.report)
+    if getattr(arguments, "mismatches", None):
+        write_mismatches(rows, arguments.mismatches)
+    print(str(report["succeeded"]) + " succeeded, " + str(report["skipped"]) + " skipped, " + str(report["failed"]) +
+          " failed, " + format(report["bytes"] / 1e6, '.1f') + " MB " +
+          ("checked" if arguments.command in ("check-hash", "validate") else "written") + " in " +
+          format(report["seconds"], '.1f') + " s (" + format(report["megabytes per second"], '.1f') + " MB/s)",
+          file=sys.stderr)
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+"""
+    This file is part of TraceConversionTool.
+    Copyright (c) 2022 Dennis Ziebart
+
+    TraceConversionTool is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    TraceConversionTool is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with TraceConversionTool.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import ast
+import operator
+
+import numpy as np
+
+import trace_conversion_tool_statistics as stats
+
+# Filter expressions are parsed once into a function over NumPy arrays with one entry per tracedata column of all
+# selected traces. Only the names of the statistical characteristics, numbers, arithmetic, comparisons, boolean
+# operators and the functions in _FUNCTIONS are allowed, everything else is rejected before evaluation
+
+_BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+}
+
+_COMPARISONS = {
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+}
+
+# min and max keep the first argument unless the second one is smaller or larger, like in Python with NaN values
+_FUNCTIONS = {
+    "abs": np.abs,
+    "min": lambda first, second: np.where(second < first, second, first),
+    "max": lambda first, second: np.where(second > first, second, first),
+}
+
+
+def _truth(values):
+    """
+    :param values: NumPy array or number
+    :return: Boolean NumPy array, True where values is not zero like bool() in Python
+    """
+    return np.asarray(values) != 0
+
+
+def _compile(node):
+    """
+    Translates an AST node into a function of the column table
+    :param node: ast.AST
+    :return: Function taking a dictionary with the statistic arrays
+    """
+    if isinstance(node, ast.Expression):
+        return _compile(node.body)
+    if isinstance(node, ast.Name) and node.id in stats.STATISTIC_NAMES:
+        name = node.id
+        return lambda table: table[name]
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float, bool):
+        # NumPy numbers, so arithmetic of constants like 1/0 follows the NaN and inf rules of the statistics
+        try:
+            value = np.float64(node.value)
+        except OverflowError:
+            # Integer literals are never negative
+            value = np.float64(np.inf)
+        return lambda table: value
+    if isinstance(node, ast.UnaryOp):
+        operand = _compile(node.operand)
+        if isinstance(node.op, ast.Not):
+            return lambda table: ~_truth(operand(table))
+        if isinstance(node.op, ast.USub):
+            return lambda table: -operand(table)
+        if isinstance(node.op, ast.UAdd):
+            return operand
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPERATORS:
+        function = _BINARY_OPERATORS[type(node.op)]
+        left, right = _compile(node.left), _compile(node.right)
+        return lambda table: function(left(table), right(table))
+    if isinstance(node, ast.BoolOp):
+        values = [_compile(value) for value in node.values]
+        combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+        return lambda table: combine.reduce([_truth(value(table)) for value in values])
+    if isinstance(node, ast.Compare) and all(type(op) in _COMPARISONS for op in node.ops):
+        operands = [_compile(node.left)] + [_compile(comparator) for comparator in node.comparators]
+        functions = [_COMPARISONS[type(op)] for op in node.ops]
+
+        def compare(table):
+            # Chained comparisons like 0 < mean < 1 hold if every single comparison holds
+            values = [operand(table) for operand in operands]
+            return np.logical_and.reduce([_truth(functions[i](values[i], values[i + 1]))
+                                          for i in range(len(functions))])
+        return compare
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in _FUNCTIONS \
+            and not node.keywords and len(node.args) == (1 if node.func.id == "abs" else 2):
+        function = _FUNCTIONS[node.func.id]
+        arguments = [_compile(argument) for argument in node.args]
+        return lambda table: function(*[argument(table) for argument in arguments])
+    raise ValueError("Not allowed in a filter expression: " + ast.unparse(node))
+
+
+def compile_expression(expression):
+    """
+    Parses a filter expression like "mean > 5 and variance < 2" once
+    :param expression: Boolean expression over mean, median, skewness, kurtosis, autocorrelation and variance
+    :return: Function taking a dictionary with one NumPy array per statistic and returning a boolean mask
+    :raises SyntaxError: If the expression can't be parsed
+    :raises ValueError: If the expression contains anything but the allowed names, numbers and operators
+    """
+    evaluate = _compile(ast.parse(expression.strip(), mode='eval'))
+
+    def mask(table):
+        with np.errstate(all='ignore'):
+            result = _truth(evaluate(table))
+        return np.broadcast_to(result, len(table[stats.STATISTIC_NAMES[0]]))
+    return mask
+
+
+def _trace_statistics(statistics):
+    """
+    :param statistics: Statistical characteristics of one trace as dictionary
+    :return: List with one float NumPy array per statistic
+    :raises ValueError: If a statistic is not a number or the statistics differ in length
+    """
+    arrays = [np.array(statistics[statistic], dtype=np.float64) for statistic in stats.STATISTIC_NAMES]
+    if any(array.shape != (len(statistics["mean"]),) for array in arrays):
+        raise ValueError("Statistics differ in length")
+    return arrays
+
+
+def statistics_table(selected_files):
+    """
+    Collects the statistics of all traces into one table with an entry per tracedata column
+    :param selected_files: List with the statistical characteristics of each trace as dictionaries
+    :return: Dictionary with one float NumPy array per statistic and the arrays "trace" and "column" with the
+    index of the trace and of the tracedata column of each entry
+    :raises ValueError: With the index of the first trace whose statistics are not numbers as argument
+    """
+    counts = [len(statistics["mean"]) for statistics in selected_files]
+    table = {}
+    try:
+        # All values of a statistic are parsed at once, single traces are only checked to report an error
+        for statistic in stats.STATISTIC_NAMES:
+            values = []
+            for i in range(len(selected_files)):
+                if len(selected_files[i][statistic]) != counts[i]:
+                    raise ValueError("Statistics differ in length")
+                values.extend(selected_files[i][statistic])
+            table[statistic] = np.array(values, dtype=np.float64)
+            if table[statistic].shape != (len(values),):
+                raise ValueError("Statistics are not numbers")
+    except (TypeError, ValueError):
+        for i in range(len(selected_files)):
+            try:
+                _trace_statistics(selected_files[i])
+            except (TypeError, ValueError):
+                raise ValueError(i)
+        raise
+    table["trace"] = np.repeat(np.arange(len(selected_files)), counts)
+    table["column"] = np.arange(len(table["trace"])) - np.repeat(np.cumsum(counts) - counts, counts).astype(int)
+    return table
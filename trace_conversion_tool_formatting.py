@@ -0,0 +1,233 @@
+"""
+    This file is part of TraceConversionTool.
+    Copyright (c) 2022 Dennis Ziebart
+
+    TraceConversionTool is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    TraceConversionTool is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with TraceConversionTool.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import re
+
+import numpy as np
+
+# Formats blocks of tracedata rows as tab separated text, exactly like '%' formatting of each value does.
+# Integers and floats with a '%.Nf' or '%.Ne' format are formatted with NumPy: the digits of all values are computed
+# at once into a byte matrix with one row per tracedata row, padding bytes are removed at the end. Float digits are
+# taken from the value scaled and rounded to an integer. Values whose scaled value lies too close to a rounding
+# boundary to be sure about the last digit, and values out of range, are formatted by Python instead. Everything
+# else uses a row format string applied to all values of the block at once
+
+# Float formats that are computed with NumPy: precision and conversion
+_VECTORIZED_FLOAT_FORMAT = re.compile(r'%(?:\.(\d+))?([efE])')
+
+# Largest precision whose rounded values are still exact integers in a float
+_MAX_PRECISION = 14
+
+# Relative distance to a rounding boundary below which the last digit is left to Python. The scaled value is off
+# by at most two units in the last place, this keeps a wide margin
+_ROUNDING_MARGIN = 2.0 ** -46
+
+_ZERO, _MINUS, _PLUS, _POINT = (ord(character) for character in '0-+.')
+
+# Correctly rounded powers of ten up to the largest shift of the exponent format
+_POWERS_OF_TEN = np.array([float('1e' + str(exponent)) for exponent in range(300 + _MAX_PRECISION)])
+
+
+def _digits(magnitudes, width=1):
+    """
+    :param magnitudes: uint64 NumPy array
+    :param width: Minimum number of digits, shorter values get leading zeros
+    :return: uint8 matrix with the digits of each value as characters, right aligned and padded with zero bytes
+    """
+    largest = int(magnitudes.max()) if len(magnitudes) else 0
+    columns = max(len(str(largest)), width)
+    matrix = np.empty((len(magnitudes), columns), dtype=np.uint8)
+    # Dividing 32 bit integers is a lot faster
+    remaining = magnitudes.astype(np.uint32 if largest < 1 << 32 else np.uint64)
+    ten = remaining.dtype.type(10)
+    for column in range(columns - 1, -1, -1):
+        quotient = remaining // ten
+        digit = remaining - quotient * ten
+        if column < columns - width:
+            # Nothing is left of a value beyond its leading digit, leading zeros become padding
+            matrix[:, column] = np.where(remaining != 0, digit + ten.dtype.type(_ZERO), 0)
+        else:
+            matrix[:, column] = digit + ten.dtype.type(_ZERO)
+        remaining = quotient
+    return matrix
+
+
+def _sign(negative):
+    """
+    :param negative: Boolean NumPy array
+    :return: uint8 matrix with one column holding '-' for negative values and zero bytes otherwise
+    """
+    return np.where(negative, _MINUS, 0).astype(np.uint8)[:, None]
+
+
+def _integer_field(values):
+    """
+    :param values: Integer or bool NumPy array
+    :return: uint8 matrix with the values like '%d'
+    """
+    if values.dtype.kind == 'u':
+        return _digits(values.astype(np.uint64))
+    values = values.astype(np.int64)
+    negative = values < 0
+    # The magnitude of the smallest int64 only fits into an uint64
+    magnitudes = np.where(negative, ~values.astype(np.uint64) + np.uint64(1), values.astype(np.uint64))
+    return np.hstack((_sign(negative), _digits(magnitudes)))
+
+
+def _fixed_field(values, precision):
+    """
+    :param values: float64 NumPy array
+    :param precision: Number of digits after the decimal point
+    :return: uint8 matrix with the values like '%.<precision>f' and boolean array of the values left to Python
+    """
+    scale = 10.0 ** precision
+    with np.errstate(invalid='ignore', over='ignore'):
+        scaled = np.abs(values) * scale
+        fallback = ~(scaled < 2.0 ** 53) | \
+            (np.abs(scaled - np.floor(scaled) - 0.5) <= scaled * _ROUNDING_MARGIN)
+    rounded = np.rint(np.where(fallback, 0.0, scaled)).astype(np.uint64)
+    parts = [_sign(np.signbit(values)), _digits(rounded // np.uint64(scale))]
+    if precision > 0:
+        parts.append(np.full((len(values), 1), _POINT, dtype=np.uint8))
+        parts.append(_digits(rounded % np.uint64(scale), precision))
+    return np.hstack(parts), fallback
+
+
+def _exponent_field(values, precision, letter):
+    """
+    :param values: float64 NumPy array
+    :param precision: Number of digits after the decimal point
+    :param letter: 'e' or 'E'
+    :return: uint8 matrix with the values like '%.<precision>e' and boolean array of the values left to Python
+    """
+    magnitudes = np.abs(values)
+    zero = magnitudes == 0
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        fallback = ~zero & ~((magnitudes >= 1e-280) & (magnitudes <= 1e280))
+        safe = np.where(zero | fallback, 1.0, magnitudes)
+        exponents = np.floor(np.log10(safe)).astype(np.int64)
+        lower, upper = 10.0 ** precision - 0.5, 10.0 ** (precision + 1) - 0.5
+        scaled = np.empty(len(values))
+        rows = np.arange(len(values))
+        for attempt in range(3):
+            # log10 may be one off near powers of ten, and a mantissa rounded up to ten moves to the next exponent.
+            # Multiplying or dividing by a power of ten keeps the error of the scaled value within two units in the
+            # last place. A value close to a rounding boundary with any of the tried exponents is left to Python
+            shift = precision - exponents[rows]
+            powers = _POWERS_OF_TEN[np.abs(shift)]
+            attempted = np.where(shift >= 0, safe[rows] * powers, safe[rows] / powers)
+            scaled[rows] = attempted
+            fallback[rows] |= np.abs(attempted - np.floor(attempted) - 0.5) <= attempted * _ROUNDING_MARGIN
+            adjustment = (attempted >= upper).astype(np.int64) - (attempted < lower)
+            rows = rows[adjustment != 0]
+            if len(rows) == 0 or attempt == 2:
+                break
+            exponents[rows] += adjustment[adjustment != 0]
+    fallback[zero] = False
+    fallback[rows] = True
+    rounded = np.rint(np.where(zero | fallback, 0.0, scaled)).astype(np.uint64)
+    exponents[zero | fallback] = 0
+    leading = np.uint64(10 ** precision)
+    parts = [_sign(np.signbit(values)), _digits(rounded // leading, 1)]
+    if precision > 0:
+        parts.append(np.full((len(values), 1), _POINT, dtype=np.uint8))
+        parts.append(_digits(rounded % leading, precision))
+    parts.append(np.full((len(values), 1), ord(letter), dtype=np.uint8))
+    parts.append(np.where(exponents < 0, _MINUS, _PLUS).astype(np.uint8)[:, None])
+    parts.append(_digits(np.abs(exponents).astype(np.uint64), 2))
+    return np.hstack(parts), fallback
+
+
+def _with_fallback(field, fallback, values, value_format):
+    """
+    Writes the values NumPy couldn't format into their rows of a field
+    :param field: uint8 matrix of a column
+    :param fallback: Boolean array of the values formatted by Python
+    :param values: Column values
+    :param value_format: Format string of a value
+    :return: Field, wider if a value needs more characters
+    """
+    rows = np.flatnonzero(fallback)
+    if len(rows) == 0:
+        return field
+    texts = [(value_format % float(values[row])).encode('ascii') for row in rows]
+    width = max(field.shape[1], max(map(len, texts)))
+    if width > field.shape[1]:
+        field = np.hstack((np.zeros((len(field), width - field.shape[1]), dtype=np.uint8), field))
+    for row, text in zip(rows, texts):
+        field[row] = 0
+        field[row, width - len(text):] = np.frombuffer(text, dtype=np.uint8)
+    return field
+
+
+def vectorized(dtype, float_format):
+    """
+    :param dtype: dtype of the block
+    :param float_format: Format string for floats, repr if empty
+    :return: True if format_rows computes the digits with NumPy
+    """
+    if dtype.kind in 'iu':
+        return True
+    match = _VECTORIZED_FLOAT_FORMAT.fullmatch(float_format)
+    return dtype == np.float64 and match is not None and int(match.group(1) or 6) <= _MAX_PRECISION
+
+
+def format_rows(block, float_format, line_separator=os.linesep):
+    """
+    Formats a block of rows like pandas.DataFrame.to_csv with sep='\\t', index=False and header=False
+    :param block: Two-dimensional NumPy array with one row per tracedata row, without NaN values
+    :param float_format: Format string for floats like '%e', empty for repr. Not used for integers
+    :param line_separator: Line separator written after each row
+    :return: Text as bytes
+    :raises TypeError: If the format string doesn't take exactly one number
+    :raises ValueError: If the format string is invalid
+    """
+    rows, columns = block.shape
+    if rows == 0:
+        return b''
+    if not vectorized(block.dtype, float_format):
+        if block.dtype.kind != 'f':
+            value_format = '%s'
+        elif float_format:
+            value_format = float_format
+        elif block.dtype == np.float64:
+            value_format = '%r'
+        else:
+            # Narrower floats get the shortest representation of their own precision
+            value_format, block = '%s', block.astype(str)
+        row_format = '\t'.join([value_format] * columns) + line_separator
+        return ((row_format * rows) % tuple(block.ravel().tolist())).encode('UTF-8')
+    fields = []
+    for column in range(columns):
+        values = block[:, column]
+        if block.dtype.kind in 'iu':
+            fields.append(_integer_field(values))
+            continue
+        match = _VECTORIZED_FLOAT_FORMAT.fullmatch(float_format)
+        precision = int(match.group(1) or 6)
+        if match.group(2) == 'f':
+            field, fallback = _fixed_field(values, precision)
+        else:
+            field, fallback = _exponent_field(values, precision, match.group(2))
+        fields.append(_with_fallback(field, fallback, values, float_format))
+    separators = [np.full((rows, 1), ord('\t'), dtype=np.uint8)] * (columns - 1) + \
+        [np.frombuffer(line_separator.encode('ascii'), dtype=np.uint8)[None, :].repeat(rows, axis=0)]
+    matrix = np.hstack([part for pair in zip(fields, separators) for part in pair])
+    text = matrix.ravel()
+    return text[text != 0].tobytes()
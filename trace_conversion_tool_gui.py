@@ -16,24 +16,57 @@
     along with TraceConversionTool.  If not, see <http://www.gnu.org/licenses/>.
 """
 
-import configparser
-import json
 import os
 import pathlib
 import sys
+import time
 import tkinter.filedialog as fd
 import tkinter.messagebox as mb
 from idlelib.tooltip import Hovertip
 from tkinter import *
-from tkinter import ttk, scrolledtext
+from tkinter import ttk
 
 import pandas as pd
 
+import trace_conversion_tool_catalog as catalog
+import trace_conversion_tool_jobs as jobs
 import trace_conversion_tool_model as model
+import trace_conversion_tool_pipeline as pipeline
+import trace_conversion_tool_preview as preview
 
 # Load config file
-config = configparser.RawConfigParser()
-config.read('config.properties')
+config = model.load_config('config.properties')
+
+
+def show_error(error):
+    """
+    Displays an error raised by the model
+    :param error: model.TraceConversionError
+    """
+    mb.showerror(error.title, error.message)
+
+
+def show_job_error(error):
+    """
+    Displays the error of a failed job
+    :param error: Exception raised by the job
+    """
+    if isinstance(error, model.TraceConversionError):
+        show_error(error)
+    else:
+        mb.showerror("Unexpected error", type(error).__name__ + ": " + str(error))
+
+
+def overwrite_allowed(filename):
+    """
+    Asks the user whether an existing file may be overwritten
+    :param filename: File that will be written
+    :return: True if the file doesn't exist or may be overwritten
+    """
+    if os.path.exists(filename):
+        return mb.askyesno("File already exists", os.path.basename(filename) +
+                           " already exists. \n Would you like to overwrite it?")
+    return True
 
 
 class TraceConvertingToolGUI:
@@ -41,13 +74,22 @@ class TraceConvertingToolGUI:
         """Creates a GUI for the tool"""
         master = master
         master.title("Trace Converting Tool")
+        # Long operations run as jobs in the background
+        job_runner = jobs.JobRunner(master, config.getint('jobs', 'gui_workers'), config.getint('jobs', 'poll_interval'))
+
+        def close():
+            """Cancels the jobs and closes the window"""
+            job_runner.shutdown()
+            master.destroy()
+
+        master.protocol("WM_DELETE_WINDOW", close)
         # Notebook and Tabs
         tab_parent = ttk.Notebook(master)
-        prepare_file_tab = PrepareFileTab(tab_parent)
-        convert_trace_tab = ConvertTraceTab(tab_parent)
+        prepare_file_tab = PrepareFileTab(tab_parent, job_runner)
+        convert_trace_tab = ConvertTraceTab(tab_parent, job_runner)
         filter_traces_tab = FilterTraceTab(tab_parent)
-        extract_tracedata_tab = ExtractTracedataTab(tab_parent)
-        validate_trace_tab = ValidateTraceTab(tab_parent)
+        extract_tracedata_tab = ExtractTracedataTab(tab_parent, job_runner)
+        validate_trace_tab = ValidateTraceTab(tab_parent, job_runner)
 
         # Add tabs to master
         tab_parent.add(prepare_file_tab, text="Prepare File")
@@ -56,16 +98,222 @@ class TraceConvertingToolGUI:
         tab_parent.add(extract_tracedata_tab, text="Extract Tracedata")
         tab_parent.add(validate_trace_tab, text="Validate Trace")
         tab_parent.pack(expand=1, fill='both')
+        jobs_frame = JobsFrame(master, job_runner)
+        jobs_frame.pack(fill='x')
+
+
+class JobsFrame(Frame):
+    def __init__(self, master, job_runner):
+        """Creates the list of background jobs with their progress"""
+        ttk.Frame.__init__(self, master)
+
+        def update_jobs(job_list):
+            """
+            Shows the current state of the jobs, called by the job runner on every poll
+            :param job_list: List of jobs.Job
+            """
+            rows = {str(id(job)): job for job in job_list}
+            for row in jobs_treeview.get_children():
+                if row not in rows:
+                    jobs_treeview.delete(row)
+            for row, job in rows.items():
+                progress = "" if job.fraction is None else format(job.fraction, '.0%')
+                if jobs_treeview.exists(row):
+                    jobs_treeview.item(row, values=(job.name, job.status, progress))
+                else:
+                    jobs_treeview.insert('', 'end', iid=row, values=(job.name, job.status, progress))
+            running = [job for job in job_list if job.status in (jobs.RUNNING, jobs.CANCELLING)]
+            if running and running[0].fraction is None:
+                if str(jobs_progressbar.cget('mode')) != 'indeterminate':
+                    jobs_progressbar.config(mode='indeterminate')
+                    jobs_progressbar.start()
+            else:
+                if str(jobs_progressbar.cget('mode')) != 'determinate':
+                    jobs_progressbar.stop()
+                    jobs_progressbar.config(mode='determinate')
+                jobs_progressbar['value'] = running[0].fraction * 100 if running else 0
+
+        def cancel_jobs():
+            """Cancels the selected jobs or all unfinished jobs if none is selected"""
+            selection = jobs_treeview.selection()
+            for job in job_runner.jobs:
+                if not selection or str(id(job)) in selection:
+                    job.cancel()
+
+        jobs_treeview = ttk.Treeview(self, columns=['job', 'status', 'progress'], show='headings',
+                                     height=config.get('treeview', 'jobs_treeview_height'))
+        jobs_treeview.heading('job', text='Job')
+        jobs_treeview.column('job', width=500)
+        jobs_treeview.heading('status', text='Status')
+        jobs_treeview.heading('progress', text='Progress')
+        jobs_treeview.grid(column=0, row=0, rowspan=3)
+
+        jobs_progressbar = ttk.Progressbar(self, mode='determinate', maximum=100, length=300)
+        jobs_progressbar.grid(column=1, row=0)
+
+        cancel_jobs_button = Button(self, text="Cancel Jobs", command=cancel_jobs)
+        cancel_jobs_button.grid(column=1, row=1)
+
+        clear_jobs_button = Button(self, text="Clear Finished Jobs", command=job_runner.clear_finished)
+        clear_jobs_button.grid(column=1, row=2)
+
+        job_runner.listeners.append(update_jobs)
+
+        # Tooltips
+        cancel_jobs_button_tooltip = Hovertip(cancel_jobs_button, config.get('tooltips', 'cancel_jobs_button'))
+        clear_jobs_button_tooltip = Hovertip(clear_jobs_button, config.get('tooltips', 'clear_jobs_button'))
+
+
+class FilePreview(Frame):
+    def __init__(self, master, width, height):
+        """
+        Creates a preview that only reads the lines it shows, so files of any size can be displayed
+        :param master: Parent widget
+        :param width: Width of the text in characters
+        :param height: Number of lines shown at once
+        """
+        ttk.Frame.__init__(self, master)
+        # State of the shown file, replaced by show
+        state = {"filename": None, "index": None, "first_line": 0, "static": False}
+
+        def total_lines():
+            """:return: Number of lines that can be scrolled to"""
+            index = state["index"]
+            return 0 if index is None else max(index.lines_indexed, 1)
+
+        def set_text(lines):
+            """
+            Replaces the shown text
+            :param lines: List of lines
+            """
+            text.config(state=NORMAL)
+            text.delete("1.0", "end")
+            text.insert(INSERT, "\n".join(lines))
+            text.config(state=DISABLED)
+
+        def render():
+            """Shows the page starting at first_line in browse mode"""
+            if state["index"] is None or mode_var.get() != "browse":
+                return
+            total = total_lines()
+            state["first_line"] = max(min(state["first_line"], total - height), 0)
+            set_text(state["index"].read_lines(state["first_line"], height))
+            scrollbar.set(state["first_line"] / total, min((state["first_line"] + height) / total, 1.0))
+
+        def scroll(*arguments):
+            """
+            Command of the scrollbar
+            :param arguments: ('moveto', fraction) or ('scroll', number, 'units' or 'pages')
+            """
+            if arguments[0] == "moveto":
+                state["first_line"] = int(float(arguments[1]) * total_lines())
+            elif arguments[0] == "scroll":
+                state["first_line"] += int(arguments[1]) * (height if arguments[2] == "pages" else 1)
+            render()
+
+        def mouse_wheel(event):
+            """Scrolls three lines per wheel step"""
+            if event.num == 4 or event.delta > 0:
+                scroll("scroll", -3, "units")
+            else:
+                scroll("scroll", 3, "units")
+            return "break"
+
+        def change_mode():
+            """Shows the file in the selected mode"""
+            filename = state["filename"]
+            if filename is None or state["static"]:
+                return
+            lines = config.getint('preview', 'preview_lines')
+            if mode_var.get() == "browse":
+                render()
+                return
+            if mode_var.get() == "head":
+                set_text(preview.head(filename, lines))
+            elif mode_var.get() == "tail":
+                set_text(preview.tail(filename, lines))
+            else:
+                set_text(preview.sample(filename, lines))
+            scrollbar.set(0, 1)
+
+        def poll_index(index):
+            """
+            Updates the line count while the index is built
+            :param index: preview.LineIndex of the shown file, polling stops once another file is shown
+            """
+            if index is not state["index"]:
+                return
+            if index.complete:
+                line_count_label.configure(text=format(index.line_count, ',') + " lines")
+            else:
+                line_count_label.configure(text="Counting lines: " + format(index.lines_indexed, ',') + "...")
+                self.after(200, poll_index, index)
+            if mode_var.get() == "browse":
+                render()
+
+        def show(filename):
+            """
+            Shows a file, binary traces are shown as their header
+            :param filename: File that will be displayed
+            """
+            if state["index"] is not None:
+                state["index"].stop()
+            state.update(filename=filename, index=None, first_line=0, static=False)
+            if model.is_binary_trace(filename):
+                state["static"] = True
+                set_text([model.trace_display_text(filename)])
+                line_count_label.configure(text="Binary trace, showing the header")
+                scrollbar.set(0, 1)
+                return
+            state["index"] = preview.LineIndex(filename, config.getint('preview', 'line_index_stride'))
+            state["index"].start()
+            change_mode()
+            poll_index(state["index"])
+
+        self.show = show
+
+        text = Text(self, width=width, height=height, wrap=NONE, state=DISABLED)
+        text.grid(column=0, row=0, columnspan=5)
+        scrollbar = ttk.Scrollbar(self, orient="vertical", command=scroll)
+        scrollbar.grid(column=5, row=0, sticky=N + S)
+        horizontal_scrollbar = ttk.Scrollbar(self, orient="horizontal", command=text.xview)
+        text.configure(xscrollcommand=horizontal_scrollbar.set)
+        horizontal_scrollbar.grid(column=0, row=1, columnspan=5, sticky=E + W)
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            text.bind(sequence, mouse_wheel)
+
+        line_count_label = Label(self)
+        line_count_label.grid(column=0, row=2)
+        mode_var = StringVar(value="browse")
+        for column, (mode, label) in enumerate((("browse", "Browse"), ("head", "Head"), ("tail", "Tail"),
+                                                ("sample", "Sample")), start=1):
+            mode_radiobutton = Radiobutton(self, text=label, variable=mode_var, value=mode, command=change_mode)
+            mode_radiobutton.grid(column=column, row=2)
+            mode_radiobutton_tooltip = Hovertip(mode_radiobutton, config.get('tooltips', 'preview_' + mode))
 
 
 class PrepareFileTab(Frame):
-    def __init__(self, master):
+    def __init__(self, master, job_runner):
         """Creates a Prepare File Tab"""
         ttk.Frame.__init__(self, master)
+        # Steps applied to the selected file, they can be saved as recipe and run on other files
+        recorded_steps = []
+
+        def record_step(step):
+            """
+            Adds a successful operation to the recorded steps
+            :param step: Step created with pipeline.make_step
+            """
+            if step["step"] == "convert_to_csv":
+                recorded_steps.clear()
+            recorded_steps.append(step)
+            recipe_label.configure(text=str(len(recorded_steps)) + " steps recorded")
 
         def browse_file():
             """Opens file explorer to select a file"""
             try:
+                recorded_steps.clear()
+                recipe_label.configure(text="")
                 file_entry.delete(0, END)  # removes previously selected file
                 selected_file = fd.askopenfilename(initialdir=config.get('directories', 'raw_traces_dir'),
                                                    title="Select a File",
@@ -89,24 +337,70 @@ class PrepareFileTab(Frame):
             """
             columns_list = list(map(int, (date_and_time_column_index_list.split(';'))))
             format_list = date_and_time_format_list.split(';')
-            df = pd.read_csv(file, header=0, delimiter=',')
-            try:
-                df = model.df_columns_to_epoch(df, columns_list, format_list)
+            utc = utc_checkbutton_var.get() == 1
+
+            def convert_timestamps():
+                """Runs in a worker thread"""
+                df = pd.read_csv(file, header=0, delimiter=',')
+                df = model.df_columns_to_epoch(df, columns_list, format_list, utc)
                 df.to_csv(file, index=False, sep=',')
+
+            def timestamps_converted(result):
+                record_step(pipeline.make_step("unix_time", columns=columns_list, formats=format_list, utc=utc))
                 mb.showinfo('Timestamps successfully calculated', 'Displaying file')
                 display_file(file)
-            except IndexError:
-                mb.showerror('Error during timestamp conversion', 'Column indexes invalid')
-            except TypeError:
-                mb.showerror('Error during timestamp conversion', 'The columns need to contain strings')
-            except ValueError:
-                mb.showerror('Error during timestamp conversion',
-                             'Timestamp could not be converted with the passed format strings.\nPlease check if you'
-                             ' passed the same number of format strings and column indexes '
-                             'or if the timestamps need further preparation')
-            except PermissionError:
-                mb.showerror('Permission to edit file denied',
-                             'Please check if the file is used by another application')
+
+            def timestamp_error(error):
+                if isinstance(error, IndexError):
+                    mb.showerror('Error during timestamp conversion', 'Column indexes invalid')
+                elif isinstance(error, TypeError):
+                    mb.showerror('Error during timestamp conversion', 'The columns need to contain strings')
+                elif isinstance(error, ValueError):
+                    mb.showerror('Error during timestamp conversion',
+                                 'Timestamp could not be converted with the passed format strings.\nPlease check if '
+                                 'you passed the same number of format strings and column indexes '
+                                 'or if the timestamps need further preparation')
+                elif isinstance(error, PermissionError):
+                    mb.showerror('Permission to edit file denied',
+                                 'Please check if the file is used by another application')
+                else:
+                    show_job_error(error)
+
+            job_runner.submit(jobs.Job("Calculate unix time of " + os.path.basename(file), convert_timestamps,
+                                       on_success=timestamps_converted, on_error=timestamp_error,
+                                       reports_progress=False))
+
+        def remove_lines(file, line_amount):
+            """
+            Removes the first lines of the file and displays the result
+            :param file: Input file
+            :param line_amount: Amount of lines to be removed. Passed via GUI
+            """
+            try:
+                line_amount = model.remove_lines_from_csv(file, line_amount)
+                record_step(pipeline.make_step("remove_lines", count=line_amount))
+                if line_amount == 1:
+                    mb.showinfo('Removing successfully', 'Removed the first row from ' + os.path.basename(file))
+                if line_amount > 1:
+                    mb.showinfo('Removing successfully', 'Removed the first ' + str(line_amount) + ' rows from ' +
+                                os.path.basename(file))
+                display_file(file)
+            except model.TraceConversionError as error:
+                show_error(error)
+
+        def add_header(file, header):
+            """
+            Adds a new header to the file and displays the result
+            :param file: Input file
+            :param header: New header. Passed via GUI
+            """
+            try:
+                model.add_header_to_csv(file, header)
+                record_step(pipeline.make_step("add_header", header=header))
+                mb.showinfo('Header added ', str(header) + " was added as header to " + file)
+                display_file(file)
+            except model.TraceConversionError as error:
+                show_error(error)
 
         def calculate_difference_rows(file):
             """
@@ -118,6 +412,8 @@ class PrepareFileTab(Frame):
                 df[row_wise_difference_result_column_entry.get()] = df[
                     df.columns[int(row_wise_difference_entry.get())]].diff()
                 df.to_csv(file, index=False, sep=',')
+                record_step(pipeline.make_step("difference_rows", column=int(row_wise_difference_entry.get()),
+                                               result_column=row_wise_difference_result_column_entry.get()))
                 mb.showinfo('Inter arrival time successfully calculated', 'Displaying file')
                 display_file(file)
             except (IndexError, ValueError):
@@ -144,6 +440,8 @@ class PrepareFileTab(Frame):
                 df[column_wise_difference_result_column_entry.get()] = df[df.columns[columns[0]]] - df[
                     df.columns[columns[1]]]
                 df.to_csv(file, index=False, sep=',')
+                record_step(pipeline.make_step("difference_columns", columns=columns,
+                                               result_column=column_wise_difference_result_column_entry.get()))
                 mb.showinfo('Inter arrival time successfully calculated', 'Displaying file')
                 display_file(file)
             except IndexError:
@@ -151,58 +449,108 @@ class PrepareFileTab(Frame):
             except TypeError:
                 mb.showerror('Error during calculation', 'Both columns need to contain numbers')
 
+        def save_recipe():
+            """Saves the recorded steps as recipe file"""
+            if not recorded_steps:
+                mb.showinfo('No steps recorded', 'Prepare a file first, every successful step is recorded')
+                return
+            filename = fd.asksaveasfilename(initialdir=config.get('directories', 'raw_traces_dir'),
+                                            title="Save Recipe", defaultextension=".json",
+                                            filetypes=(("Recipes", "*.json"),))
+            if not filename:
+                return
+            try:
+                pipeline.save_recipe(recorded_steps, filename)
+                mb.showinfo('Recipe saved', str(len(recorded_steps)) + ' steps saved to ' + os.path.basename(filename))
+            except model.TraceConversionError as error:
+                show_error(error)
+            except PermissionError:
+                mb.showerror('Permission to edit file denied',
+                             'Please check if the file is used by another application')
+
+        def run_recipe(file):
+            """
+            Prepares the selected file with all steps of a recipe in one pass. The result is the CSV file with the
+            name of the selected file
+            :param file: Input file
+            """
+            if not os.path.isfile(file):
+                mb.showinfo('No file selected', 'Please select a valid file')
+                return
+            recipe_filename = fd.askopenfilename(initialdir=config.get('directories', 'raw_traces_dir'),
+                                                 title="Select a Recipe", filetypes=(("Recipes", "*.json"),))
+            if not recipe_filename:
+                return
+            try:
+                steps = pipeline.load_recipe(recipe_filename)
+            except model.TraceConversionError as error:
+                show_error(error)
+                return
+            result_filename = os.path.splitext(file)[0] + '.csv'
+            if result_filename != file and not overwrite_allowed(result_filename):
+                return
+
+            def recipe_finished(result):
+                recorded_steps[:] = steps
+                recipe_label.configure(text=str(len(recorded_steps)) + " steps recorded")
+                mb.showinfo('File successfully prepared', str(len(steps)) + ' steps applied to ' +
+                            str(result.rows) + ' rows. Displaying file')
+                display_file(result.result_filename)
+                file_entry.delete(0, END)
+                file_entry.insert(END, result.result_filename)
+
+            job_runner.submit(jobs.Job("Prepare " + os.path.basename(file), pipeline.run_recipe,
+                                       (steps, file, result_filename), on_success=recipe_finished,
+                                       on_error=show_job_error))
+
         def display_file(filename):
             """
             Displays the selected file in the preparation tab
             :param filename: File that will be displayed
             """
             if os.path.isfile(filename):
-                with open(filename, 'r', newline='\n') as file:
-                    file_displayer_label.configure(text=os.path.basename(filename))
-                    file_displayer.grid(column=0, row=9, columnspan=12, rowspan=10)
-                    file_displayer.config(state=NORMAL)
-                    file_displayer.delete("1.0", "end")
-                    file_displayer.insert(INSERT, file.read())
-                    file_displayer.config(state=DISABLED)
+                file_displayer_label.configure(text=os.path.basename(filename))
+                file_displayer.grid(column=0, row=9, columnspan=12, rowspan=10)
+                file_displayer.show(filename)
 
         def convert_file_to_csv(filename, delimiter):
             """
-            Converts file to csv format
+            Converts file to csv format. The file is parsed chunk by chunk and streamed into the result
             :param filename:Input file
-            :param delimiter:Delimiter of the file. For example regex
+            :param delimiter:Delimiter of the file. For example regex, empty to detect it
             """
-            write_file = 1
-            try:
-                if len(delimiter) == 0:
-                    delimiter = None
-                if keep_header_checkbutton_var.get() == 1:
-                    df = pd.read_csv(filename, header=0, sep=delimiter)
-                else:
-                    df = pd.read_csv(filename, header=None, sep=delimiter)
-                result_filename = filename.split('.')[0] + '.csv'
-            except ValueError:
-                mb.showerror("Error while reading file", "Please check if the file and the delimiter are valid."
-                                                         "Note: The '\s+' delimiter also does not work if values in a "
-                                                         "column are also seperated by whitespaces.")
+            if not os.path.isfile(filename):
+                mb.showinfo('No file selected', 'Please select a valid file')
                 return
-            if os.path.exists(result_filename):
-                write_file = mb.askyesno("File already exists", result_filename +
-                                         " already exists. \n Would you like to overwrite it?")
+            keep_header = keep_header_checkbutton_var.get() == 1
+            header = header_entry.get().split(',') if header_entry.get() != "" and not keep_header else None
             try:
-                if write_file:
-                    if header_entry.get() != "" and keep_header_checkbutton_var.get() == 0:
-                        df.to_csv(result_filename, index=False, sep=',', header=header_entry.get().split(','))
-                    else:
-                        df.to_csv(result_filename, index=False, sep=',')
-                    mb.showinfo('File successfully converted', 'Displaying file')
-                    display_file(result_filename)
-                    file_entry.delete(0, END)
-                    file_entry.insert(END, result_filename)
-            except ValueError:
-                mb.showerror("Error while converting file", "Please check if the file and the header are valid")
-            except PermissionError:
-                mb.showerror('Permission to edit file denied',
-                             'Please check if the file is used by another application')
+                step = pipeline.make_step("convert_to_csv", delimiter=delimiter, keep_header=keep_header,
+                                          header=header)
+            except model.TraceConversionError as error:
+                show_error(error)
+                return
+            result_filename = os.path.splitext(filename)[0] + '.csv'
+            if not overwrite_allowed(result_filename):
+                return
+
+            def file_converted(result):
+                record_step(step)
+                mb.showinfo('File successfully converted', 'Displaying file')
+                display_file(result.result_filename)
+                file_entry.delete(0, END)
+                file_entry.insert(END, result.result_filename)
+
+            def conversion_error(error):
+                if isinstance(error, PermissionError):
+                    mb.showerror('Permission to edit file denied',
+                                 'Please check if the file is used by another application')
+                else:
+                    show_job_error(error)
+
+            job_runner.submit(jobs.Job("Convert " + os.path.basename(filename) + " to CSV", pipeline.run_recipe,
+                                       ([step], filename, result_filename), on_success=file_converted,
+                                       on_error=conversion_error))
 
         # GUI Elements
         file_entry = Entry(self, width=config.get('entries', 'entry_width'))
@@ -217,9 +565,7 @@ class PrepareFileTab(Frame):
         remove_rows_entry.grid(column=1, row=2)
 
         remove_rows_button = Button(self, text="Remove Lines",
-                                    command=lambda: [model.remove_lines_from_csv(file_entry.get(),
-                                                                                 remove_rows_entry.get()),
-                                                     display_file(file_entry.get())])
+                                    command=lambda: remove_lines(file_entry.get(), remove_rows_entry.get()))
         remove_rows_button.grid(column=2, row=2)
 
         add_header_label = Label(self, text="Header")
@@ -228,14 +574,19 @@ class PrepareFileTab(Frame):
         add_header_entry = Entry(self, width=config.get('entries', 'entry_width'))
         add_header_entry.grid(column=1, row=3)
 
-        add_header_button = Button(self, text="Add Header to CSV File", command=lambda: [model.add_header_to_csv(
-                                           file_entry.get(), list(add_header_entry.get().split(","))),
-                                                    display_file(file_entry.get())])
+        add_header_button = Button(self, text="Add Header to CSV File", command=lambda: add_header(
+                                           file_entry.get(), list(add_header_entry.get().split(","))))
         add_header_button.grid(column=2, row=3)
 
         file_displayer_label = Label(self)
         file_displayer_label.grid(column=0, row=8)
-        file_displayer = scrolledtext.ScrolledText(self, width=200, height=33)
+        recipe_label = Label(self)
+        recipe_label.grid(column=1, row=8)
+        save_recipe_button = Button(self, text="Save Steps as Recipe", command=save_recipe)
+        save_recipe_button.grid(column=2, row=8)
+        run_recipe_button = Button(self, text="Run Recipe", command=lambda: run_recipe(file_entry.get()))
+        run_recipe_button.grid(column=4, row=8)
+        file_displayer = FilePreview(self, width=200, height=33)
 
         date_format_label = Label(self, text="Format Strings of Timestamps")
         date_format_label.grid(column=2, row=4)
@@ -273,6 +624,13 @@ class PrepareFileTab(Frame):
                                                 file_entry.get(), date_columns_entry.get(), date_format_entry.get()))
         calculate_timestamp_button.grid(column=4, row=4)
 
+        utc_checkbutton_var = IntVar()
+        utc_checkbutton = Checkbutton(self, text="Timestamps in UTC",
+                                      variable=utc_checkbutton_var, onvalue=1,
+                                      offvalue=0,
+                                      selectcolor=config.get('entries', 'background_colour_optional_entries'))
+        utc_checkbutton.grid(column=5, row=4)
+
         column_wise_difference_button = Button(self, text="Calculate Difference between Columns",
                                                command=lambda: calculate_difference_columns(
                                                    file_entry.get(), column_wise_difference_entry.get()))
@@ -319,6 +677,7 @@ class PrepareFileTab(Frame):
                                                    config.get('tooltips', 'timestamp_columns_label_pft'))
         calculate_timestamp_button_tooltip = Hovertip(calculate_timestamp_button,
                                                       config.get('tooltips', 'calculate_timestamp_button_pft'))
+        utc_checkbutton_tooltip = Hovertip(utc_checkbutton, config.get('tooltips', 'utc_checkbutton_pft'))
         columns_wise_difference_label_tooltip = Hovertip(
             column_wise_difference_label, config.get('tooltips', 'columns_wise_difference_label_pft'))
         columns_wise_difference_result_column_label_tooltip = Hovertip(
@@ -336,10 +695,12 @@ class PrepareFileTab(Frame):
         header_label_tooltip = Hovertip(header_label, config.get('tooltips', 'header_label_pft'))
         header_checkbutton_tooltip = Hovertip(keep_header_checkbutton,
                                               config.get('tooltips', 'keep_header_checkbutton_pft'))
+        save_recipe_button_tooltip = Hovertip(save_recipe_button, config.get('tooltips', 'save_recipe_button_pft'))
+        run_recipe_button_tooltip = Hovertip(run_recipe_button, config.get('tooltips', 'run_recipe_button_pft'))
 
 
 class ConvertTraceTab(Frame):
-    def __init__(self, master):
+    def __init__(self, master, job_runner):
         """Creates a Convert Trace Tab"""
         ttk.Frame.__init__(self, master)
 
@@ -373,8 +734,10 @@ class ConvertTraceTab(Frame):
             """Takes the user input from the entry fields and converts the selected trace to the standard format"""
             org_filename = original_tracefile_entry.get()
             write_file = 1
+            binary = binary_checkbutton_var.get() == 1
             result_filename = config.get('directories', 'converted_traces_dir') + \
-                              '/' + result_filename_entry.get() + config.get('files', 'trace_file_suffix')
+                              '/' + result_filename_entry.get() + \
+                              config.get('files', 'binary_trace_file_suffix' if binary else 'trace_file_suffix')
             if os.path.isfile(org_filename) and pathlib.Path(org_filename).suffix == ".csv":
                 if os.path.exists(result_filename):
                     write_file = mb.askyesno("File already exists",
@@ -387,41 +750,69 @@ class ConvertTraceTab(Frame):
                                  "Indexes need to be integers seperated by a semicolon [;]")
                     return
                 if write_file:
-                    model.convert_trace(original_tracefile_entry.get(),
-                                        col,
-                                        tracedata_description_entry.get().split(";"),
-                                        description_entry.get(),
-                                        source_entry.get(),
-                                        username_entry.get(),
-                                        additional_information_entry.get('1.0', 'end-1c').replace("\n", "").split(";"),
-                                        statistics_format_entry.get(),
-                                        result_filename)
+                    tracedata_filename = None
+                    # If tracedata checkbox is selected the data will also be extracted
                     if extract_tracedata_checkbutton_var.get() == 1:
                         tracedata_filename = config.get('directories',
                                                         'tracedata_dir') + tracedata_filename_entry.get() + \
                                              config.get('files', 'tracedata_file_suffix')
-                        model.extract_tracedata(result_filename, tracedata_filename, float_format_entry.get())
-                    mb.showinfo("Trace successfully converted", "Displaying converted Trace")
-                    display_file(result_filename)
+                        if not overwrite_allowed(tracedata_filename):
+                            tracedata_filename = None
+                    conversion_arguments = (org_filename,
+                                            col,
+                                            tracedata_description_entry.get().split(";"),
+                                            description_entry.get(),
+                                            source_entry.get(),
+                                            username_entry.get(),
+                                            additional_information_entry.get('1.0', 'end-1c')
+                                            .replace("\n", "").split(";"),
+                                            statistics_format_entry.get(),
+                                            result_filename,
+                                            binary)
+                    job_runner.submit(jobs.Job("Convert " + os.path.basename(org_filename), convert_and_extract,
+                                               (conversion_arguments, tracedata_filename, float_format_entry.get()),
+                                               on_success=trace_converted, on_error=show_job_error))
                 else:
                     mb.showinfo("File already exists", "Displaying existing File")
-                    # If tracedata checkbox is selected the data will also be extracted
-                # Display the created traces
-                display_file(result_filename)
+                    display_file(result_filename)
             else:
                 mb.showinfo('No file selected', 'Please select a valid file')
 
+        def convert_and_extract(conversion_arguments, tracedata_filename, float_format, progress):
+            """
+            Converts a trace and extracts its tracedata if tracedata_filename is given, runs in a worker thread
+            :param conversion_arguments: Arguments of model.convert_trace
+            :param tracedata_filename: Result filename of the extraction or None
+            :param float_format: Format string for the extraction
+            :param progress: Progress callback of the job
+            :return: model.ConversionResult
+            """
+            end = 1.0 if tracedata_filename is None else 0.8
+            result = model.convert_trace(*conversion_arguments, progress=lambda fraction: progress(fraction * end))
+            if tracedata_filename is not None:
+                model.extract_tracedata(result.filename, tracedata_filename, float_format,
+                                        lambda fraction: progress(end + (1 - end) * fraction))
+            return result
+
+        def trace_converted(result):
+            """
+            Shows the converted trace
+            :param result: model.ConversionResult
+            """
+            if not result.statistics_computed:
+                mb.showinfo("Statistics won't be computed", "Tracedata only contains " +
+                            str(len(result.trace.tracebody.tracedata[0])) +
+                            " elements per column. Computing statistics requires five or more.")
+            mb.showinfo("Trace successfully converted", "Displaying converted Trace")
+            display_file(result.filename)
+
         def display_file(filename):
             """
             Displays the selected file in the convert tab
             :param filename: File that will be displayed
             """
-            with open(filename, 'r', newline='\n') as f:
-                file_displayer.config(state=NORMAL)
-                file_displayer.delete("1.0", "end")
-                file_displayer.insert(INSERT, f.read())
-                file_displayer.config(state=DISABLED)
-                file_displayer.grid(column=5, row=1, columnspan=12, rowspan=10)
+            file_displayer.show(filename)
+            file_displayer.grid(column=5, row=1, columnspan=12, rowspan=10)
 
         # GUI Elements
         columns_label = Label(self, text="Tracedata Column Indexes")
@@ -456,6 +847,12 @@ class ConvertTraceTab(Frame):
                                                                            'background_colour_optional_entries'))
         extract_tracedata_checkbutton.grid(column=4, row=2)
 
+        binary_checkbutton_var = IntVar()
+        binary_checkbutton = Checkbutton(self, text="Save in Binary Format", variable=binary_checkbutton_var,
+                                         onvalue=1, offvalue=0,
+                                         selectcolor=config.get('entries', 'background_colour_optional_entries'))
+        binary_checkbutton.grid(column=4, row=1)
+
         statistics_format_label = Label(self, text="Statistic Format String")
         statistics_format_label.grid(row=12, column=0)
 
@@ -501,7 +898,7 @@ class ConvertTraceTab(Frame):
         result_filename_entry.grid(row=8, column=1)
 
         # Text widget to display the converted trace
-        file_displayer = scrolledtext.ScrolledText(self, width=105, height=33)
+        file_displayer = FilePreview(self, width=105, height=33)
 
         convert_button = Button(self, text='Convert Trace', command=convert_trace)
         convert_button.grid(row=13, column=1)
@@ -520,6 +917,7 @@ class ConvertTraceTab(Frame):
                                                  config.get('tooltips', 'result_filename_label_ctt'))
         tracedata_checkbutton_tooltip = Hovertip(extract_tracedata_checkbutton,
                                                  config.get('tooltips', 'tracedata_checkbutton'))
+        binary_checkbutton_tooltip = Hovertip(binary_checkbutton, config.get('tooltips', 'binary_checkbutton_ctt'))
         tracedata_filename_label_tooltip = Hovertip(tracedata_filename_label,
                                                     config.get('tooltips', 'tracedata_filename_label_ctt'))
         browse_file_button_tooltip = Hovertip(original_tracefile_button,
@@ -543,7 +941,7 @@ class FilterTraceTab(Frame):
                 while additional_files:
                     files = fd.askopenfilenames(initialdir=config.get('directories', 'converted_traces_dir'),
                                                 title="Select a File",
-                                                filetypes=(("JSON files", "*.json*"),))
+                                                filetypes=(("Traces", "*.json* *.bin*"),))
                     if files:
                         file_tuple += files
                     additional_files = mb.askyesno('Select additional files',
@@ -553,22 +951,59 @@ class FilterTraceTab(Frame):
                 selected_traces_lb.delete(0, 'end')
                 selected_files.clear()
                 selected_filenames.clear()
+                selected_table.clear()
                 for i in file_tuple:
-                    with open(str(i), newline='\n') as json_file:
-                        selected_files.append(json.load(json_file)["traceheader"]["statistical characteristics"])
-                        selected_filenames.append(os.path.basename(os.path.dirname(i)) + '/' + os.path.basename(i))
+                    selected_files.append(model.read_traceheader(str(i)).to_dict()["statistical characteristics"])
+                    selected_filenames.append(os.path.basename(os.path.dirname(i)) + '/' + os.path.basename(i))
                 for i in range(len(selected_filenames)):
                     selected_traces_lb.insert(i, selected_filenames[i])
                 selected_traces_lb.grid(column=1, row=2, rowspan=5)
                 browse_button.grid(column=1, row=8)
-            except json.decoder.JSONDecodeError:
+                browse_directory_button.grid(column=1, row=9)
+            except model.TraceConversionError:
                 mb.showerror("Invalid Trace", "Invalid/corrupted traces were selected")
 
+        def browse_directory():
+            """Selects all traces of a directory, their traceheaders are taken from the catalog of the directory"""
+            directory = fd.askdirectory(initialdir=config.get('directories', 'converted_traces_dir'),
+                                        title="Select a Directory")
+            if not directory:
+                return
+            try:
+                entries, result = catalog.load_catalog(directory)
+            except model.TraceConversionError as error:
+                show_error(error)
+                return
+            if result.failed:
+                mb.showerror("Invalid Trace", "Invalid/corrupted traces were skipped:\n" +
+                             "\n".join(filename + " (" + message + ")" for filename, message in result.failed))
+            selected_traces_lb.delete(0, 'end')
+            selected_files.clear()
+            selected_filenames.clear()
+            selected_table.clear()
+            for entry in entries:
+                selected_files.append(entry.traceheader.to_dict()["statistical characteristics"])
+                selected_filenames.append(os.path.basename(os.path.dirname(entry.path)) + '/' +
+                                          os.path.basename(entry.path))
+            for i in range(len(selected_filenames)):
+                selected_traces_lb.insert(i, selected_filenames[i])
+            selected_traces_lb.grid(column=1, row=2, rowspan=5)
+            browse_button.grid(column=1, row=8)
+            browse_directory_button.grid(column=1, row=9)
+
         def filter_traces(expression):
             """Evaluates the expression for the selected traces"""
             for i in filter_results_treeviw.get_children():
                 filter_results_treeviw.delete(i)
-            filter_results = model.filter_traces_by_expression(selected_files, expression, selected_filenames)
+            try:
+                if not selected_table:
+                    # The statistics are parsed once per selection
+                    selected_table.append(model.statistics_table(selected_files))
+                filter_results = model.filter_traces_by_expression(selected_files, expression, selected_filenames,
+                                                                   selected_table[0])
+            except model.TraceConversionError as error:
+                show_error(error)
+                return
             for i in range(len(filter_results)):
                 filter_results_treeviw.insert('', 'end', values=(filter_results[i][0],
                                                                  filter_results[i][1],
@@ -604,6 +1039,7 @@ class FilterTraceTab(Frame):
 
         selected_filenames = []
         selected_files = []
+        selected_table = []
 
         expression_label = Label(self, text="Boolean Expression")
         expression_label.grid(column=3, row=2)
@@ -617,16 +1053,21 @@ class FilterTraceTab(Frame):
         browse_button = Button(self, text="Choose Files", command=browse_files)
         browse_button.grid(column=1, row=2)
 
+        browse_directory_button = Button(self, text="Choose Directory", command=browse_directory)
+        browse_directory_button.grid(column=1, row=3)
+
         # Tooltips
         selected_traces_label_tooltip = Hovertip(selected_traces_label,
                                                  config.get('tooltips', 'selected_traces_label_ftt'))
         browse_files_button_tooltip = Hovertip(browse_button, config.get('tooltips', 'browse_files_button_ftt'))
+        browse_directory_button_tooltip = Hovertip(browse_directory_button,
+                                                   config.get('tooltips', 'browse_directory_button_ftt'))
         filter_button_tooltip = Hovertip(filter_button, config.get('tooltips', 'filter_button_ftt'))
         expression_label_tooltip = Hovertip(expression_label, config.get('tooltips', 'expression_label_ftt'))
 
 
 class ExtractTracedataTab(Frame):
-    def __init__(self, master):
+    def __init__(self, master, job_runner):
         """Creates a Extract Tracedata Tab"""
         ttk.Frame.__init__(self, master)
 
@@ -635,7 +1076,7 @@ class ExtractTracedataTab(Frame):
             input_trace_entry.delete(0, END)
             selected_trace = fd.askopenfilename(initialdir=config.get('directories', 'converted_traces_dir'),
                                                 title="Select a File",
-                                                filetypes=(("JSON files", "*.json*"),))
+                                                filetypes=(("Traces", "*.json* *.bin*"),))
             if not selected_trace:
                 mb.showinfo('No file selected', 'Please select a valid file')
             input_trace_entry.insert(END, selected_trace)
@@ -647,28 +1088,98 @@ class ExtractTracedataTab(Frame):
             Displays the selected file in the extract tracedata tab
             :param filename: File that will be displayed
             """
-            with open(filename, 'r', newline='\n') as f:
-                trace_column_display.config(state=NORMAL)
-                trace_column_display.delete("1.0", "end")
-                trace_column_display.insert(INSERT, f.read())
-                trace_column_display.config(state=DISABLED)
-                trace_column_display.grid(column=0, row=6, columnspan=4)
+            trace_column_display.show(filename)
+            trace_column_display.grid(column=0, row=6, columnspan=4)
+
+        def tracedata_extracted(filename):
+            """
+            Shows the extracted tracedata
+            :param filename: Tracedata file
+            """
+            display_file(filename)
+            mb.showinfo("Data extracted", "Displaying extracted columns")
 
         def extract_tracedata():
             """Extracts the tracedata so it can be used in ProFiDo"""
             org_filename = input_trace_entry.get()
-            if os.path.isfile(org_filename) and pathlib.Path(org_filename).suffix == ".json":
+            if model.is_trace_file(org_filename):
                 try:
                     filename = config.get('directories', 'tracedata_dir') + tracedata_filename_entry.get() + \
                                config.get('files', 'tracedata_file_suffix')
-                    model.extract_tracedata(input_trace_entry.get(), filename, float_format_entry.get())
-                    display_file(filename)
-                    mb.showinfo("Data extracted", "Displaying extracted columns")
-                except json.decoder.JSONDecodeError:
-                    mb.showerror('Invalid Trace', 'The selected file is not a valid Trace')
+                    if overwrite_allowed(filename):
+                        job_runner.submit(jobs.Job("Extract " + os.path.basename(org_filename),
+                                                   model.extract_tracedata,
+                                                   (org_filename, filename, float_format_entry.get()),
+                                                   on_success=lambda result: tracedata_extracted(filename),
+                                                   on_error=show_job_error))
+                except model.TraceConversionError as error:
+                    show_error(error)
             else:
                 mb.showinfo('No file selected', 'Please select a valid file')
 
+        def extract_directory():
+            """
+            Extracts the tracedata of all traces of a directory into the tracedata directory, one job per trace.
+            Traces whose tracedata file is newer are skipped, with a filter expression only the traces whose
+            statistics in the catalog match are extracted
+            """
+            directory = fd.askdirectory(initialdir=config.get('directories', 'converted_traces_dir'),
+                                        title="Select a Directory")
+            if not directory:
+                return
+            expression = batch_expression_entry.get().strip()
+            try:
+                files = catalog.select_traces(directory, expression) if expression else catalog.trace_files(directory)
+            except model.TraceConversionError as error:
+                show_error(error)
+                return
+            batch = []
+            skipped = 0
+            for filename in files:
+                result_filename = model.tracedata_filename(filename, config.get('directories', 'tracedata_dir'))
+                if model.tracedata_up_to_date(filename, result_filename):
+                    skipped += 1
+                    continue
+                job = jobs.Job("Extract " + os.path.basename(filename), model.extract_tracedata,
+                               (filename, result_filename, float_format_entry.get()))
+                batch.append((job_runner.submit(job), result_filename))
+            start = time.perf_counter()
+
+            def batch_finished(job_list):
+                """
+                Shows the report once every job of the batch is finished, called by the job runner on every poll
+                :param job_list: List of jobs.Job
+                """
+                if not all(job.finished for job, _ in batch):
+                    return
+                job_runner.listeners.remove(batch_finished)
+                batch_extracted(batch, skipped, time.perf_counter() - start)
+
+            job_runner.listeners.append(batch_finished)
+
+        def batch_extracted(batch, skipped, seconds):
+            """
+            Shows the number of extracted, skipped and failed traces, the throughput and the failures
+            :param batch: List of the jobs and their tracedata files
+            :param skipped: Number of traces whose tracedata was up to date
+            :param seconds: Time from starting to finishing the jobs
+            """
+            done = [result_filename for job, result_filename in batch if job.status == jobs.DONE]
+            failed = [job for job, _ in batch if job.status == jobs.FAILED]
+            megabytes = sum(os.path.getsize(result_filename) for result_filename in done
+                            if os.path.isfile(result_filename)) / 1e6
+            report = ("Extracted: " + str(len(done)) + " (" + format(megabytes, '.1f') + " MB in " +
+                      format(seconds, '.1f') + " s, " + format(megabytes / max(seconds, 1e-9), '.1f') + " MB/s)\n" +
+                      "Up to date: " + str(skipped) + "\n" +
+                      "Cancelled: " + str(len(batch) - len(done) - len(failed)) + "\n" +
+                      "Failed: " + str(len(failed)))
+            for job in failed:
+                error = job.error
+                report += "\n" + job.name + ": " + (error.title + ": " + error.message
+                                                    if isinstance(error, model.TraceConversionError)
+                                                    else type(error).__name__ + ": " + str(error))
+            mb.showinfo("Tracedata extracted", report)
+
         # GUI Elements
         converted_trace_label = Label(self, text="Trace")
         converted_trace_label.grid(row=0)
@@ -682,7 +1193,7 @@ class ExtractTracedataTab(Frame):
         float_format_entry.insert(END, config.get('entries', 'default_float_format_entry_ett'))
         input_trace_entry = Entry(self, width=config.get('entries', 'entry_width'))
 
-        trace_column_display = scrolledtext.ScrolledText(self, width=120, height=33)
+        trace_column_display = FilePreview(self, width=120, height=33)
 
         choose_trace_button = Button(self, text="Choose File", command=browse_file)
         choose_trace_button.grid(row=0, column=0)
@@ -693,6 +1204,15 @@ class ExtractTracedataTab(Frame):
         extract_columns_button = Button(self, text="Extract Tracedata", command=extract_tracedata)
         extract_columns_button.grid(row=2, column=2)
 
+        batch_expression_label = Label(self, text="Filter Expression")
+        batch_expression_label.grid(row=3, column=0)
+        batch_expression_entry = Entry(self, width=config.get('entries', 'entry_width'),
+                                       bg=config.get('entries', 'background_colour_optional_entries'))
+        batch_expression_entry.grid(row=3, column=1)
+
+        extract_directory_button = Button(self, text="Extract Directory", command=extract_directory)
+        extract_directory_button.grid(row=3, column=2)
+
         # Tooltips
         converted_trace_label_tooltip = Hovertip(converted_trace_label,
                                                  config.get('tooltips', 'converted_trace_label_ett'))
@@ -702,10 +1222,14 @@ class ExtractTracedataTab(Frame):
         extract_button_tooltip = Hovertip(extract_columns_button,
                                           config.get('tooltips', 'extract_tracedata_button_ett'))
         float_format_label_tooltip = Hovertip(float_format_label, config.get('tooltips', 'float_format_label_ett'))
+        batch_expression_label_tooltip = Hovertip(batch_expression_label,
+                                                  config.get('tooltips', 'batch_expression_label_ett'))
+        extract_directory_button_tooltip = Hovertip(extract_directory_button,
+                                                    config.get('tooltips', 'extract_directory_button_ett'))
 
 
 class ValidateTraceTab(Frame):
-    def __init__(self, master):
+    def __init__(self, master, job_runner):
         """Creates a Validate Trace Tab"""
         ttk.Frame.__init__(self, master)
 
@@ -714,12 +1238,57 @@ class ValidateTraceTab(Frame):
             file_entry.delete(0, END)
             selected_trace = fd.askopenfilename(initialdir=config.get('directories', 'converted_traces_dir'),
                                                 title="Select a File",
-                                                filetypes=(("JSON files", "*.json*"),))
+                                                filetypes=(("Traces", "*.json* *.bin*"),))
             if not selected_trace:
                 mb.showinfo('No file selected', 'Please select a valid file')
             file_entry.insert(END, selected_trace)
             file_entry.grid(row=0, column=0)
 
+        def validate_statistics():
+            """Compares the stored statistics of the selected trace with newly computed ones"""
+            filename = file_entry.get()
+            job_runner.submit(jobs.Job("Validate statistics of " + os.path.basename(filename),
+                                       model.verify_statistics, (filename, relative_tolerance_entry.get()),
+                                       on_success=statistics_validated, on_error=show_job_error))
+
+        def statistics_validated(result):
+            """
+            Shows the result of the statistic validation
+            :param result: model.StatisticsCheckResult
+            """
+            if result.valid:
+                mb.showinfo("Statistic Validation Result", "All statistics are close enough")
+            else:
+                mb.showinfo("The following statistics are not close enough", result.description())
+
+        def validate_hash():
+            """Compares the stored hash value of the selected trace with a newly computed one"""
+            filename = file_entry.get()
+            job_runner.submit(jobs.Job("Validate hash value of " + os.path.basename(filename), model.hash_check,
+                                       (filename,), on_success=hash_validated, on_error=show_job_error))
+
+        def hash_validated(result):
+            """
+            Shows the result of the hash value check
+            :param result: model.HashCheckResult
+            """
+            if result.valid:
+                mb.showinfo("Hash value check succeeded", "The stored and the computed hash value are equal")
+            else:
+                mb.showinfo("Hash value check failed", "Stored Hash value: " + result.stored_hash + "\n" +
+                            "Computed Hash value: " + result.computed_hash)
+
+        def restore_traceheader():
+            """Recomputes statistics and hash value of the selected trace after confirmation"""
+            if not mb.askyesno("Overwriting File", "Restoring the traceheader will overwrite the file. Continue?"):
+                return
+            filename = file_entry.get()
+            job_runner.submit(jobs.Job("Restore traceheader of " + os.path.basename(filename),
+                                       model.restore_traceheader, (filename, statistics_format_string_entry.get()),
+                                       on_success=lambda result: mb.showinfo(
+                                           'Traceheader restored', 'Statistics and has value restored successfully'),
+                                       on_error=show_job_error))
+
         # GUI Elements
         file_entry = Entry(self, width=config.get('entries', 'entry_width'))
 
@@ -732,15 +1301,13 @@ class ValidateTraceTab(Frame):
         browse_file_button = Button(self, text="Choose File", command=browse_file)
         browse_file_button.grid(row=1, column=0)
 
-        validate_statistics_button = Button(self, text="Validate Statistics", command=lambda:
-                                            model.verify_statistics(file_entry.get(), relative_tolerance_entry.get()))
+        validate_statistics_button = Button(self, text="Validate Statistics", command=validate_statistics)
         validate_statistics_button.grid(row=2, column=0)
 
-        validate_hash_button = Button(self, text="Validate Hash", command=lambda: model.hash_check(file_entry.get()))
+        validate_hash_button = Button(self, text="Validate Hash", command=validate_hash)
         validate_hash_button.grid(row=3, column=0)
 
-        restore_traceheader_button = Button(self, text="Restore Traceheader", command=lambda: model.restore_traceheader(
-                                                file_entry.get(), statistics_format_string_entry.get()))
+        restore_traceheader_button = Button(self, text="Restore Traceheader", command=restore_traceheader)
         restore_traceheader_button.grid(row=4, column=0)
 
         statistics_format_string_label = Label(self, text="Statistics Format String")
@@ -0,0 +1,148 @@
+"""
+    This file is part of TraceConversionTool.
+    Copyright (c) 2022 Dennis Ziebart
+
+    TraceConversionTool is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    TraceConversionTool is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with TraceConversionTool.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import hashlib
+import importlib
+
+# Traces are hashed as raw bytes read in large chunks. The stored hash value is left out by its byte range: in
+# binary traces the bytes of the value, in JSON traces the whole line holding it. Leaving out the line gives the
+# same SHA-256 value as the line by line hashing of older versions, as long as no other line contains
+# 'hash value'. Traces without a recorded algorithm were hashed line by line, see legacy_hash
+
+# Number of bytes read at once
+CHUNK_SIZE = 1 << 22
+
+# Algorithm of traces that don't record one
+DEFAULT_ALGORITHM = "sha256"
+
+# Hash algorithms by the name stored in the traceheader, with module and constructor. blake3 and xxhash are
+# optional packages, their algorithms can only be used if they are installed
+ALGORITHMS = {
+    "sha256": ("hashlib", "sha256"),
+    "blake2b": ("hashlib", "blake2b"),
+    "blake3": ("blake3", "blake3"),
+    "xxh3_128": ("xxhash", "xxh3_128"),
+}
+
+
+def new_hash(algorithm):
+    """
+    :param algorithm: Key of ALGORITHMS
+    :return: Hash object with update, digest_size and hexdigest
+    :raises ValueError: If the algorithm is unknown or its package is not installed
+    """
+    if algorithm not in ALGORITHMS:
+        raise ValueError("Unknown hash algorithm " + str(algorithm))
+    module, constructor = ALGORITHMS[algorithm]
+    try:
+        return getattr(importlib.import_module(module), constructor)()
+    except ImportError:
+        raise ValueError("The hash algorithm " + algorithm + " needs the package " + module)
+
+
+def available_algorithms():
+    """
+    :return: List with the keys of ALGORITHMS that can be used
+    """
+    available = []
+    for algorithm in ALGORITHMS:
+        try:
+            new_hash(algorithm)
+            available.append(algorithm)
+        except ValueError:
+            pass
+    return available
+
+
+def update_hash(hash_object, chunk, position, excluded):
+    """
+    Hashes a chunk of a file except the bytes of one byte range
+    :param hash_object: Result of new_hash
+    :param chunk: Bytes or memoryview of the chunk
+    :param position: Offset of the chunk in the file
+    :param excluded: Start and end offset of the bytes that are left out
+    """
+    start, end = excluded
+    chunk_end = position + len(chunk)
+    if start >= chunk_end or end <= position:
+        hash_object.update(chunk)
+        return
+    if start > position:
+        hash_object.update(chunk[:start - position])
+    if end < chunk_end:
+        hash_object.update(chunk[end - position:])
+
+
+def hash_file(filename, excluded, algorithm=DEFAULT_ALGORITHM, progress=None):
+    """
+    Hashes all bytes of a file except one byte range
+    :param filename: Any file
+    :param excluded: Start and end offset of the bytes that are left out
+    :param algorithm: Key of ALGORITHMS
+    :param progress: Called with the fraction of bytes hashed after each chunk
+    :return: Hash value as hexadecimal string
+    """
+    hash_object = new_hash(algorithm)
+    position = 0
+    with open(filename, 'rb', buffering=0) as file:
+        size = max(file.seek(0, 2), 1)
+        file.seek(0)
+        for chunk in read_chunks(file):
+            update_hash(hash_object, chunk, position, excluded)
+            position += len(chunk)
+            if progress is not None:
+                progress(min(position / size, 1.0))
+    return hash_object.hexdigest()
+
+
+def read_chunks(file, chunk_size=CHUNK_SIZE):
+    """
+    Reads a file in chunks of equal size into one reused buffer, so every chunk starts at a multiple of chunk_size
+    :param file: File opened in binary mode
+    :param chunk_size: Number of bytes of each chunk, the last one may be shorter
+    :return: Generator of memoryviews of the buffer, each is only valid until the next one is read
+    """
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    while True:
+        length = 0
+        while length < chunk_size:
+            read = file.readinto(view[length:])
+            if not read:
+                break
+            length += read
+        if length == 0:
+            return
+        yield view[:length]
+        if length < chunk_size:
+            return
+
+
+def legacy_hash(filename):
+    """
+    Hashes a JSON trace like older versions did: SHA-256 over the text lines, leaving out every line that contains
+    'hash value'
+    :param filename: JSON trace
+    :return: Hash value as hexadecimal string
+    """
+    sha256_hash = hashlib.sha256()
+    with open(filename, "r", newline='\n') as file:
+        for line in file:
+            if 'hash value' not in line:
+                sha256_hash.update(line.encode('UTF-8'))
+    return sha256_hash.hexdigest()
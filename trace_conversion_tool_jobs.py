@@ -0,0 +1,183 @@
+"""
+    This file is part of TraceConversionTool.
+    Copyright (c) 2022 Dennis Ziebart
+
+    TraceConversionTool is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    TraceConversionTool is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with TraceConversionTool.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import concurrent.futures
+import threading
+
+import trace_conversion_tool_model as model
+
+# Model operations started from the GUI run as jobs in a thread pool, so the window stays responsive. Worker
+# threads never touch Tk: they only update the progress of their job. The JobRunner polls the jobs with after()
+# on the Tk main thread and calls the callbacks of finished jobs there
+
+QUEUED = "queued"
+RUNNING = "running"
+CANCELLING = "cancelling"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class Job:
+    """A model operation that is run by a JobRunner"""
+
+    def __init__(self, name, function, args=(), kwargs=None, on_success=None, on_error=None, reports_progress=True):
+        """
+        :param name: Name shown in the job list
+        :param function: Model function to run
+        :param args: Positional arguments of the function
+        :param kwargs: Keyword arguments of the function
+        :param on_success: Called with the return value of the function on the Tk main thread
+        :param on_error: Called with the raised exception on the Tk main thread, not called if the job is cancelled
+        :param reports_progress: If True the function gets the progress callback of the job as keyword argument
+        progress, otherwise the progress is unknown and the job can only be cancelled before it starts
+        """
+        self.name = name
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs or {}
+        self.on_success = on_success
+        self.on_error = on_error
+        self.reports_progress = reports_progress
+        self.status = QUEUED
+        # Finished fraction between 0 and 1, None while unknown
+        self.fraction = 0.0 if reports_progress else None
+        self.error = None
+        self.future = None
+        self._cancel_requested = threading.Event()
+
+    def cancel(self):
+        """Stops the job before it starts or at its next progress report"""
+        if self.status not in (QUEUED, RUNNING):
+            return
+        self._cancel_requested.set()
+        if self.future is not None and self.future.cancel():
+            self.status = CANCELLED
+        else:
+            self.status = CANCELLING
+
+    def progress(self, fraction):
+        """
+        Progress callback passed to the model function, called in the worker thread
+        :param fraction: Finished fraction between 0 and 1
+        """
+        if self._cancel_requested.is_set():
+            raise model.OperationCancelled("Cancelled", self.name + " was cancelled")
+        self.fraction = fraction
+
+    def run(self):
+        """
+        Runs the function, called in the worker thread
+        :return: Return value of the function
+        """
+        if self._cancel_requested.is_set():
+            raise model.OperationCancelled("Cancelled", self.name + " was cancelled")
+        if self.status == QUEUED:
+            self.status = RUNNING
+        kwargs = dict(self.kwargs)
+        if self.reports_progress:
+            kwargs["progress"] = self.progress
+        return self.function(*self.args, **kwargs)
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED, CANCELLED)
+
+
+class JobRunner:
+    """Runs jobs in a thread pool and reports them back to the Tk main thread"""
+
+    def __init__(self, widget, workers=1, poll_interval=100):
+        """
+        :param widget: Any Tk widget, its after() method is used for polling
+        :param workers: Number of jobs running at the same time, further jobs are queued
+        :param poll_interval: Milliseconds between two polls
+        """
+        self.widget = widget
+        self.poll_interval = poll_interval
+        self.jobs = []
+        self.listeners = []
+        self._polling = False
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max(workers, 1),
+                                                               thread_name_prefix="trace-job")
+        self.widget.after(self.poll_interval, self._poll)
+
+    def submit(self, job):
+        """
+        Queues a job
+        :param job: Job
+        :return: The passed job
+        """
+        job.future = self._executor.submit(job.run)
+        self.jobs.append(job)
+        self._notify()
+        return job
+
+    def clear_finished(self):
+        """Removes finished jobs from the job list"""
+        self.jobs = [job for job in self.jobs if not job.finished]
+        self._notify()
+
+    def shutdown(self):
+        """Cancels all jobs, running jobs stop at their next progress report"""
+        for job in self.jobs:
+            job.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _notify(self):
+        """Passes the job list to the listeners"""
+        # Listeners may remove themselves
+        for listener in list(self.listeners):
+            listener(self.jobs)
+
+    def _finish(self, job):
+        """
+        Sets the final status of a job whose future is done and calls its callbacks
+        :param job: Job
+        """
+        if job.future.cancelled():
+            job.status = CANCELLED
+            return
+        error = job.future.exception()
+        if isinstance(error, model.OperationCancelled):
+            job.status = CANCELLED
+        elif error is not None:
+            job.status = FAILED
+            job.error = error
+            if job.on_error is not None:
+                job.on_error(error)
+        else:
+            job.status = DONE
+            job.fraction = 1.0
+            if job.on_success is not None:
+                job.on_success(job.future.result())
+
+    def _poll(self):
+        """Finishes the jobs that are done and updates the listeners, runs on the Tk main thread"""
+        self.widget.after(self.poll_interval, self._poll)
+        # Message boxes shown by callbacks run a nested event loop that keeps polling
+        if self._polling:
+            return
+        self._polling = True
+        try:
+            for job in list(self.jobs):
+                if not job.finished and job.future.done():
+                    self._finish(job)
+            self._notify()
+        finally:
+            self._polling = False
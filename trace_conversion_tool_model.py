@@ -17,50 +17,331 @@
 """
 
 import configparser
+import dataclasses
 import datetime
-import hashlib
+import functools
 import json
 import json.decoder
 import math
+import mmap
 import os
 import pathlib
+import re
+import shutil
+import tempfile
 import time
-import tkinter
-import tkinter.filedialog
-import tkinter.messagebox as mb
 
-import pandas as pd
-from pandas.errors import EmptyDataError
+import numpy as np
 
-# Load config from file
+import trace_conversion_tool_binary as tracebin
+import trace_conversion_tool_cache as cache
+import trace_conversion_tool_filter as tracefilter
+import trace_conversion_tool_formatting as formatting
+import trace_conversion_tool_hashing as hashing
+import trace_conversion_tool_statistics as stats
+
+# pandas is imported inside the functions parsing or writing CSV files. It makes up most of the import time,
+# hashing, validation and the command line workers don't need it
+
+# Start of a JSON trace up to the value of the traceheader
+_TRACEHEADER_START = re.compile(r'\s*\{\s*"traceheader"\s*:\s*')
+
+# Number of characters read at once while looking for the end of the traceheader
+HEADER_BLOCK_SIZE = 1 << 16
+
+# Buffer size for copying files
+COPY_BUFFER_SIZE = 1 << 20
+
+# Key of the tracedata in a JSON trace, its columns follow
+_JSON_TRACEDATA_KEY = b'"tracedata": '
+
+# Settings from the config file, filled by load_config. Functions use their defaults for missing settings
 config = configparser.RawConfigParser()
-config.read('config.properties')
+
+
+def load_config(filename='config.properties'):
+    """
+    Reads the settings used by the model. Nothing is read when the module is imported
+    :param filename: Config file
+    :return: The configparser.RawConfigParser holding the settings
+    """
+    if not config.read(filename):
+        raise InvalidInputError("Config file not found", "The config file " + str(filename) + " can't be read")
+    return config
+
+
+class TraceConversionError(Exception):
+    """
+    Base class for the errors of the model. Title and message are meant to be shown to the user,
+    the GUI displays them in a message box and the command line tool prints them
+    """
+
+    def __init__(self, title, message):
+        super().__init__(message)
+        self.title = title
+        self.message = message
+
+
+class InvalidInputError(TraceConversionError):
+    """Raised if a parameter like a column index, format string or filename is invalid"""
+
+
+class InvalidTraceError(TraceConversionError):
+    """Raised if a file is missing or is not a valid trace"""
+
+
+class InvalidDataError(TraceConversionError):
+    """Raised if the tracedata can't be processed, for example because a column doesn't contain numbers"""
+
+
+class OperationCancelled(TraceConversionError):
+    """Raised by a progress callback to stop a running operation"""
+
+
+def report_progress(progress, fraction, start=0.0, end=1.0):
+    """
+    Passes the progress of an operation to its progress callback. Long-running functions take an optional
+    progress callback, it is called with the finished fraction between 0 and 1 and may raise OperationCancelled
+    :param progress: Callback or None
+    :param fraction: Finished fraction of the current step
+    :param start: Overall fraction at the start of the current step
+    :param end: Overall fraction at the end of the current step
+    """
+    if progress is not None:
+        progress(start + (end - start) * fraction)
+
+
+def _fields_to_dict(instance):
+    """
+    :param instance: Dataclass instance of a trace part
+    :return: Dictionary with the keys of the standard format, nested trace parts are converted as well
+    """
+    document = {}
+    for field in dataclasses.fields(instance):
+        value = getattr(instance, field.name)
+        document[field.name.replace('_', ' ')] = _fields_to_dict(value) if dataclasses.is_dataclass(value) else value
+    return document
+
+
+def _fields_from_dict(cls, document):
+    """
+    :param cls: Dataclass of a trace part
+    :param document: Dictionary with the keys of the standard format
+    :return: Instance of cls
+    """
+    values = {}
+    for field in dataclasses.fields(cls):
+        if field.metadata.get('optional') and field.name.replace('_', ' ') not in document:
+            continue
+        value = document[field.name.replace('_', ' ')]
+        values[field.name] = _fields_from_dict(field.type, value) if dataclasses.is_dataclass(field.type) else value
+    return cls(**values)
+
+
+@dataclasses.dataclass(slots=True)
+class Metainformation:
+    """Metainformation of the traceheader"""
+    original_name: str = ""
+    description: str = ""
+    source: str = ""
+    user: str = ""
+    additional_information: list = dataclasses.field(default_factory=list)
+    creation_time: str = ""
+    hash_value: str = ""
+    # Algorithm of the hash value, see hashing.ALGORITHMS. Traces written before it was recorded use SHA-256
+    hash_algorithm: str = dataclasses.field(default=hashing.DEFAULT_ALGORITHM, metadata={'optional': True})
+
+
+@dataclasses.dataclass(slots=True)
+class StatisticalCharacteristics:
+    """Formatted statistical characteristics of the traceheader, one entry per tracedata column"""
+    mean: list = dataclasses.field(default_factory=list)
+    median: list = dataclasses.field(default_factory=list)
+    skewness: list = dataclasses.field(default_factory=list)
+    kurtosis: list = dataclasses.field(default_factory=list)
+    autocorrelation: list = dataclasses.field(default_factory=list)
+    variance: list = dataclasses.field(default_factory=list)
+    # How the medians were computed, see stats.MEDIAN_STRATEGIES. Traces written before these entries existed
+    # have exact medians. The error is the normalized rank error an approximate median may have
+    median_strategy: str = dataclasses.field(default="exact", metadata={'optional': True})
+    median_error: float = dataclasses.field(default=0.0, metadata={'optional': True})
+    # Moments, co-moments of neighbouring values and median sketch of each column, see
+    # stats.RunningStatistics.state. append_to_trace continues the statistics from them
+    sufficient_statistics: list = dataclasses.field(default_factory=list, metadata={'optional': True})
+
+    @classmethod
+    def from_dict(cls, document):
+        """
+        :param document: Statistical characteristics as dictionary with the keys of the standard format
+        :return: StatisticalCharacteristics
+        """
+        return _fields_from_dict(cls, document)
+
+
+@dataclasses.dataclass(slots=True)
+class Traceheader:
+    """Traceheader with metainformation and statistical characteristics"""
+    metainformation: Metainformation = dataclasses.field(default_factory=Metainformation)
+    statistical_characteristics: StatisticalCharacteristics = dataclasses.field(
+        default_factory=StatisticalCharacteristics)
+
+    def to_dict(self):
+        """
+        :return: Traceheader as dictionary with the keys of the standard format
+        """
+        return _fields_to_dict(self)
+
+
+@dataclasses.dataclass(slots=True)
+class Tracebody:
+    """Tracebody with the tracedata columns and their descriptions"""
+    tracedata_description: list = dataclasses.field(default_factory=list)
+    # Columns as lists or NumPy arrays
+    tracedata: list = dataclasses.field(default_factory=list)
+
+
+@dataclasses.dataclass(slots=True)
+class Trace:
+    """
+    Trace in standard format. Every conversion builds its own Trace, so conversions can run in parallel threads
+    """
+    traceheader: Traceheader = dataclasses.field(default_factory=Traceheader)
+    tracebody: Tracebody = dataclasses.field(default_factory=Tracebody)
+
+    def to_dict(self):
+        """
+        :return: Trace as dictionary with the keys of the standard format. Tracedata columns are not copied
+        """
+        return _fields_to_dict(self)
+
+    @classmethod
+    def from_dict(cls, document):
+        """
+        :param document: Trace as dictionary, for example loaded from a JSON file
+        :return: Trace
+        """
+        try:
+            return _fields_from_dict(cls, document)
+        except (KeyError, TypeError):
+            raise InvalidTraceError("Trace content invalid", "Please check if the trace content is valid")
+
+
+@dataclasses.dataclass(frozen=True)
+class ConversionResult:
+    """Result of convert_trace"""
+    filename: str
+    trace: Trace
+    # False if the columns contain less than five elements, the statistics are empty then
+    statistics_computed: bool
+
+
+@dataclasses.dataclass(frozen=True)
+class HashCheckResult:
+    """Result of hash_check"""
+    stored_hash: str
+    computed_hash: str
+
+    @property
+    def valid(self):
+        return self.stored_hash == self.computed_hash
+
+
+@dataclasses.dataclass(frozen=True)
+class StatisticMismatch:
+    """A stored statistic that is not close enough to the computed one"""
+    statistic: str
+    column: int
+    computed: str
+    stored: str
+
+    def __str__(self):
+        return self.statistic + " [" + str(self.column) + "]: Computed: " + self.computed + " Stored: " + self.stored
+
+
+@dataclasses.dataclass(frozen=True)
+class StatisticsCheckResult:
+    """Result of verify_statistics"""
+    mismatches: tuple
+
+    @property
+    def valid(self):
+        return len(self.mismatches) == 0
+
+    def description(self):
+        """
+        :return: One line per mismatching statistic
+        """
+        return "".join(str(mismatch) + "\n" for mismatch in self.mismatches)
+
+
+@dataclasses.dataclass(frozen=True)
+class ValidationResult:
+    """Result of validate_trace"""
+    hash_check: HashCheckResult
+    statistics_check: StatisticsCheckResult
+
+    @property
+    def valid(self):
+        return self.hash_check.valid and self.statistics_check.valid
 
 
 def remove_lines_from_csv(filename, line_amount):
     """
-    Removes rows from the beginning of a file
+    Removes rows from the beginning of a file. The remaining bytes are copied unchanged into a temporary file
+    that replaces the input file, nothing is parsed. Lines are counted by line breaks, so a quoted value spanning
+    several lines counts as several lines
     :param filename: Input file
     :param line_amount: Amount of lines to be removed from the beginning of the file
+    :return: Amount of removed lines
     """
     try:
-        try:
-            line_amount = int(line_amount)
+        line_amount = int(line_amount)
+    except ValueError:
+        raise InvalidInputError('Integer needed', 'Please enter an integer number of lines')
+    if line_amount < 0:
+        raise InvalidInputError('Invalid number of Lines', 'Please specify a valid number of lines to remove')
+    try:
+        with open(filename, 'rb') as source:
+            for _ in range(line_amount):
+                source.readline()
+            start = source.tell()
+            # Like an empty CSV file, a file without any remaining value is rejected
+            if not source.read(COPY_BUFFER_SIZE).strip() and not source.read(1):
+                raise InvalidInputError('Invalid number of Lines', 'Please specify a valid number of lines to remove')
+        _replace_with_tail(filename, start)
+    except (FileNotFoundError, IsADirectoryError):
+        raise InvalidInputError('No file selected', 'Please select a valid file')
+    return line_amount
+
+
+def _replace_with_tail(filename, start):
+    """
+    Atomically replaces a file with its content from a byte offset on
+    :param filename: File to replace
+    :param start: Offset of the first byte that is kept
+    """
+    directory, name = os.path.split(os.path.abspath(filename))
+    descriptor, temporary_filename = tempfile.mkstemp(prefix='.' + name + '.', suffix='.tmp', dir=directory)
+    try:
+        with open(filename, 'rb') as source, os.fdopen(descriptor, 'wb') as target:
+            size = os.fstat(source.fileno()).st_size
+            offset = start
             try:
-                df = pd.read_csv(filename, skiprows=line_amount)
-                df.to_csv(filename, index=False)
-                if line_amount == 1:
-                    mb.showinfo('Removing successfully', 'Removed the first row from ' + os.path.basename(filename))
-                if line_amount > 1:
-                    mb.showinfo('Removing successfully', 'Removed the first ' + str(line_amount) + ' rows from ' +
-                                os.path.basename(filename))
-            except (EmptyDataError, ValueError):
-                mb.showerror('Invalid number of Lines', 'Please specify a valid number of lines to remove')
-        except ValueError:
-            mb.showerror('Integer needed', 'Please enter an integer number of lines')
-    except FileNotFoundError:
-        mb.showinfo(config.get('browse_file', 'no_file_selected_window'),
-                    config.get('browse_file', 'no_file_selected_message'))
+                # The kernel copies the bytes without passing them through Python
+                while offset < size:
+                    sent = os.sendfile(target.fileno(), source.fileno(), offset, size - offset)
+                    if sent == 0:
+                        break
+                    offset += sent
+            except (AttributeError, OSError):
+                source.seek(offset)
+                shutil.copyfileobj(source, target, COPY_BUFFER_SIZE)
+        shutil.copymode(filename, temporary_filename)
+        os.replace(temporary_filename, filename)
+    except BaseException:
+        if os.path.exists(temporary_filename):
+            os.remove(temporary_filename)
+        raise
 
 
 def add_header_to_csv(filename, header):
@@ -69,16 +350,15 @@ def add_header_to_csv(filename, header):
     :param filename: Input file
     :param header: New header
     """
-    if os.path.splitext(filename)[1] == ".csv":
-        df = pd.read_csv(filename, delimiter=',', header=None)
-        if len(header) != len(df.columns):
-            mb.showinfo('Invalid header passed', 'The passed header has ' + str(len(header)) + ' elements. \nBut ' +
-                        str(len(df.columns)) + ' elements are required!')
-        else:
-            df.to_csv(filename, header=header, index=False)
-            mb.showinfo('Header added ', str(header) + " was added as header to " + filename)
-    else:
-        mb.showinfo('Please select a csv file', 'You can only add headers to csv files')
+    import pandas as pd
+
+    if os.path.splitext(filename)[1] != ".csv":
+        raise InvalidInputError('Please select a csv file', 'You can only add headers to csv files')
+    df = pd.read_csv(filename, delimiter=',', header=None)
+    if len(header) != len(df.columns):
+        raise InvalidInputError('Invalid header passed', 'The passed header has ' + str(len(header)) +
+                                ' elements. \nBut ' + str(len(df.columns)) + ' elements are required!')
+    df.to_csv(filename, header=header, index=False)
 
 
 def date_time_to_epoch(date_time, time_format):
@@ -91,42 +371,170 @@ def date_time_to_epoch(date_time, time_format):
     return time.mktime(datetime.datetime.strptime(date_time, time_format).timetuple())
 
 
-def df_columns_to_epoch(dataframe, columns, date_time_format):
+@functools.lru_cache(maxsize=None)
+def timestamp_format_kind(time_format):
+    """
+    Classifies a timestamp format string, so the conversion path for a format is only determined once
+    :param time_format: Format of timestamp. strptime format codes, 'ISO8601' or '%s' for numeric unix timestamps
+    :return: 'epoch', 'iso8601', 'aware' or 'naive'
+    """
+    if time_format in ('%s', 'epoch'):
+        return 'epoch'
+    if time_format.upper() == 'ISO8601':
+        return 'iso8601'
+    if '%z' in time_format or '%Z' in time_format:
+        return 'aware'
+    return 'naive'
+
+
+def _utc_offset(seconds):
+    """
+    :param seconds: Seconds since epoch
+    :return: Offset of the local time zone to UTC in seconds at that moment
+    """
+    return time.localtime(seconds).tm_gmtoff
+
+
+def _local_offset_transitions(first, last):
+    """
+    Finds the moments the offset of the local time zone changes between two points in time
+    :param first: Seconds since epoch the search starts at
+    :param last: Seconds since epoch the search ends at
+    :return: List of tuples with the moment of the change, the old and the new offset
+    """
+    transitions = []
+    day = 86400
+    start = first
+    offset = _utc_offset(start)
+    while start < last:
+        end = min(start + day, last)
+        if _utc_offset(end) != offset:
+            low, high = start, end
+            while high - low > 1:
+                middle = (low + high) // 2
+                if _utc_offset(middle) == offset:
+                    low = middle
+                else:
+                    high = middle
+            transitions.append((high, offset, _utc_offset(high)))
+            offset = _utc_offset(high)
+        start = end
+    return transitions
+
+
+def _local_offsets(naive_seconds):
+    """
+    Computes the offset between local time and UTC the way time.mktime does for naive timestamps.
+    Offset changes of the local time zone are searched once for the covered period instead of calling mktime per
+    value. Timestamps inside a skipped or repeated period are interpreted with the offset in effect before the change
+    (fold=0). time.mktime resolves them depending on its previous calls, so they are the only values that may differ
+    :param naive_seconds: Integer array with naive timestamps interpreted as seconds since epoch
+    :return: Integer array with the offsets in seconds
+    """
+    if len(naive_seconds) == 0:
+        return naive_seconds
+    first = int(naive_seconds.min()) - 86400
+    last = int(naive_seconds.max()) + 86400
+    offsets = np.full(len(naive_seconds), -_utc_offset(first), dtype=np.int64)
+    for moment, old_offset, new_offset in _local_offset_transitions(first, last):
+        offsets[naive_seconds >= moment + max(old_offset, new_offset)] = -new_offset
+    return offsets
+
+
+def column_to_epoch(column, time_format, utc=False):
+    """
+    Transforms a whole column of timestamps into unix timestamps at once
+    :param column: Series with timestamps. Empty cells stay empty
+    :param time_format: Format of the timestamps (see timestamp_format_kind)
+    :param utc: If True naive timestamps are interpreted as UTC and offsets (%z, %Z, ISO-8601) are applied. Otherwise
+    the wall-clock time of every timestamp is interpreted as local time like date_time_to_epoch does, offsets are
+    ignored
+    :return: Series with unix timestamps as floats
+    """
+    import pandas as pd
+
+    kind = timestamp_format_kind(time_format)
+    not_null = column.notna()
+    if not not_null.any():
+        return column
+    if kind == 'epoch':
+        return pd.to_numeric(column, errors='raise').astype(float)
+    if pd.api.types.is_numeric_dtype(column) or not pd.api.types.is_string_dtype(column[not_null]):
+        raise TypeError('Timestamps need to be strings')
+    if kind == 'aware' and not utc:
+        # Offsets may differ between rows, so the wall-clock time is evaluated per distinct value
+        values = column[not_null]
+        epochs = {value: date_time_to_epoch(value, time_format) for value in pd.unique(values)}
+        result = pd.Series(np.nan, index=column.index)
+        result[not_null] = values.map(epochs).astype(float)
+        return result
+    parsed = pd.to_datetime(column, format='ISO8601' if kind == 'iso8601' else time_format,
+                            utc=utc)
+    if parsed.dt.tz is not None:
+        if utc:
+            parsed = parsed.dt.tz_convert('UTC')
+        parsed = parsed.dt.tz_localize(None)
+    # Integer arithmetic truncates fractions of a second like timetuple() does
+    naive_seconds = ((parsed[not_null] - pd.Timestamp('1970-01-01')) // pd.Timedelta(seconds=1)).to_numpy(np.int64)
+    if not utc:
+        naive_seconds = naive_seconds + _local_offsets(naive_seconds)
+    result = pd.Series(np.nan, index=column.index)
+    result[not_null] = naive_seconds.astype(float)
+    return result
+
+
+def df_columns_to_epoch(dataframe, columns, date_time_format, utc=False):
     """
     Transforms columns in a dataframe to unix timestamp
     :param dataframe: The dataframe
     :param columns: List with column indexes
     :param date_time_format: List with timestamp formats
+    :param utc: If True timestamps without offset are interpreted as UTC and offsets are applied, otherwise the
+    wall-clock time of all timestamps is interpreted as local time and offsets are ignored, see column_to_epoch
     :return: Transformed dataframe
     """
     for i in range(len(columns)):
-        for j in range(len(dataframe.index)):
-            if not pd.isnull(dataframe.at[j, dataframe.columns[columns[i]]]):
-                dataframe.at[j, dataframe.columns[columns[i]]] = \
-                    date_time_to_epoch(dataframe.at[j, dataframe.columns[columns[i]]], date_time_format[i])
+        column_name = dataframe.columns[columns[i]]
+        dataframe[column_name] = column_to_epoch(dataframe[column_name], date_time_format[i], utc)
     return dataframe
 
 
-def get_tracedata_from_file(file, column_indexes):
+def get_tracedata_from_file(file, column_indexes, progress=None):
     """
-    Gets the relevant columns and adds each column as a separate list into the result list
+    Gets the relevant columns and adds each column as a separate NumPy array into the result list.
+    Only the selected columns are parsed, in chunks of csv_chunk_size rows (see config file). The whole columns are
+    kept in memory, as the statistics and the column-major JSON layout need them
     :param file: Tracefile the data shall be extracted from
     :param column_indexes: List of column indexes that shall be kept
-    :return: Columns of the original trace as lists
-    """
-    df = pd.read_csv(file, header=0, delimiter=',')
-    if columns_valid(column_indexes, len(df.columns)):
-        tracedata_list = []
-        column_names = []
-        for i in range(len(column_indexes)):
-            column_names.append(df.columns[column_indexes[i]])
-        df = df[column_names].copy()
-        for column in df:
-            tracedata_list.append(df[column].values.reshape(1, -1).ravel().tolist())
-        return tracedata_list
+    :param progress: Progress callback, see report_progress. Called after each chunk with the fraction of bytes read
+    :return: Columns of the original trace as NumPy arrays
+    """
+    import pandas as pd
+
+    column_amount = len(pd.read_csv(file, header=0, delimiter=',', nrows=0).columns)
+    if columns_valid(column_indexes, column_amount):
+        # usecols returns the columns in file order, positions map them back to the requested order
+        used_columns = sorted(column_indexes)
+        positions = [used_columns.index(index) for index in column_indexes]
+        chunks = [[] for _ in column_indexes]
+        size = max(os.path.getsize(file), 1)
+        with open(file, 'rb') as handle, \
+                pd.read_csv(handle, header=0, delimiter=',', usecols=used_columns,
+                            chunksize=config.getint('conversion', 'csv_chunk_size', fallback=1000000)) as reader:
+            for df in reader:
+                for i in range(len(positions)):
+                    # Copied, a view would keep the block of all columns of the chunk alive
+                    chunks[i].append(df.iloc[:, positions[i]].to_numpy(copy=True))
+                report_progress(progress, min(handle.tell() / size, 1.0))
+        columns = []
+        for i in range(len(chunks)):
+            # The dtype of a column is only known after its last chunk, like when pandas parses the whole file
+            columns.append(np.concatenate(chunks[i]) if chunks[i] else np.empty(0))
+            # Only one column exists twice at a time
+            chunks[i] = None
+        return columns
     else:
-        mb.showerror("Columns invalid", "Please specify valid columns")
-        raise
+        raise InvalidInputError("Columns invalid", "Please specify valid columns")
 
 
 def columns_valid(columns, size):
@@ -142,7 +550,8 @@ def columns_valid(columns, size):
     return True
 
 
-def convert_trace(input_file, indexes, data_desc, desc, source, user, additional_info, stat_format, result_filename):
+def convert_trace(input_file, indexes, data_desc, desc, source, user, additional_info, stat_format, result_filename,
+                  binary=False, progress=None):
     """
     Converts the input trace to standard format
     :param input_file: input trace
@@ -154,168 +563,414 @@ def convert_trace(input_file, indexes, data_desc, desc, source, user, additional
     :param additional_info: additional information about the trace
     :param stat_format: format string for statistical characteristics
     :param result_filename: result filename
-    :return: converted trace
-    """
-    trace_template["tracebody"]["tracedata"] = \
-        get_tracedata_from_file(input_file, indexes)
-    amount_tracedata = len(trace_template["tracebody"]["tracedata"][0])
-    trace_template["tracebody"]["tracedata description"] = data_desc
-    trace_template["traceheader"]["metainformation"]["original name"] = os.path.basename(input_file)
-    trace_template["traceheader"]["metainformation"]["description"] = desc
-    trace_template["traceheader"]["metainformation"]["source"] = source
-    trace_template["traceheader"]["metainformation"]["user"] = user
-    trace_template["traceheader"]["metainformation"]["additional information"] = additional_info
-    trace_template["traceheader"]["metainformation"]["creation time"] = str(datetime.datetime.now())
-    # Generates statistics and adds them into a list. Each list entry represents one column of the raw trace
-    if amount_tracedata > 4:
-        trace = generate_statistic(trace_template, stat_format)
+    :param binary: If True the trace is saved in the binary container instead of JSON
+    :param progress: Progress callback, see report_progress. The result file is only written if it doesn't cancel
+    :return: ConversionResult. Statistics are only computed if each column contains five or more elements
+    """
+    trace = Trace(
+        Traceheader(Metainformation(original_name=os.path.basename(input_file),
+                                    description=desc,
+                                    source=source,
+                                    user=user,
+                                    additional_information=additional_info,
+                                    creation_time=str(datetime.datetime.now()))),
+        Tracebody(data_desc))
+    # Tracedata and statistics only depend on the content of the file and the parameters in the key, a file
+    # converted before with other descriptions is not parsed again
+    cache_directory, cache_size = conversion_cache_settings()
+    key = None
+    entry = None
+    if cache_size > 0 and os.path.isfile(input_file):
+        median_strategy, median_error = median_settings()
+        key = cache.content_key(input_file, {"indexes": indexes, "statistics format": stat_format,
+                                             "median strategy": median_strategy, "median error": median_error},
+                                hash_algorithm())
+        entry = None if key is None else cache.load_entry(cache_directory, key)
+    if entry is not None:
+        trace.tracebody.tracedata = entry[0]
+        trace.traceheader.statistical_characteristics = \
+            StatisticalCharacteristics.from_dict(entry[1]["statistical characteristics"])
+        report_progress(progress, 0.9)
     else:
-        trace = trace_template
-        mb.showinfo("Statistics won't be computed", "Tracedata only contains " + str(amount_tracedata) +
-                    " elements per column. Computing statistics requires five or more.")
+        trace.tracebody.tracedata = get_tracedata_from_file(
+            input_file, indexes, lambda fraction: report_progress(progress, fraction, 0.0, 0.6))
+    amount_tracedata = len(trace.tracebody.tracedata[0])
+    # Generates statistics and adds them into a list. Each list entry represents one column of the raw trace
+    if entry is None and amount_tracedata > 4:
+        generate_statistic(trace, stat_format, lambda fraction: report_progress(progress, fraction, 0.6, 0.9))
+    if entry is None and key is not None and not cache.store_entry(
+            cache_directory, key, trace.tracebody.tracedata,
+            {"statistical characteristics": _fields_to_dict(trace.traceheader.statistical_characteristics)},
+            cache_size):
+        key = None
     # Save trace to file
-    with open(result_filename, 'w', newline='\n') as fp:
-        json.dump(trace, fp, indent='\t')
-    add_hash_value_to_trace(result_filename)
+    if binary or key is None:
+        save_trace(trace, result_filename, binary)
+    else:
+        _write_cached_json_trace(trace, result_filename, cache_directory, key, cache_size)
+    report_progress(progress, 1.0)
+    return ConversionResult(result_filename, trace, amount_tracedata > 4)
+
+
+def conversion_cache_settings():
+    """
+    :return: Directory and size limit in bytes of the conversion cache, see the [cache] section of the config file.
+    The size limit is 0 if the cache is disabled
+    """
+    directory = config.get('cache', 'conversion_cache_dir', fallback='') or \
+        os.path.join(os.path.expanduser('~'), '.cache', 'traceconverter')
+    return directory, int(config.getfloat('cache', 'conversion_cache_size', fallback=0) * 1e6)
+
 
+def _write_cached_json_trace(trace, filename, cache_directory, key, cache_size):
+    """
+    Writes a JSON trace like write_trace. The text of the tracedata is copied from the conversion cache entry of the
+    trace, or added to it if the entry doesn't have it yet
+    :param trace: Trace
+    :param filename: Result filename
+    :param cache_directory: Directory of the conversion cache
+    :param key: Key of the entry, see cache.content_key
+    :param cache_size: Size limit of the conversion cache in bytes
+    """
+    cached_filename = cache.entry_file(cache_directory, key, cache.JSON_TRACEDATA)
+    try:
+        cached = None if cached_filename is None else open(cached_filename, 'rb')
+    except OSError:
+        cached = None
+    if cached is not None:
+        with cached:
+            def copy_tracedata(write):
+                for block in iter(lambda: cached.read(COPY_BUFFER_SIZE), b''):
+                    write(block)
+            _write_json_trace(trace.to_dict(), filename, copy_tracedata)
+        return
+    write_tracedata = _tracedata_writer(trace.tracebody.tracedata)
+    with cache.new_entry_file(cache_directory, key, cache.JSON_TRACEDATA, cache_size) as cache_file:
+        def write_and_cache_tracedata(write):
+            def write_both(part):
+                if isinstance(part, str):
+                    part = part.encode('UTF-8')
+                write(part)
+                cache_file.write(part)
+            write_tracedata(write_both)
+        _write_json_trace(trace.to_dict(), filename, write_and_cache_tracedata)
 
-def extract_tracedata(tracename, result_filename, float_format_string):
+
+def tracedata_filename(filename, directory):
+    """
+    :param filename: Converted trace
+    :param directory: Directory of the tracedata file
+    :return: Filename the tracedata of the trace is extracted to, the suffix of the trace is replaced by
+    tracedata_file_suffix (see config file)
     """
-    Extracts tracedata from the file can be used for ProFiDo
+    name = os.path.basename(filename)
+    for key, fallback in (('trace_file_suffix', '_sf.json'), ('binary_trace_file_suffix', '_sf.bin')):
+        suffix = config.get('files', key, fallback=fallback)
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+            break
+    return os.path.join(directory, name + config.get('files', 'tracedata_file_suffix', fallback='_dat.trace'))
+
+
+def tracedata_up_to_date(filename, result_filename):
+    """
+    Decides like make whether the tracedata has to be extracted again
+    :param filename: Converted trace
+    :param result_filename: Tracedata file
+    :return: True if the tracedata file exists and is not older than the trace
+    """
+    try:
+        return os.stat(result_filename).st_mtime_ns >= os.stat(filename).st_mtime_ns
+    except FileNotFoundError:
+        return False
+
+
+def extract_tracedata(tracename, result_filename, float_format_string, progress=None):
+    """
+    Extracts tracedata from the file can be used for ProFiDo. An existing result file is overwritten.
+    Numerical tracedata is written in blocks of extract_chunk_size rows (see config file), binary traces are memory
+    mapped so only the block being written is in memory. Like a transposed DataFrame of the columns, rows with
+    missing values are left out and all values are written as floats if any column contains floats or the columns
+    differ in length
     :param float_format_string: Format string for tracedata
     :param result_filename: Name for the tracedata file
     :param tracename: Name of the converted tracefile
+    :param progress: Progress callback, see report_progress. The partly written result file is removed if it cancels
     """
+    tracedata = load_trace(tracename, memory_map=True).tracebody.tracedata
+    columns = [np.asarray(column) for column in tracedata]
     try:
-        with open(tracename, newline='\n') as tr:
-            tracedata = json.load(tr)["tracebody"]["tracedata"]
-            df = pd.DataFrame(tracedata)
-            write_file = 1
-            if os.path.exists(result_filename):
-                write_file = mb.askyesno("File already exists", os.path.basename(result_filename) +
-                                         " already exists. \n Would you like to overwrite it?")
-            if write_file:
-                try:
-                    df = df.transpose().dropna()
-                    if len(float_format_string) > 0:
-                        df.to_csv(result_filename, sep='\t', float_format=float_format_string, index=False,
-                                  header=False)
-                    if len(float_format_string) == 0:
-                        df.to_csv(result_filename, sep='\t', index=False, header=False)
-                except TypeError:
-                    mb.showerror('Invalid float format string', 'Please enter a valid format string')
-                except ValueError:
-                    mb.showerror('Invalid float format string', 'Please enter a valid format string')
-                except FileNotFoundError:
-                    mb.showerror('Invalid Path or Filename', 'Please check if the result path and filename are valid')
-    except json.decoder.JSONDecodeError:
-        mb.showerror('Invalid Trace', 'The selected file is not a valid Trace')
+        if len(columns) == 0 or any(column.dtype.kind not in 'biuf' for column in columns):
+            # Non-numerical tracedata, pandas decides about the types
+            import pandas as pd
+
+            with open(result_filename, 'w', newline='') as result_file:
+                pd.DataFrame(tracedata).transpose().dropna().to_csv(
+                    result_file, sep='\t', float_format=float_format_string or None, index=False, header=False)
+            report_progress(progress, 1.0)
+            return
+        lengths = set(map(len, columns))
+        # Shorter columns would be padded with NaN, their rows are dropped anyway
+        rows = min(lengths)
+        dtype = np.result_type(*columns) if len(lengths) == 1 else np.dtype(np.float64)
+        chunk_size = config.getint('conversion', 'extract_chunk_size', fallback=65536)
+        with open(result_filename, 'wb') as result_file:
+            for start in range(0, rows, chunk_size):
+                stop = min(start + chunk_size, rows)
+                block = np.empty((stop - start, len(columns)), dtype=dtype)
+                for i, column in enumerate(columns):
+                    block[:, i] = column[start:stop]
+                if dtype.kind == 'f':
+                    block = block[~np.isnan(block).any(axis=1)]
+                result_file.write(formatting.format_rows(block, float_format_string))
+                report_progress(progress, stop / rows)
+    except OperationCancelled:
+        os.remove(result_filename)
+        raise
+    except (TypeError, ValueError):
+        raise InvalidInputError('Invalid float format string', 'Please enter a valid format string')
     except FileNotFoundError:
-        mb.showerror('Could not find trace', 'Please check if path and filename are valid')
+        raise InvalidInputError('Invalid Path or Filename', 'Please check if the result path and filename are valid')
 
 
-def generate_statistic(trace, formatstring):
+def statistics_workers(tracedata):
     """
-    Computes the statistics for the trace
-    :param trace: Tracefile to compute from and add the statistics to
+    :param tracedata: List of columns
+    :return: Number of processes computing the statistics, see workers and parallel_min_values in the config file
+    """
+    workers = config.getint('statistics', 'workers', fallback=1) or os.cpu_count() or 1
+    if sum(len(column) for column in tracedata) < config.getint('statistics', 'parallel_min_values',
+                                                                fallback=4000000):
+        return 1
+    return workers
+
+
+def median_settings(median_strategy=None, median_error=None):
+    """
+    :param median_strategy: 'exact' or 'approximate', median_strategy of the config file if None
+    :param median_error: Normalized rank error of approximate medians, median_error of the config file if None
+    :return: Strategy and error, the error is 0 for exact medians
+    """
+    if median_strategy is None:
+        median_strategy = config.get('statistics', 'median_strategy', fallback='exact')
+    if median_strategy not in stats.MEDIAN_STRATEGIES:
+        raise InvalidInputError('Median strategy invalid', 'The median strategy must be one of ' +
+                                ', '.join(stats.MEDIAN_STRATEGIES))
+    if median_strategy == 'exact':
+        return median_strategy, 0.0
+    if median_error is None:
+        median_error = config.getfloat('statistics', 'median_error', fallback=0.01)
+    if not 0 < median_error < 0.5:
+        raise InvalidInputError('Median error invalid', 'The rank error of the median must be between 0 and 0.5')
+    return median_strategy, median_error
+
+
+def compute_statistics(tracedata, formatstring, progress=None, median_strategy=None, median_error=None):
+    """
+    Computes the statistics for tracedata without modifying anything else
+    :param tracedata: List of columns
     :param formatstring: For formatting the computed values
+    :param progress: Progress callback, see report_progress. Called after each column
+    :param median_strategy: 'exact' or 'approximate', see median_settings
+    :param median_error: Normalized rank error of approximate medians, see median_settings
+    :return: StatisticalCharacteristics
+    """
+    median_strategy, median_error = median_settings(median_strategy, median_error)
+    return _formatted_statistics(_column_results(tracedata, median_strategy, median_error, progress), formatstring,
+                                 median_strategy, median_error)
+
+
+def _column_results(tracedata, median_strategy, median_error, progress=None):
     """
-    # Clear statistic lists so the next trace won't have old values
-    statistics = trace["traceheader"]["statistical characteristics"]
-    for statistic in trace["traceheader"]["statistical characteristics"]:
-        trace["traceheader"]["statistical characteristics"][statistic] = []
+    :param tracedata: List of columns
+    :param median_strategy: Median strategy, see median_settings
+    :param median_error: Normalized rank error of approximate medians, see median_settings
+    :param progress: Progress callback, see report_progress. Called after each column
+    :return: List with the result of stats.column_statistics of each column, with state
+    """
+    finished = []
+
+    def column_finished(i):
+        finished.append(i)
+        report_progress(progress, len(finished) / len(tracedata))
     try:
-        for i in range(len(trace["tracebody"]["tracedata"])):
-            df = pd.DataFrame(trace["tracebody"]["tracedata"][i])
-            statistics["mean"].append(format(df[0].mean(), formatstring))
-            statistics["median"].append(format(df[0].median(), formatstring))
-            statistics["skewness"].append(format(df[0].skew(), formatstring))
-            statistics["kurtosis"].append(format(df[0].kurtosis(), formatstring))
-            statistics["autocorrelation"].append(format(df[0].autocorr(), formatstring))
-            statistics["variance"].append(format(df[0].var(), formatstring))
-        return trace
+        return stats.columns_statistics(tracedata, statistics_workers(tracedata), median_strategy, column_finished,
+                                        stats.sketch_size(median_error) if median_error else 200, state=True)
     except TypeError:
-        mb.showerror("Type Error", "One of the selected columns does not contain valid data")
-        raise
-    except (KeyError, IndexError):
-        mb.showerror("Format Error", "Invalid Numerical Format entered")
-        raise
+        raise InvalidDataError("Type Error", "One of the selected columns does not contain valid data")
+    except (KeyError, IndexError, ValueError):
+        raise InvalidInputError("Format Error", "Invalid Numerical Format entered")
+
+
+def _formatted_statistics(results, formatstring, median_strategy, median_error):
+    """
+    :param results: List with the result of stats.column_statistics of each column, with state
+    :param formatstring: For formatting the computed values
+    :param median_strategy: Median strategy the results were computed with
+    :param median_error: Median error the results were computed with
+    :return: StatisticalCharacteristics
+    """
+    statistics = StatisticalCharacteristics(median_strategy=median_strategy, median_error=median_error)
+    try:
+        _add_column_statistics(statistics, results, formatstring)
+    except (KeyError, IndexError, ValueError):
+        raise InvalidInputError("Format Error", "Invalid Numerical Format entered")
+    return statistics
+
+
+def _add_column_statistics(statistics, results, formatstring):
+    """
+    :param statistics: StatisticalCharacteristics the formatted statistics and the sufficient statistics are
+    appended to
+    :param results: List with the result of stats.column_statistics of each column, with state
+    :param formatstring: For formatting the computed values
+    """
+    for column_statistics in results:
+        for statistic in stats.STATISTIC_NAMES:
+            getattr(statistics, statistic).append(format(column_statistics[statistic], formatstring))
+        statistics.sufficient_statistics.append(column_statistics["state"])
+
+
+def generate_statistic(trace, formatstring, progress=None):
+    """
+    Computes the statistics for the trace and replaces the old ones
+    :param trace: Trace to compute from and add the statistics to
+    :param formatstring: For formatting the computed values
+    :param progress: Progress callback, see report_progress
+    :return: The passed trace
+    """
+    trace.traceheader.statistical_characteristics = compute_statistics(trace.tracebody.tracedata, formatstring,
+                                                                       progress)
+    return trace
 
 
-def filter_traces_by_expression(selected_files, expression, selected_filenames):
+def statistics_table(selected_files):
+    """
+    Parses the statistics of the selected files into one table, it can be reused for several filter expressions
+    :param selected_files: List with the statistical characteristics of each trace as dictionaries
+    :return: Table for filter_traces_by_expression
     """
-    filters the selected files with the expression
+    try:
+        return tracefilter.statistics_table(selected_files)
+    except ValueError as error:
+        raise InvalidTraceError('Invalid Trace', 'Trace number ' + str(error.args[0] + 1) +
+                                ' contains invalid statistics')
+
+
+def filter_traces_by_expression(selected_files, expression, selected_filenames, table=None):
+    """
+    filters the selected files with the expression. The expression is parsed once and evaluated for all tracedata
+    columns at once, only statistic names, numbers, arithmetic, comparisons, and/or/not and abs/min/max are allowed
     :param selected_files: set of files to filter from
     :param expression: expression to filter by
     :param selected_filenames: names of selected files
+    :param table: Result of statistics_table for the selected files, it is created if None
     :return: results of filtering
     """
+    try:
+        mask = tracefilter.compile_expression(expression)
+    except (SyntaxError, ValueError):
+        raise InvalidInputError("Expression invalid", "Please enter a valid expression")
+    if table is None:
+        table = statistics_table(selected_files)
     filter_results = []
-    for i in range(len(selected_files)):
-        for j in range(len(selected_files[i]["mean"])):
-            try:
-                mean = float(selected_files[i]["mean"][j])
-                median = float(selected_files[i]["median"][j])
-                skewness = float(selected_files[i]["skewness"][j])
-                kurtosis = float(selected_files[i]["kurtosis"][j])
-                autocorrelation = float(selected_files[i]["autocorrelation"][j])
-                variance = float(selected_files[i]["variance"][j])
-            except ValueError:
-                mb.showerror('Invalid Trace', 'Trace number ' + str(i + 1) + ' contains invalid statistics')
-                return
-            try:
-                if eval(expression):
-                    trace = [os.path.basename(os.path.dirname((selected_filenames[i]))) +
-                             '/' + os.path.basename((selected_filenames[i])),
-                             mean,
-                             median,
-                             skewness,
-                             kurtosis,
-                             autocorrelation,
-                             variance
-                             ]
-                    filter_results.append(trace)
-            except (NameError, SyntaxError):
-                mb.showerror("Expression invalid", "Please enter a valid expression")
-                raise
+    for row in np.flatnonzero(mask(table)):
+        i = table["trace"][row]
+        filter_results.append([os.path.basename(os.path.dirname((selected_filenames[i]))) +
+                               '/' + os.path.basename((selected_filenames[i]))] +
+                              [float(table[statistic][row]) for statistic in stats.STATISTIC_NAMES])
     return filter_results
 
 
-def hash_from_trace(filename):
+def hash_algorithm():
+    """
+    :return: Algorithm new hash values are computed with, see algorithm in the hashing section of the config file
+    """
+    algorithm = config.get('hashing', 'algorithm', fallback=hashing.DEFAULT_ALGORITHM)
+    try:
+        hashing.new_hash(algorithm)
+    except ValueError as error:
+        raise InvalidInputError('Hash algorithm invalid', str(error) + ". Available: " +
+                                ', '.join(hashing.available_algorithms()))
+    return algorithm
+
+
+def _check_hash_algorithm(algorithm):
+    """
+    :param algorithm: Hash algorithm recorded in a trace
+    """
+    try:
+        hashing.new_hash(algorithm)
+    except ValueError as error:
+        raise InvalidTraceError('Hash algorithm unavailable', str(error))
+
+
+def _stored_hash(filename, progress=None):
+    """
+    Reads the stored hash value of a trace and computes the hash value of its content with the same algorithm
+    :param filename: Converted trace
+    :param progress: Progress callback, see report_progress
+    :return: HashCheckResult
+    """
+    if tracebin.is_binary_trace(filename):
+        metainformation = tracebin.read_binary_header(filename)[0]["traceheader"]["metainformation"]
+        _check_hash_algorithm(metainformation.get("hash algorithm", hashing.DEFAULT_ALGORITHM))
+        return HashCheckResult(metainformation["hash value"], tracebin.hash_from_binary_trace(filename, progress))
+    metainformation = _read_json_traceheader(filename)["metainformation"]
+    stored_hash = metainformation["hash value"]
+    with open(filename, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapping:
+        excluded = _json_hash_range(mapping, metainformation)
+    if excluded is None:
+        return HashCheckResult(stored_hash, hashing.legacy_hash(filename))
+    algorithm = metainformation.get("hash algorithm", hashing.DEFAULT_ALGORITHM)
+    _check_hash_algorithm(algorithm)
+    return HashCheckResult(stored_hash, hashing.hash_file(filename, excluded, algorithm, progress))
+
+
+def _json_hash_range(mapping, metainformation):
+    """
+    :param mapping: mmap of a JSON trace
+    :param metainformation: Metainformation of the trace as dictionary
+    :return: Byte range of the line with the hash value, which is left out of the hash. None if the trace has to
+    be hashed line by line like older versions did, see hashing.legacy_hash
+    """
+    field = mapping.find(b'"hash value": "')
+    # Older traces left out every line containing 'hash value', which is the same as leaving out the byte range if
+    # the line with the hash value is the only one
+    if "hash algorithm" not in metainformation and \
+            (field < 0 or mapping.find(b'hash value') != field + 1 or mapping.find(b'hash value', field + 2) >= 0):
+        return None
+    if field < 0:
+        raise ValueError("Trace has no hash value")
+    line_end = mapping.find(b'\n', field)
+    return mapping.rfind(b'\n', 0, field) + 1, len(mapping) if line_end < 0 else line_end + 1
+
+
+def hash_from_trace(filename, progress=None):
     """
-    Computes hash value for a given file
+    Computes hash value for a given file with the algorithm recorded in it. The line with the hash value is left
+    out of JSON traces, the bytes of the hash value are left out of binary traces
     :param filename: Input file
+    :param progress: Progress callback, see report_progress
     :return: Computed hash value
     """
-    sha256_hash = hashlib.sha256()
-    with open(filename, "r", newline='\n') as file:
-        for line in file:
-            if 'hash value' not in line:
-                sha256_hash.update(line.encode('UTF-8'))
-        return sha256_hash.hexdigest()
+    return hash_check(filename, progress).computed_hash
 
 
-def hash_check(filename):
+def hash_check(filename, progress=None):
     """
-    Computes hash for the input file and compares it to the stored hash inside the file
+    Computes hash for the input file and compares it to the stored hash inside the file. The file is read once
+    in large chunks
     :param filename: Input file
+    :param progress: Progress callback, see report_progress
+    :return: HashCheckResult
     """
-    if os.path.isfile(filename) and pathlib.Path(filename).suffix == ".json":
-        try:
-            with open(filename, newline='\n') as file:
-                tracedata = json.load(file)
-                stored_hash = tracedata["traceheader"]["metainformation"]["hash value"]
-                computed_hash = hash_from_trace(filename)
-            if stored_hash == computed_hash:
-                tkinter.messagebox.showinfo("Hash value check succeeded",
-                                            "The stored and the computed hash value are equal")
-            else:
-                tkinter.messagebox.showinfo("Hash value check failed", "Stored Hash value: " + stored_hash + "\n" +
-                                            "Computed Hash value: " + hash_from_trace(filename))
-        except json.decoder.JSONDecodeError:
-            mb.showerror("Trace content invalid", "Please check if the trace content is valid")
-    else:
-        mb.showerror("Trace invalid", "Please check if the file is valid")
+    if not is_trace_file(filename):
+        raise InvalidTraceError("Trace invalid", "Please check if the file is valid")
+    try:
+        return _stored_hash(filename, progress)
+    except (ValueError, KeyError, TypeError):
+        raise InvalidTraceError("Trace content invalid", "Please check if the trace content is valid")
 
 
 def add_hash_value_to_trace(filename):
@@ -323,105 +978,898 @@ def add_hash_value_to_trace(filename):
     Adds hash value to metainformation
     :param filename: File the hash will be computed for
     """
-    with open(filename, newline='\n') as tr:
-        tracedata = json.load(tr)
-        tracedata["traceheader"]["metainformation"]["hash value"] = hash_from_trace(filename)
-    with open(filename, 'w', newline='\n') as fp:
-        json.dump(tracedata, fp, indent='\t')
+    save_trace(load_trace(filename), filename, tracebin.is_binary_trace(filename))
+
+
+def _tracedata_values(column, level, chunk_size=65536):
+    """
+    Serializes the values of a tracedata column piece by piece, with the same layout as json.dump with indent='\\t'
+    :param column: List or NumPy array with the values of the column
+    :param level: Indentation level of the column
+    :param chunk_size: Number of values serialized at once
+    :return: Generator of strings, the values without brackets and without indentation before the first value
+    """
+    separator = ',\n' + '\t' * (level + 1)
+    for start in range(0, len(column), chunk_size):
+        chunk = column[start:start + chunk_size]
+        if isinstance(chunk, np.ndarray):
+            chunk = chunk.tolist()
+        if start > 0:
+            yield separator
+        # json.dumps encodes numbers in C, its ', ' separators are replaced by the indented layout
+        yield json.dumps(chunk)[1:-1].replace(', ', separator)
+
+
+def _tracedata_column_chunks(column, level, chunk_size=65536):
+    """
+    Serializes a tracedata column piece by piece, with the same layout as json.dump with indent='\\t'
+    :param column: List or NumPy array with the values of the column
+    :param level: Indentation level of the column
+    :param chunk_size: Number of values serialized at once
+    :return: Generator of strings
+    """
+    if len(column) == 0:
+        yield '\t' * level + '[]'
+        return
+    yield '\t' * level + '[\n' + '\t' * (level + 1)
+    yield from _tracedata_values(column, level, chunk_size)
+    yield '\n' + '\t' * level + ']'
+
+
+def write_trace(trace, filename):
+    """
+    Writes a trace in standard format and stores its hash value in a single pass.
+    The traceheader is written with a placeholder for the hash value, the tracedata is serialized column by column
+    while it is hashed and the placeholder is overwritten at the end. The file is identical to json.dump with
+    indent='\\t' followed by add_hash_value_to_trace
+    :param trace: Trace or trace as dictionary. Tracedata columns may be lists or NumPy arrays
+    :param filename: Result filename
+    """
+    if isinstance(trace, Trace):
+        trace = trace.to_dict()
+    _write_json_trace(trace, filename, _tracedata_writer(trace["tracebody"]["tracedata"]))
+
+
+def _tracedata_writer(tracedata):
+    """
+    :param tracedata: Tracedata columns as lists or NumPy arrays
+    :return: Function for _write_json_trace that writes the tracedata like json.dump with indent='\\t'
+    """
+    def write_tracedata(write):
+        if len(tracedata) == 0:
+            write('[]')
+            return
+        write('[\n')
+        for i in range(len(tracedata)):
+            if i > 0:
+                write(',\n')
+            for part in _tracedata_column_chunks(tracedata[i], 3):
+                write(part)
+        write('\n\t\t]')
+    return write_tracedata
+
+
+def _write_json_trace(trace, filename, write_tracedata):
+    """
+    Writes a trace in standard format like write_trace, the tracedata is written by a function
+    :param trace: Trace as dictionary, its tracedata is not used
+    :param filename: Result filename
+    :param write_tracedata: Called with a function that writes and hashes a string or bytes
+    """
+    algorithm = hash_algorithm()
+    hash_object = hashing.new_hash(algorithm)
+    placeholder = '0' * hash_object.digest_size * 2
+    tracedata_marker = '\0tracedata\0'
+    header = dict(trace)
+    header["traceheader"] = dict(trace["traceheader"])
+    header["tracebody"] = dict(trace["tracebody"])
+    header["traceheader"]["metainformation"] = dict(trace["traceheader"]["metainformation"])
+    header["traceheader"]["metainformation"]["hash value"] = placeholder
+    header["traceheader"]["metainformation"]["hash algorithm"] = algorithm
+    header["tracebody"]["tracedata"] = tracedata_marker
+    text = json.dumps(header, indent='\t')
+    hash_field = '\n\t\t\t"hash value": "'
+    hash_offset = text.index(hash_field + placeholder) + len(hash_field)
+    # The whole line with the hash value is left out of the hash, see hashing
+    hash_line_end = text.index('\n', hash_offset) + 1
+    before_tracedata, after_tracedata = text.split(json.dumps(tracedata_marker))
+    with open(filename, 'wb') as fp:
+        def write(part):
+            if isinstance(part, str):
+                part = part.encode('UTF-8')
+            hash_object.update(part)
+            fp.write(part)
+
+        hash_object.update(before_tracedata[:hash_offset - len(hash_field) + 1].encode('UTF-8'))
+        hash_object.update(before_tracedata[hash_line_end:].encode('UTF-8'))
+        fp.write(before_tracedata.encode('UTF-8'))
+        write_tracedata(write)
+        write(after_tracedata)
+        fp.seek(hash_offset)
+        fp.write(hash_object.hexdigest().encode('UTF-8'))
+
+
+def _skip_whitespace_backwards(mapping, position):
+    """
+    :param mapping: mmap of a file
+    :param position: Byte offset
+    :return: Offset right after the last byte before position that is not whitespace
+    """
+    while position > 0 and mapping[position - 1] in b' \t\r\n':
+        position -= 1
+    return position
 
 
-def verify_statistics(converted_trace_file, tolerance):
+def _json_tracedata_ranges(mapping):
+    """
+    Finds the tracedata columns of a JSON trace that ends with its tracedata, like write_trace writes it. Numbers
+    don't contain brackets, so the columns are found by their brackets from the end of the file on
+    :param mapping: mmap of a JSON trace with numerical tracedata
+    :return: Trace as dictionary with empty tracedata and a list with the offsets of '[' and ']' of each column,
+    None if the trace doesn't end with its tracedata
+    """
+    ends = []
+    position = len(mapping)
+    for character in b'}}]':
+        position = _skip_whitespace_backwards(mapping, position) - 1
+        if position < 0 or mapping[position] != character:
+            return None
+        ends.append(position)
+    columns = []
+    position = _skip_whitespace_backwards(mapping, ends[-1])
+    while position > 0 and mapping[position - 1] == ord(']'):
+        column_end = position - 1
+        column_start = mapping.rfind(b'[', 0, column_end)
+        if column_start < 0:
+            return None
+        columns.append((column_start, column_end))
+        position = _skip_whitespace_backwards(mapping, column_start)
+        if position > 0 and mapping[position - 1] == ord(','):
+            position = _skip_whitespace_backwards(mapping, position - 1)
+        elif position == 0 or mapping[position - 1] != ord('['):
+            return None
+    if position == 0 or mapping[position - 1] != ord('['):
+        return None
+    try:
+        document = json.loads(mapping[:position] + b']' + mapping[ends[-1] + 1:])
+        if document["tracebody"]["tracedata"] != []:
+            return None
+    except (ValueError, KeyError, TypeError):
+        return None
+    return document, columns[::-1]
+
+
+def verify_statistics(converted_trace_file, tolerance, progress=None):
     """
     Checks if the statistics of the trace are valid
     :param tolerance: relative tolerance
     :param converted_trace_file: An already converted trace
+    :param progress: Progress callback, see report_progress
+    :return: StatisticsCheckResult
     """
-    if os.path.isfile(converted_trace_file) and pathlib.Path(converted_trace_file).suffix == ".json":
-        try:
-            try:
-                tolerance = float(tolerance)
-                if tolerance < 0 or tolerance > 1:
-                    mb.showerror('Tolerance must be between 0 and 1', 'Please enter a value between 0 and 1')
+    if not is_trace_file(converted_trace_file):
+        raise InvalidTraceError("Trace invalid", "Please check if the file is valid")
+    tolerance = _relative_tolerance(tolerance)
+    saved = read_traceheader(converted_trace_file).statistical_characteristics
+    approximate = saved.median_strategy == 'approximate'
+    median_strategy, median_error = median_settings(saved.median_strategy, saved.median_error if approximate else None)
+    try:
+        # Approximate medians are checked by their rank in the column, see _column_mismatches
+        checked_medians = [float(median) for median in saved.median] if approximate else []
+        results = _memoized_column_results(converted_trace_file, median_strategy, median_error, checked_medians,
+                                           lambda fraction: report_progress(progress, fraction, 0.0, 0.8))
+        comp = _formatted_statistics(results, '', median_strategy, median_error)
+        mismatches = []
+        for i in range(len(comp.mean)):
+            mismatches.extend(_column_mismatches(saved, comp, i, tolerance, lambda: results[i]["median rank error"]))
+            report_progress(progress, (i + 1) / len(comp.mean), 0.8, 1.0)
+        return StatisticsCheckResult(tuple(mismatches))
+    except (ValueError, IndexError):
+        raise InvalidTraceError('Invalid Trace', 'Trace contains invalid statistics')
+
+
+def statistics_memo_settings():
+    """
+    :return: Number of traces whose statistics are kept in memory and suffix of the sidecar files, None if no
+    sidecar files are used. See memo_size, sidecar and sidecar_suffix in the statistics section of the config file
+    """
+    sidecar = config.getboolean('statistics', 'sidecar', fallback=False)
+    return config.getint('statistics', 'memo_size', fallback=16), \
+        config.get('statistics', 'sidecar_suffix', fallback='.statistics') if sidecar else None
+
+
+def _statistics_key(filename, median_strategy, median_error):
+    """
+    :param filename: Converted trace
+    :param median_strategy: Median strategy of the statistics
+    :param median_error: Median error of the statistics
+    :return: Key of the statistics of the trace in the statistics memo, computed from the bytes of its tracedata.
+    None if the tracedata can't be found
+    """
+    try:
+        if tracebin.is_binary_trace(filename):
+            header, data_start, hash_range = tracebin.read_binary_header(filename)
+            layout = header["tracebody"]["tracedata"]
+        else:
+            with open(filename, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapping:
+                data_start = _json_tracedata_start(mapping)
+            layout = "json"
+        if data_start is None:
+            return None
+        tracedata_hash = hashing.hash_file(filename, (0, data_start))
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    return _statistics_memo_key(tracedata_hash, layout, median_strategy, median_error)
+
+
+def _statistics_memo_key(tracedata_hash, layout, median_strategy, median_error):
+    """
+    :param tracedata_hash: SHA-256 value of the bytes from the start of the tracedata to the end of the trace
+    :param layout: Column descriptors of a binary trace, "json" for JSON traces
+    :param median_strategy: Median strategy of the statistics
+    :param median_error: Median error of the statistics
+    :return: Key of the statistics in the statistics memo
+    """
+    return cache.statistics_key(tracedata_hash, {"tracedata": layout, "median strategy": median_strategy,
+                                                 "median error": median_error})
+
+
+def _memoized_column_results(filename, median_strategy, median_error, checked_medians=(), progress=None,
+                             trace=None):
+    """
+    Statistics of the tracedata of a trace. They are taken from the statistics memo if they were computed before
+    from the same tracedata, otherwise they are computed and added to it
+    :param filename: Converted trace
+    :param median_strategy: Median strategy, see median_settings
+    :param median_error: Normalized rank error of approximate medians, see median_settings
+    :param checked_medians: List with a median per column whose rank error is needed, see stats.median_rank_error
+    :param progress: Progress callback, see report_progress
+    :param trace: The trace loaded from filename, it is loaded if needed and None
+    :return: List with the result of stats.column_statistics of each column, with state. The rank error of the
+    checked median of a column is added under "median rank error"
+    """
+    memo_size, sidecar_suffix = statistics_memo_settings()
+    key = _statistics_key(filename, median_strategy, median_error) if memo_size > 0 or sidecar_suffix else None
+    sidecar = None if key is None or sidecar_suffix is None else filename + sidecar_suffix
+    entry = None if key is None else cache.memoized_statistics(key, memo_size, sidecar)
+    if entry is None or any(repr(median) not in rank_errors
+                            for median, rank_errors in zip(checked_medians, entry["rank errors"])):
+        if trace is None:
+            trace = load_trace(filename, memory_map=True)
+        tracedata = trace.tracebody.tracedata
+        if entry is None:
+            entry = {"statistics": _column_results(tracedata, median_strategy, median_error, progress),
+                     "rank errors": [{} for _ in tracedata]}
+        else:
+            entry = {"statistics": entry["statistics"],
+                     "rank errors": [dict(rank_errors) for rank_errors in entry["rank errors"]]}
+        for median, rank_errors, column in zip(checked_medians, entry["rank errors"], tracedata):
+            if repr(median) not in rank_errors:
+                rank_errors[repr(median)] = stats.median_rank_error(column, median)
+        if key is not None:
+            cache.memoize_statistics(key, entry, memo_size, sidecar)
+    report_progress(progress, 1.0)
+    results = [dict(column_statistics) for column_statistics in entry["statistics"]]
+    for median, rank_errors, column_statistics in zip(checked_medians, entry["rank errors"], results):
+        column_statistics["median rank error"] = rank_errors[repr(median)]
+    return results
+
+
+def _relative_tolerance(tolerance):
+    """
+    :param tolerance: Relative tolerance of the statistics as entered
+    :return: Tolerance as float
+    """
+    try:
+        tolerance = float(tolerance)
+    except ValueError:
+        raise InvalidInputError('Tolerance Entry invalid', 'Please enter a valid float')
+    if tolerance < 0 or tolerance > 1:
+        raise InvalidInputError('Tolerance must be between 0 and 1', 'Please enter a value between 0 and 1')
+    return tolerance
+
+
+def _column_mismatches(saved, computed, i, tolerance, rank_error):
+    """
+    Compares the stored statistics of a column with the computed ones. Approximate medians are computed the same
+    way again, but checked by their rank in the column: a stored median is valid if it is within the recorded rank
+    error of the true median
+    :param saved: Stored StatisticalCharacteristics
+    :param computed: StatisticalCharacteristics computed with the median strategy of the stored ones
+    :param i: Index of the column
+    :param tolerance: Relative tolerance
+    :param rank_error: Called without arguments for the rank error of the stored approximate median, see
+    stats.median_rank_error
+    :return: List of StatisticMismatch
+    """
+    mismatches = []
+    for statistic in stats.STATISTIC_NAMES:
+        value = getattr(computed, statistic)[i]
+        stored = getattr(saved, statistic)[i]
+        if statistic == 'median' and saved.median_strategy == 'approximate':
+            error = rank_error()
+            if not error <= saved.median_error:
+                mismatches.append(StatisticMismatch(statistic, i, str(value) + " (rank error of the stored value " +
+                                                    format(error, '.4f') + ")", str(stored)))
+        elif not math.isclose(float(value), float(stored), rel_tol=tolerance):
+            mismatches.append(StatisticMismatch(statistic, i, str(value), str(stored)))
+    return mismatches
+
+
+def validate_trace(filename, tolerance, progress=None):
+    """
+    Checks hash value and statistics of a trace like hash_check and verify_statistics, but reads the file only
+    once: each chunk read is hashed and its tracedata values are passed on to the statistics of their columns.
+    JSON traces that are hashed line by line like older versions did are checked by hash_check and
+    verify_statistics, just like JSON traces whose tracedata can't be parsed piece by piece
+    :param filename: Converted trace
+    :param tolerance: Relative tolerance for the statistics, see verify_statistics
+    :param progress: Progress callback, see report_progress
+    :return: ValidationResult
+    """
+    if not is_trace_file(filename):
+        raise InvalidTraceError("Trace invalid", "Please check if the file is valid")
+    tolerance = _relative_tolerance(tolerance)
+    try:
+        binary = tracebin.is_binary_trace(filename)
+        if binary:
+            header, data_start, excluded = tracebin.read_binary_header(filename)
+            traceheader = header["traceheader"]
+        else:
+            traceheader = _read_json_traceheader(filename)
+            with open(filename, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapping:
+                excluded = _json_hash_range(mapping, traceheader["metainformation"])
+                tracedata_start = _json_tracedata_start(mapping)
+        metainformation = traceheader["metainformation"]
+        stored_hash = metainformation["hash value"]
+        saved = _fields_from_dict(StatisticalCharacteristics, traceheader["statistical characteristics"])
+    except (ValueError, KeyError, TypeError):
+        raise InvalidTraceError("Trace content invalid", "Please check if the trace content is valid")
+    if not binary and (excluded is None or tracedata_start is None):
+        return ValidationResult(hash_check(filename, lambda fraction: report_progress(progress, fraction, 0.0, 0.5)),
+                                verify_statistics(filename, tolerance,
+                                                  lambda fraction: report_progress(progress, fraction, 0.5, 1.0)))
+    algorithm = metainformation.get("hash algorithm", hashing.DEFAULT_ALGORITHM)
+    _check_hash_algorithm(algorithm)
+    approximate = saved.median_strategy == 'approximate'
+    median_strategy, median_error = median_settings(saved.median_strategy,
+                                                    saved.median_error if approximate else None)
+    # The statistics are added to the statistics memo, so restoring the traceheader afterwards doesn't compute them
+    memo_size, sidecar_suffix = statistics_memo_settings()
+    tracedata_hash = hashing.new_hash(hashing.DEFAULT_ALGORITHM) if memo_size > 0 or sidecar_suffix else None
+    tracedata_range = (0, data_start if binary else tracedata_start)
+
+    def column_statistics(i, length):
+        return stats.StreamedColumnStatistics(median_strategy,
+                                              stats.sketch_size(median_error) if median_error else 200, length,
+                                              float(saved.median[i]) if approximate else None)
+    try:
+        if binary:
+            reader = _BinaryTracedataReader(header["tracebody"]["tracedata"], data_start, column_statistics)
+        else:
+            reader = _JsonTracedataReader(tracedata_start, column_statistics)
+        hash_object = hashing.new_hash(algorithm)
+        position = 0
+        with open(filename, 'rb', buffering=0) as file:
+            size = max(file.seek(0, 2), 1)
+            file.seek(0)
+            for chunk in hashing.read_chunks(file):
+                hashing.update_hash(hash_object, chunk, position, excluded)
+                if tracedata_hash is not None:
+                    hashing.update_hash(tracedata_hash, chunk, position, tracedata_range)
+                reader.feed(chunk, position)
+                position += len(chunk)
+                report_progress(progress, min(position / size, 1.0), 0.0, 0.95)
+        results = [column.result() for column in reader.finish(position)]
+    except TypeError:
+        raise InvalidDataError("Type Error", "One of the selected columns does not contain valid data")
+    except (ValueError, KeyError, IndexError):
+        if not binary:
+            # Not written like write_trace does, the whole tracedata is parsed instead
+            return ValidationResult(hash_check(filename), verify_statistics(filename, tolerance, progress))
+        raise InvalidTraceError("Trace content invalid", "Please check if the trace content is valid")
+    if tracedata_hash is not None:
+        cache.memoize_statistics(
+            _statistics_memo_key(tracedata_hash.hexdigest(), header["tracebody"]["tracedata"] if binary else "json",
+                                 median_strategy, median_error),
+            {"statistics": [{name: value for name, value in column_statistics.items() if name != "median rank error"}
+                            for column_statistics in results],
+             "rank errors": [{repr(column.checked_median): column_statistics["median rank error"]}
+                             if column.checked_median is not None else {}
+                             for column, column_statistics in zip(reader.statistics, results)]},
+            memo_size, None if sidecar_suffix is None else filename + sidecar_suffix)
+    computed = StatisticalCharacteristics(median_strategy=median_strategy, median_error=median_error)
+    _add_column_statistics(computed, results, '')
+    try:
+        mismatches = []
+        for i in range(len(results)):
+            mismatches.extend(_column_mismatches(saved, computed, i, tolerance,
+                                                 lambda: results[i]["median rank error"]))
+    except (ValueError, IndexError):
+        raise InvalidTraceError('Invalid Trace', 'Trace contains invalid statistics')
+    report_progress(progress, 1.0)
+    return ValidationResult(HashCheckResult(stored_hash, hash_object.hexdigest()),
+                            StatisticsCheckResult(tuple(mismatches)))
+
+
+def _json_tracedata_start(mapping):
+    """
+    :param mapping: mmap of a JSON trace
+    :return: Offset behind the '[' that opens the tracedata, None if the tracedata is not a list
+    """
+    position = mapping.rfind(_JSON_TRACEDATA_KEY)
+    if position < 0:
+        return None
+    position += len(_JSON_TRACEDATA_KEY)
+    while position < len(mapping) and mapping[position] in b' \t\r\n':
+        position += 1
+    if position == len(mapping) or mapping[position] != ord('['):
+        return None
+    return position + 1
+
+
+class _BinaryTracedataReader:
+    """
+    Passes the values of the tracedata columns of a binary trace on while the file is read in chunks. Columns are
+    aligned to the size of their values, so no value is split between two chunks
+    """
+
+    def __init__(self, descriptors, data_start, column_statistics):
+        """
+        :param descriptors: Column descriptors of the header, see trace_conversion_tool_binary
+        :param data_start: Offset of the first column
+        :param column_statistics: Called with index and length of a column, returns its StreamedColumnStatistics
+        """
+        self.columns = []
+        self.statistics = []
+        for i, descriptor in enumerate(descriptors):
+            dtype = np.dtype(descriptor["dtype"])
+            start = data_start + descriptor["offset"]
+            if start % dtype.itemsize != 0:
+                raise ValueError("Tracedata column not aligned")
+            self.columns.append((start, start + descriptor["length"] * dtype.itemsize, dtype))
+            self.statistics.append(column_statistics(i, descriptor["length"]))
+
+    def feed(self, chunk, position):
+        """
+        :param chunk: Bytes of the file read next
+        :param position: Offset of the chunk in the file
+        """
+        for (start, end, dtype), statistics in zip(self.columns, self.statistics):
+            first, last = max(start, position), min(end, position + len(chunk))
+            if first < last:
+                statistics.extend(np.frombuffer(chunk[first - position:last - position], dtype=dtype).copy())
+
+    def finish(self, size):
+        """
+        :param size: Size of the file
+        :return: List with the StreamedColumnStatistics of each column
+        """
+        if any(end > size for start, end, dtype in self.columns):
+            raise ValueError("Tracedata column exceeds the trace")
+        return self.statistics
+
+
+class _JsonTracedataReader:
+    """
+    Parses the tracedata columns of a JSON trace while the file is read in chunks and passes their values on.
+    Numbers contain neither brackets nor commas: a column ends at the next ']', and the values of a chunk are
+    parsed up to its last comma, the rest is kept for the next chunk
+    """
+
+    def __init__(self, start, column_statistics):
+        """
+        :param start: Offset behind the '[' that opens the tracedata
+        :param column_statistics: Called with index and length None of a column, returns its
+        StreamedColumnStatistics
+        """
+        self.start = start
+        self.column_statistics = column_statistics
+        self.statistics = []
+        self.in_column = False
+        self.finished = False
+        self.rest = b''
+
+    def feed(self, chunk, position):
+        """
+        :param chunk: Bytes of the file read next
+        :param position: Offset of the chunk in the file
+        """
+        if self.finished or position + len(chunk) <= self.start:
+            return
+        data = bytes(chunk[max(self.start - position, 0):])
+        offset = 0
+        while offset < len(data) and not self.finished:
+            closing = data.find(b']', offset)
+            if not self.in_column:
+                opening = data.find(b'[', offset)
+                if closing >= 0 and (opening < 0 or closing < opening):
+                    self.finished = True
+                elif opening >= 0:
+                    self.statistics.append(self.column_statistics(len(self.statistics), None))
+                    self.in_column = True
+                    offset = opening + 1
+                else:
                     return
-            except ValueError:
-                mb.showerror('Tolerance Entry invalid', 'Please enter a valid float')
-                return
-            with open(converted_trace_file, newline='\n') as trace_file:
-                input_trace = json.load(trace_file)
-                saved = input_trace["traceheader"]["statistical characteristics"]
-            with open(converted_trace_file, newline='\n') as trace_file:
-                input_trace = json.load(trace_file)
-                comp = generate_statistic(input_trace, '')["traceheader"]["statistical characteristics"]
-            statistics_valid = True
-            invalid_statistics = ""
-            for i in range(len(comp["mean"])):
-                for statistic in saved:
-                    if not math.isclose(float(comp[statistic][i]), float(saved[statistic][i]), rel_tol=tolerance):
-                        invalid_statistics += (
-                                str(statistic) + " [" + str(i) + "]: Computed: " + str(comp[statistic][i]) +
-                                " Stored: " + str(saved[statistic][i]) + "\n")
-                        statistics_valid = False
-            if statistics_valid:
-                mb.showinfo("Statistic Validation Result",
-                            "All statistics are close enough")
+            elif closing >= 0:
+                self._parse(self.rest + data[offset:closing])
+                self.rest = b''
+                self.in_column = False
+                offset = closing + 1
             else:
-                mb.showinfo("The following statistics are not close enough", invalid_statistics)
-        except json.decoder.JSONDecodeError:
-            mb.showerror("Trace content invalid", "Please check if the trace content is valid")
-        except ValueError:
-            mb.showerror('Invalid Trace', 'Trace contains invalid statistics')
-            return
-    else:
-        mb.showerror("Trace invalid", "Please check if the file is valid")
+                comma = data.rfind(b',', offset)
+                if comma < 0:
+                    self.rest += data[offset:]
+                else:
+                    self._parse(self.rest + data[offset:comma])
+                    self.rest = data[comma + 1:]
+                return
+
+    def _parse(self, values):
+        """
+        :param values: Comma separated values of the current column
+        """
+        if b'"' in values:
+            raise TypeError("Tracedata column does not contain numbers")
+        if values.strip():
+            self.statistics[-1].extend(np.asarray(json.loads(b'[' + values + b']')))
 
+    def finish(self, size):
+        """
+        :param size: Size of the file
+        :return: List with the StreamedColumnStatistics of each column
+        """
+        if not self.finished:
+            raise ValueError("Tracedata incomplete")
+        return self.statistics
 
-def restore_traceheader(filename, stat_format_string):
+
+def restore_traceheader(filename, stat_format_string, progress=None):
     """
-    (Re)generates statistics and hash for the input trace
+    (Re)generates statistics and hash for the input trace and overwrites the file in its original format
     :param stat_format_string: format string for statistical characteristics
     :param filename: Input file
+    :param progress: Progress callback, see report_progress. The file is only overwritten if it doesn't cancel
     """
-    if os.path.isfile(filename) and pathlib.Path(filename).suffix == ".json":
-        try:
+    if not is_trace_file(filename):
+        raise InvalidTraceError("Trace invalid", "Please check if the file is valid")
+    trace = load_trace(filename)
+    median_strategy, median_error = median_settings()
+    results = _memoized_column_results(filename, median_strategy, median_error,
+                                       progress=lambda fraction: report_progress(progress, fraction, 0.0, 0.9),
+                                       trace=trace)
+    trace.traceheader.statistical_characteristics = _formatted_statistics(results, stat_format_string,
+                                                                          median_strategy, median_error)
+    save_trace(trace, filename, tracebin.is_binary_trace(filename))
+    report_progress(progress, 1.0)
+
+
+def append_to_trace(filename, input_file, indexes, stat_format, progress=None):
+    """
+    Appends the rows of a raw trace to a converted trace. The statistics are continued from the sufficient
+    statistics in the traceheader instead of being computed from all rows again, only an exact median selects
+    from the stored values once more. The file is rewritten in one pass that copies the stored tracedata and
+    computes the hash value on the way. Traces without sufficient statistics are loaded and computed completely
+    like restore_traceheader does, later appends continue from there
+    :param filename: Converted trace in either format, replaced by the result
+    :param input_file: Raw trace in CSV format with the new rows
+    :param indexes: Column indexes with tracedata, one for each tracedata column of the trace
+    :param stat_format: format string for statistical characteristics
+    :param progress: Progress callback, see report_progress. The trace is only replaced if it doesn't cancel
+    :return: Number of appended rows
+    """
+    if not is_trace_file(filename):
+        raise InvalidTraceError("Trace invalid", "Please check if the file is valid")
+    appended = get_tracedata_from_file(input_file, indexes,
+                                       lambda fraction: report_progress(progress, fraction, 0.0, 0.3))
+    if len(appended[0]) == 0:
+        raise InvalidInputError("File empty", "The file contains no rows to append")
+    directory, name = os.path.split(os.path.abspath(filename))
+    descriptor, temporary_filename = tempfile.mkstemp(prefix='.' + name + '.', suffix='.tmp', dir=directory)
+    os.close(descriptor)
+    try:
+        if tracebin.is_binary_trace(filename):
+            appended_in_place = _append_to_binary_trace(filename, temporary_filename, appended, stat_format,
+                                                        progress)
+        else:
+            with open(filename, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapping:
+                appended_in_place = _append_to_json_trace(mapping, temporary_filename, appended, stat_format,
+                                                          progress)
+        if not appended_in_place:
+            trace = load_trace(filename)
+            _check_appended_columns(trace.tracebody.tracedata, appended)
+            trace.tracebody.tracedata = [np.concatenate((np.asarray(trace.tracebody.tracedata[i]), appended[i]))
+                                         for i in range(len(appended))]
+            if len(trace.tracebody.tracedata[0]) > 4:
+                generate_statistic(trace, stat_format, lambda fraction: report_progress(progress, fraction, 0.3, 0.9))
+            save_trace(trace, temporary_filename, tracebin.is_binary_trace(filename))
+        shutil.copymode(filename, temporary_filename)
+        os.replace(temporary_filename, filename)
+    except BaseException:
+        if os.path.exists(temporary_filename):
+            os.remove(temporary_filename)
+        raise
+    report_progress(progress, 1.0)
+    return len(appended[0])
+
+
+def _check_appended_columns(tracedata, appended):
+    """
+    :param tracedata: Tracedata columns of the trace
+    :param appended: Columns with the new rows
+    """
+    if len(tracedata) != len(appended):
+        raise InvalidInputError("Columns invalid", "Please specify one column for each tracedata column of the trace")
+
+
+def _continued_statistics(saved, columns, appended, stat_format, progress=None):
+    """
+    Continues the statistics of a trace with appended rows
+    :param saved: StatisticalCharacteristics of the trace with sufficient statistics for every column
+    :param columns: Function returning the stored values of a column in chunks, only used for exact medians
+    :param appended: Columns with the new rows
+    :param stat_format: format string for statistical characteristics
+    :param progress: Progress callback, see report_progress. Called after each column
+    :return: StatisticalCharacteristics of the whole trace
+    """
+    statistics = StatisticalCharacteristics(median_strategy=saved.median_strategy, median_error=saved.median_error)
+    try:
+        for i in range(len(appended)):
+            state = saved.sufficient_statistics[i]
+            new_values = stats.as_float_array(appended[i])
+            capacity = None
+            if state["median strategy"] == 'exact':
+                capacity = int(state["count"]) + int(np.count_nonzero(~np.isnan(new_values)))
+            running = stats.RunningStatistics.from_state(state, capacity)
+            if running.sketch is None:
+                stored = 0
+                for chunk in columns(i):
+                    chunk = chunk[~np.isnan(chunk)]
+                    stored += len(chunk)
+                    if stored > running.count:
+                        break
+                    running.add_median_values(chunk)
+                if stored != running.count:
+                    raise InvalidTraceError("Trace content invalid", "The sufficient statistics don't match the "
+                                            "tracedata, please restore the traceheader")
+            for start in range(0, len(new_values), stats.DEFAULT_CHUNK_SIZE):
+                running.update(new_values[start:start + stats.DEFAULT_CHUNK_SIZE])
+            result = running.result()
+            for statistic in stats.STATISTIC_NAMES:
+                getattr(statistics, statistic).append(format(result[statistic], stat_format))
+            statistics.sufficient_statistics.append(running.state())
+            report_progress(progress, (i + 1) / len(appended))
+        return statistics
+    except TypeError:
+        raise InvalidDataError("Type Error", "One of the selected columns does not contain valid data")
+    except (KeyError, IndexError, ValueError):
+        raise InvalidInputError("Format Error", "Invalid Numerical Format entered")
+
+
+def _has_sufficient_statistics(statistics, column_count):
+    """
+    :param statistics: StatisticalCharacteristics
+    :param column_count: Number of tracedata columns
+    :return: True if the statistics can be continued for appended rows
+    """
+    return column_count > 0 and len(statistics.sufficient_statistics) == column_count and \
+        len(statistics.mean) == column_count
+
+
+def _append_to_binary_trace(filename, result_filename, appended, stat_format, progress=None):
+    """
+    Writes a binary trace with appended rows, the stored columns are memory mapped and copied part by part
+    :param filename: Binary trace
+    :param result_filename: Result filename
+    :param appended: Columns with the new rows
+    :param stat_format: format string for statistical characteristics
+    :param progress: Progress callback, see report_progress
+    :return: False if the trace has no sufficient statistics and nothing was written
+    """
+    trace = load_trace(filename, memory_map=True)
+    tracedata = trace.tracebody.tracedata
+    _check_appended_columns(tracedata, appended)
+    if not _has_sufficient_statistics(trace.traceheader.statistical_characteristics, len(tracedata)):
+        return False
+
+    def columns(i):
+        for start in range(0, len(tracedata[i]), stats.DEFAULT_CHUNK_SIZE):
+            yield tracedata[i][start:start + stats.DEFAULT_CHUNK_SIZE]
+    trace.traceheader.statistical_characteristics = _continued_statistics(
+        trace.traceheader.statistical_characteristics, columns, appended, stat_format,
+        lambda fraction: report_progress(progress, fraction, 0.3, 0.5))
+    try:
+        tracebin.write_binary_trace(trace.to_dict(), result_filename, appended, hash_algorithm())
+    except TypeError:
+        raise InvalidDataError("Type Error", "Only numerical tracedata can be saved in the binary format")
+    return True
+
+
+def _append_to_json_trace(mapping, result_filename, appended, stat_format, progress=None):
+    """
+    Writes a JSON trace with appended rows. The stored columns are copied byte by byte up to their closing
+    bracket, the new values are serialized behind them, so the result is identical to write_trace with the
+    concatenated columns
+    :param mapping: mmap of a JSON trace
+    :param result_filename: Result filename
+    :param appended: Columns with the new rows
+    :param stat_format: format string for statistical characteristics
+    :param progress: Progress callback, see report_progress
+    :return: False if the trace has no sufficient statistics or doesn't end with its tracedata and nothing was
+    written
+    """
+    located = _json_tracedata_ranges(mapping)
+    if located is None:
+        return False
+    document, ranges = located
+    trace = Trace.from_dict(document)
+    _check_appended_columns(ranges, appended)
+    if not _has_sufficient_statistics(trace.traceheader.statistical_characteristics, len(ranges)):
+        return False
+    # Ends of the last stored value of each column, the start bracket if the column is empty
+    value_ends = [_skip_whitespace_backwards(mapping, end) for start, end in ranges]
+
+    def columns(i):
+        start, end = ranges[i][0] + 1, value_ends[i]
+        while start < end:
+            # Chunks end at a separator, so no number is split
+            stop = mapping.find(b',', min(start + COPY_BUFFER_SIZE, end), end)
+            stop = end if stop < 0 else stop
+            try:
+                # Parsed as JSON like load_trace does, so true, false, null and NaN are read as well
+                yield np.asarray(json.loads(b'[' + mapping[start:stop] + b']'), dtype=float)
+            except (ValueError, TypeError):
+                raise InvalidTraceError("Trace content invalid", "Please check if the trace content is valid")
+            start = stop + 1
+    trace.traceheader.statistical_characteristics = _continued_statistics(
+        trace.traceheader.statistical_characteristics, columns, appended, stat_format,
+        lambda fraction: report_progress(progress, fraction, 0.3, 0.5))
+
+    def write_tracedata(write):
+        write('[\n')
+        for i in range(len(ranges)):
+            if i > 0:
+                write(',\n')
+            write('\t\t\t')
+            for start in range(ranges[i][0], value_ends[i], COPY_BUFFER_SIZE):
+                write(mapping[start:min(start + COPY_BUFFER_SIZE, value_ends[i])])
+            write(',\n\t\t\t\t' if value_ends[i] - 1 > ranges[i][0] else '\n\t\t\t\t')
+            for part in _tracedata_values(appended[i], 3):
+                write(part)
+            write('\n\t\t\t]')
+            report_progress(progress, (i + 1) / len(ranges), 0.5, 1.0)
+        write('\n\t\t]')
+    _write_json_trace(trace.to_dict(), result_filename, write_tracedata)
+    return True
+
+
+def is_trace_file(filename):
+    """
+    :param filename: Any file
+    :return: True if the file exists and is a JSON trace (by suffix) or a binary trace (by its magic bytes)
+    """
+    return os.path.isfile(filename) and \
+        (pathlib.Path(filename).suffix == ".json" or tracebin.is_binary_trace(filename))
+
+
+def load_trace(filename, memory_map=False):
+    """
+    Reads a trace in standard format, either JSON or the binary container. Tracedata columns of binary traces are
+    NumPy arrays, those of JSON traces lists
+    :param filename: Converted trace
+    :param memory_map: If True the tracedata columns of binary traces are read-only views of a memory mapping and
+    only read from disk when accessed. The file must not be overwritten while the trace is in use
+    :return: Trace
+    """
+    try:
+        if tracebin.is_binary_trace(filename):
+            if memory_map:
+                document = tracebin.map_binary_trace(filename)
+            else:
+                document = tracebin.read_binary_trace(filename)
+        else:
             with open(filename, newline='\n') as tr:
-                tracedata = json.load(tr)
-                trace = generate_statistic(tracedata, stat_format_string)
-            write_file = 1
-            if os.path.exists(filename):
-                write_file = mb.askyesno("Overwriting File",
-                                         "Restoring the traceheader will overwrite the file. Continue?")
-            if write_file:
-                with open(filename, 'w', newline='\n') as fp:
-                    json.dump(trace, fp, indent='\t')
-                add_hash_value_to_trace(filename)
-                mb.showinfo('Traceheader restored', 'Statistics and has value restored successfully')
-        except json.decoder.JSONDecodeError:
-            mb.showerror("Trace content invalid", "Please check if the trace content is valid")
-    else:
-        mb.showerror("Trace invalid", "Please check if the file is valid")
-
-
-trace_template = {"traceheader": {
-    "metainformation": {
-        "original name": "",
-        "description": "",
-        "source": "",
-        "user": "",
-        "additional information": "",
-        "creation time": "",
-        "hash value": ""
-    },
-    "statistical characteristics": {
-        "mean": [],
-        "median": [],
-        "skewness": [],
-        "kurtosis": [],
-        "autocorrelation": [],
-        "variance": []
-    }
-},
-    "tracebody": {
-        "tracedata description": [],
-        "tracedata": []
-    }
-}
+                document = json.load(tr)
+    except FileNotFoundError:
+        raise InvalidTraceError('Could not find trace', 'Please check if path and filename are valid')
+    except (ValueError, KeyError, TypeError):
+        raise InvalidTraceError("Trace content invalid", "Please check if the trace content is valid")
+    return Trace.from_dict(document)
+
+
+def read_traceheader(filename):
+    """
+    Reads only the traceheader of a trace, the tracedata is not parsed. JSON traces are decoded incrementally until
+    the traceheader is complete, binary traces store it in front of the tracedata anyway
+    :param filename: Converted trace
+    :return: Traceheader
+    """
+    try:
+        if tracebin.is_binary_trace(filename):
+            document = tracebin.read_binary_header(filename)[0]["traceheader"]
+        else:
+            document = _read_json_traceheader(filename)
+        return _fields_from_dict(Traceheader, document)
+    except FileNotFoundError:
+        raise InvalidTraceError('Could not find trace', 'Please check if path and filename are valid')
+    except (ValueError, KeyError, TypeError):
+        raise InvalidTraceError("Trace content invalid", "Please check if the trace content is valid")
+
+
+def _read_json_traceheader(filename):
+    """
+    :param filename: JSON trace
+    :return: Traceheader as dictionary. The whole file is loaded if the traceheader is not its first entry
+    """
+    decoder = json.JSONDecoder()
+    text = ''
+    with open(filename, newline='\n') as file:
+        while True:
+            block = file.read(HEADER_BLOCK_SIZE)
+            text += block
+            start = _TRACEHEADER_START.match(text)
+            if start is None and (len(text) > HEADER_BLOCK_SIZE or not block):
+                file.seek(0)
+                return json.load(file)["traceheader"]
+            if start is not None:
+                try:
+                    return decoder.raw_decode(text, start.end())[0]
+                except json.decoder.JSONDecodeError:
+                    if not block:
+                        raise
+
+
+def save_trace(trace, filename, binary=False):
+    """
+    Writes a trace in standard format and stores its hash value
+    :param trace: Trace or trace as dictionary
+    :param filename: Result filename
+    :param binary: If True the binary container is written instead of JSON
+    """
+    if not binary:
+        write_trace(trace, filename)
+        return
+    if isinstance(trace, Trace):
+        trace = trace.to_dict()
+    try:
+        tracebin.write_binary_trace(trace, filename, algorithm=hash_algorithm())
+    except TypeError:
+        raise InvalidDataError("Type Error", "Only numerical tracedata can be saved in the binary format")
+
+
+def convert_trace_format(filename, result_filename, binary):
+    """
+    Converts a trace between JSON and the binary container. The values are kept as they are, the hash value is
+    recomputed since it covers the bytes of the file
+    :param filename: Converted trace in either format
+    :param result_filename: Result filename
+    :param binary: If True the result is a binary trace, otherwise a JSON trace
+    :return: Trace
+    """
+    if not is_trace_file(filename):
+        raise InvalidTraceError("Trace invalid", "Please check if the file is valid")
+    trace = load_trace(filename)
+    save_trace(trace, result_filename, binary)
+    return trace
+
+
+def is_binary_trace(filename):
+    """
+    :param filename: Any file
+    :return: True if the file is a trace in the binary container
+    """
+    return tracebin.is_binary_trace(filename)
+
+
+def trace_display_text(filename):
+    """
+    :param filename: Any text file or trace
+    :return: Content of the file, for binary traces the header with the tracedata descriptors
+    """
+    if tracebin.is_binary_trace(filename):
+        try:
+            return json.dumps(tracebin.read_binary_header(filename)[0], indent='\t')
+        except ValueError:
+            raise InvalidTraceError("Trace content invalid", "Please check if the trace content is valid")
+    with open(filename, 'r', newline='\n') as f:
+        return f.read()
@@ -0,0 +1,454 @@
+"""
+    This file is part of TraceConversionTool.
+    Copyright (c) 2022 Dennis Ziebart
+
+    TraceConversionTool is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    TraceConversionTool is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with TraceConversionTool.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import csv
+import dataclasses
+import io
+import itertools
+import json
+import os
+import re
+import tempfile
+
+import trace_conversion_tool_model as model
+
+# A recipe is a list of the preparation steps of the Prepare File tab, saved as JSON file like
+#   {"steps": [{"step": "remove_lines", "count": 3}, {"step": "unix_time", "columns": [0], "formats": ["ISO8601"]}]}
+# Running a recipe reads the input file once and writes the result once: line steps only decide how the file is
+# parsed (lines skipped, header used), column steps are applied to each chunk of csv_chunk_size rows before it is
+# written. A recipe only depends on the layout of a file, so it can be reused for every file with the same layout
+
+# Steps with the default values of their parameters and the parameters that have to be given
+STEPS = {
+    "convert_to_csv": {"delimiter": "", "keep_header": False, "header": None},
+    "remove_lines": {"count": None},
+    "add_header": {"header": None},
+    "unix_time": {"columns": None, "formats": None, "utc": False},
+    "difference_columns": {"columns": None, "result_column": None},
+    "difference_rows": {"column": None, "result_column": None},
+}
+_REQUIRED = {
+    "convert_to_csv": (),
+    "remove_lines": ("count",),
+    "add_header": ("header",),
+    "unix_time": ("columns", "formats"),
+    "difference_columns": ("columns", "result_column"),
+    "difference_rows": ("column", "result_column"),
+}
+LINE_STEPS = ("convert_to_csv", "remove_lines", "add_header")
+COLUMN_STEPS = ("unix_time", "difference_columns", "difference_rows")
+
+# Delimiters are sorted into classes that avoid the Python parser engine of pandas, which regular expressions and
+# sniffing (empty delimiter) would need. Single characters, also escaped ones like \t, and \s+ are read by the C
+# engine directly. Other regular expressions and fixed-width columns are split line by line into fields separated
+# by _FIELD_SEPARATOR, which the C engine then parses. Like the Python engine, lines are stripped before they are
+# split and quotes are ignored
+SINGLE_CHARACTER = "single character"
+WHITESPACE = "whitespace"
+REGEX = "regular expression"
+FIXED_WIDTH = "fixed width"
+_FIELD_SEPARATOR = '\x1f'
+# Number of lines an empty delimiter is detected from
+_SAMPLE_LINES = 100
+_ESCAPED_CHARACTERS = {'t': '\t'}
+
+
+@dataclasses.dataclass(frozen=True)
+class DelimiterPlan:
+    """How a file with a given delimiter is parsed"""
+    kind: str
+    # Separator for the C engine or regular expression, None for fixed-width columns
+    separator: str
+    # Start and end of each fixed-width column, end is None for the last column
+    columns: tuple = ()
+
+
+@dataclasses.dataclass(frozen=True)
+class PreparationResult:
+    """Result of run_recipe"""
+    result_filename: str
+    rows: int
+
+
+def _invalid_recipe(message):
+    """
+    :param message: Description of the problem
+    :return: InvalidInputError to raise
+    """
+    return model.InvalidInputError("Invalid recipe", message)
+
+
+def make_step(name, **parameters):
+    """
+    :param name: Key of STEPS
+    :param parameters: Parameters of the step
+    :return: Step as dictionary, missing optional parameters are filled with their defaults
+    """
+    return validate_step(dict(parameters, step=name))
+
+
+def validate_step(step):
+    """
+    Checks name, parameters and parameter types of a step
+    :param step: Step as dictionary with the key "step"
+    :return: Step with defaults for missing optional parameters
+    """
+    if not isinstance(step, dict) or step.get("step") not in STEPS:
+        raise _invalid_recipe("Unknown step " + repr(step.get("step") if isinstance(step, dict) else step) +
+                              ". Known steps: " + ", ".join(STEPS))
+    name = step["step"]
+    unknown = set(step) - set(STEPS[name]) - {"step"}
+    if unknown:
+        raise _invalid_recipe("Unknown parameters of " + name + ": " + ", ".join(sorted(unknown)))
+    missing = [parameter for parameter in _REQUIRED[name] if step.get(parameter) is None]
+    if missing:
+        raise _invalid_recipe("Missing parameters of " + name + ": " + ", ".join(missing))
+    step = dict(STEPS[name], **step)
+
+    def is_list_of(value, kind):
+        return isinstance(value, list) and all(isinstance(item, kind) and not isinstance(item, bool)
+                                               for item in value)
+
+    valid = {
+        "convert_to_csv": lambda: isinstance(step["delimiter"], str) and isinstance(step["keep_header"], bool)
+        and (step["header"] is None or is_list_of(step["header"], str)),
+        "remove_lines": lambda: isinstance(step["count"], int) and not isinstance(step["count"], bool)
+        and step["count"] >= 0,
+        "add_header": lambda: is_list_of(step["header"], str) and len(step["header"]) > 0,
+        "unix_time": lambda: is_list_of(step["columns"], int) and is_list_of(step["formats"], str)
+        and len(step["columns"]) == len(step["formats"]) > 0 and isinstance(step["utc"], bool),
+        "difference_columns": lambda: is_list_of(step["columns"], int) and len(step["columns"]) == 2
+        and min(step["columns"]) >= 0 and isinstance(step["result_column"], str),
+        "difference_rows": lambda: isinstance(step["column"], int) and not isinstance(step["column"], bool)
+        and isinstance(step["result_column"], str),
+    }[name]
+    if not valid():
+        raise _invalid_recipe("Invalid parameters of " + name + ": " + json.dumps(step))
+    return step
+
+
+def validate_recipe(steps):
+    """
+    Checks the steps and their order. convert_to_csv may only be the first step, line steps have to come before
+    column steps, and a header can only be added while the first line of the file is the header
+    :param steps: List of steps
+    :return: List of validated steps
+    """
+    if not isinstance(steps, list) or not steps:
+        raise _invalid_recipe("A recipe needs a list with at least one step")
+    steps = [validate_step(step) for step in steps]
+    column_step_seen = False
+    header_from_file = True
+    for i, step in enumerate(steps):
+        if step["step"] == "convert_to_csv" and i > 0:
+            raise _invalid_recipe("convert_to_csv can only be the first step")
+        if step["step"] in COLUMN_STEPS:
+            column_step_seen = True
+        elif column_step_seen:
+            raise _invalid_recipe(step["step"] + " has to come before " + ", ".join(COLUMN_STEPS))
+        if step["step"] == "convert_to_csv":
+            header_from_file = step["keep_header"]
+        elif step["step"] == "remove_lines" and step["count"] > 0:
+            header_from_file = True
+        elif step["step"] == "add_header":
+            if not header_from_file:
+                raise _invalid_recipe("add_header needs the first line of the file as header, remove the header "
+                                      "of the previous step first")
+            header_from_file = False
+    return steps
+
+
+def load_recipe(filename):
+    """
+    :param filename: Recipe file
+    :return: List of validated steps
+    """
+    try:
+        with open(filename) as recipe_file:
+            document = json.load(recipe_file)
+    except (OSError, ValueError) as error:
+        raise model.InvalidInputError("Recipe could not be read", str(error))
+    if not isinstance(document, dict):
+        raise _invalid_recipe("A recipe is a JSON object with the key steps")
+    return validate_recipe(document.get("steps"))
+
+
+def save_recipe(steps, filename):
+    """
+    :param steps: List of steps
+    :param filename: Result filename
+    """
+    with open(filename, 'w') as recipe_file:
+        json.dump({"steps": validate_recipe(steps)}, recipe_file, indent='\t')
+        recipe_file.write('\n')
+
+
+def _parse_plan(steps):
+    """
+    Combines the line steps into the parameters of a single read
+    :param steps: Validated steps
+    :return: Delimiter (empty to detect it), number of lines to skip, header names or None if the first remaining
+    line is the header, and True if the columns are numbered because the file has no header at all
+    """
+    delimiter = ','
+    skip = 0
+    names = None
+    numbered = False
+    for step in steps:
+        if step["step"] == "convert_to_csv":
+            delimiter = step["delimiter"]
+            if not step["keep_header"]:
+                names = step["header"]
+                numbered = not step["header"]
+        elif step["step"] == "remove_lines" and step["count"] > 0:
+            # The first removed line is the header of the previous step if the file line isn't used as header
+            skip += step["count"] - (1 if names is not None or numbered else 0)
+            names = None
+            numbered = False
+        elif step["step"] == "add_header":
+            names = step["header"]
+    return delimiter, skip, names, numbered
+
+
+class _RowDifference:
+    """Difference over rows that continues over chunk borders"""
+
+    def __init__(self, column, result_column):
+        self.column = column
+        self.result_column = result_column
+        self.last = None
+
+    def __call__(self, df):
+        values = df[df.columns[self.column]]
+        difference = values.diff()
+        if len(values):
+            if self.last is not None:
+                difference.iloc[0] = values.iloc[0] - self.last
+            self.last = values.iloc[-1]
+        df[self.result_column] = difference
+        return df
+
+
+def _column_function(step):
+    """
+    :param step: Validated column step
+    :return: Function that applies the step to a chunk and returns it
+    """
+    if step["step"] == "unix_time":
+        return lambda df: model.df_columns_to_epoch(df, step["columns"], step["formats"], step["utc"])
+    if step["step"] == "difference_columns":
+        first, second = step["columns"]
+
+        def difference(df):
+            df[step["result_column"]] = df[df.columns[first]] - df[df.columns[second]]
+            return df
+        return difference
+    return _RowDifference(step["column"], step["result_column"])
+
+
+# Error messages of the column steps, like the messages of the single operations in the GUI
+_STEP_ERRORS = {
+    "unix_time": {IndexError: "Column indexes invalid", TypeError: "The columns need to contain strings",
+                  ValueError: "Timestamp could not be converted with the passed format strings"},
+    "difference_columns": {IndexError: "Column indexes invalid", TypeError: "Both columns need to contain numbers"},
+    "difference_rows": {IndexError: "Column index invalid", TypeError: "Column needs to contain numbers"},
+}
+
+
+def _fixed_width_columns(lines):
+    """
+    Infers fixed-width columns from positions that are blank in every line
+    :param lines: Sample lines without line breaks
+    :return: Tuple with start and end of each column, end is None for the last column
+    """
+    used = [False] * max((len(line) for line in lines), default=0)
+    for line in lines:
+        for position, character in enumerate(line):
+            if not character.isspace():
+                used[position] = True
+    starts = [i for i in range(len(used)) if used[i] and (i == 0 or not used[i - 1])]
+    ends = [i for i in range(1, len(used)) if used[i - 1] and not used[i]] + [None]
+    return tuple(zip(starts, ends[:len(starts) - 1] + [None]))
+
+
+def detect_delimiter(delimiter, sample=()):
+    """
+    Chooses how a file is parsed
+    :param delimiter: Delimiter entered by the user. Single characters (also escaped like \\t), regular expressions,
+    "fixed" for fixed-width columns or an empty string to detect the delimiter from the sample
+    :param sample: First lines of the file without line breaks, used if the delimiter is empty or "fixed"
+    :return: DelimiterPlan
+    """
+    if len(delimiter) == 1:
+        return DelimiterPlan(SINGLE_CHARACTER, delimiter)
+    if len(delimiter) == 2 and delimiter[0] == '\\' and (not delimiter[1].isalnum()
+                                                          or delimiter[1] in _ESCAPED_CHARACTERS):
+        return DelimiterPlan(SINGLE_CHARACTER, _ESCAPED_CHARACTERS.get(delimiter[1], delimiter[1]))
+    if delimiter == r'\s+':
+        return DelimiterPlan(WHITESPACE, delimiter)
+    lines = [line for line in sample if line.strip()]
+    if delimiter.lower() == 'fixed':
+        return DelimiterPlan(FIXED_WIDTH, None, _fixed_width_columns(lines))
+    if delimiter:
+        try:
+            re.compile(delimiter)
+        except re.error as error:
+            raise model.InvalidInputError('Invalid delimiter', 'The delimiter is no valid regular expression: ' +
+                                          str(error))
+        return DelimiterPlan(REGEX, delimiter)
+    # Like pandas the delimiter is sniffed from the first line. Spaces are looked at more closely, as runs of blanks
+    # usually separate columns or align them to a fixed width
+    try:
+        sniffed = csv.Sniffer().sniff(lines[0]).delimiter if lines else ','
+    except csv.Error:
+        sniffed = None
+    if sniffed not in (None, ' '):
+        return DelimiterPlan(SINGLE_CHARACTER, sniffed)
+    if not any(re.search(r'^\s|\s\s|\t', line.rstrip()) for line in lines):
+        return DelimiterPlan(SINGLE_CHARACTER, sniffed or ',')
+    # Blank-separated fields give the same number of fields in every line, fixed-width columns may contain blanks
+    if any('\t' in line for line in lines) or len({len(line.split()) for line in lines}) == 1:
+        return DelimiterPlan(WHITESPACE, r'\s+')
+    return DelimiterPlan(FIXED_WIDTH, None, _fixed_width_columns(lines))
+
+
+def _sample_lines(handle):
+    """
+    :param handle: File opened in binary mode, its position is kept
+    :return: The next _SAMPLE_LINES lines without line breaks
+    """
+    position = handle.tell()
+    lines = [line.decode('UTF-8', errors='replace').rstrip('\r\n')
+             for line in itertools.islice(handle, _SAMPLE_LINES)]
+    handle.seek(position)
+    return lines
+
+
+def read_chunks(handle, delimiter, header, chunk_size):
+    """
+    Parses a file chunk by chunk with the parser chosen by detect_delimiter
+    :param handle: File opened in binary mode, parsing starts at its position
+    :param delimiter: Delimiter entered by the user, see detect_delimiter
+    :param header: 0 if the first line is the header, None if the columns are numbered
+    :param chunk_size: Number of lines per chunk
+    :return: Generator of DataFrames
+    """
+    import pandas as pd
+
+    plan = detect_delimiter(delimiter, _sample_lines(handle) if delimiter.lower() in ('', 'fixed') else ())
+    if plan.kind in (SINGLE_CHARACTER, WHITESPACE):
+        with pd.read_csv(handle, sep=plan.separator, header=header, engine='c', chunksize=chunk_size) as reader:
+            yield from reader
+        return
+    if plan.kind == REGEX:
+        pattern = re.compile(plan.separator)
+
+        def split(line):
+            return pattern.sub(_FIELD_SEPARATOR, line.strip())
+    else:
+        def split(line):
+            return _FIELD_SEPARATOR.join(line[start:end].strip() for start, end in plan.columns) \
+                if line.strip() else ''
+    text = io.TextIOWrapper(handle, encoding='UTF-8')
+    columns = None
+    try:
+        while True:
+            lines = list(itertools.islice(text, chunk_size))
+            fields = '\n'.join(map(split, lines))
+            if lines and not fields.strip():
+                # Only blank lines, which the C engine skips. pandas would see an empty file
+                continue
+            if not lines and columns is not None:
+                return
+            df = pd.read_csv(io.StringIO(fields), sep=_FIELD_SEPARATOR, header=header if columns is None else None,
+                             quoting=csv.QUOTE_NONE, engine='c')
+            if columns is None:
+                columns = df.columns
+            elif len(df.columns) > len(columns):
+                raise pd.errors.ParserError('Expected ' + str(len(columns)) + ' fields, saw ' +
+                                            str(len(df.columns)))
+            else:
+                df = df.set_axis(columns[:len(df.columns)], axis=1).reindex(columns=columns)
+            yield df
+    finally:
+        # The handle stays open for its owner
+        text.detach()
+
+
+def run_recipe(steps, filename, result_filename, progress=None):
+    """
+    Prepares a file with a recipe in one pass. The result is written to a temporary file that replaces
+    result_filename at the end, so the result may be the input file itself
+    :param steps: List of steps, see validate_recipe
+    :param filename: Input file
+    :param result_filename: Result CSV file
+    :param progress: Progress callback, see model.report_progress. Called after each chunk with the fraction of bytes
+    read
+    :return: PreparationResult
+    """
+    from pandas.errors import EmptyDataError, ParserError
+
+    steps = validate_recipe(steps)
+    delimiter, skip, names, numbered = _parse_plan(steps)
+    functions = [(step["step"], _column_function(step)) for step in steps if step["step"] in COLUMN_STEPS]
+    directory, name = os.path.split(os.path.abspath(result_filename))
+    descriptor, temporary_filename = tempfile.mkstemp(prefix='.' + name + '.', suffix='.tmp', dir=directory)
+    rows = 0
+    header_written = False
+    try:
+        with open(filename, 'rb') as handle, os.fdopen(descriptor, 'w', newline='') as result_file:
+            for _ in range(skip):
+                handle.readline()
+            size = max(os.fstat(handle.fileno()).st_size, 1)
+            chunk_size = model.config.getint('conversion', 'csv_chunk_size', fallback=1000000)
+            for df in read_chunks(handle, delimiter, 0 if names is None and not numbered else None, chunk_size):
+                if names is not None:
+                    if len(names) != len(df.columns):
+                        raise model.InvalidInputError('Invalid header passed', 'The passed header has ' +
+                                                      str(len(names)) + ' elements. \nBut ' +
+                                                      str(len(df.columns)) + ' elements are required!')
+                    df.columns = names
+                for step_name, function in functions:
+                    try:
+                        df = function(df)
+                    except tuple(_STEP_ERRORS[step_name]) as error:
+                        message = next(message for error_type, message in _STEP_ERRORS[step_name].items()
+                                       if isinstance(error, error_type))
+                        raise model.InvalidDataError('Error in step ' + step_name, message)
+                df.to_csv(result_file, index=False, sep=',', header=not header_written)
+                header_written = True
+                rows += len(df)
+                model.report_progress(progress, min(handle.tell() / size, 1.0))
+        if os.path.exists(result_filename):
+            os.chmod(temporary_filename, os.stat(result_filename).st_mode)
+        os.replace(temporary_filename, result_filename)
+    except EmptyDataError:
+        os.remove(temporary_filename)
+        raise model.InvalidDataError('File empty', 'No lines are left to prepare')
+    except (ParserError, ValueError) as error:
+        os.remove(temporary_filename)
+        raise model.InvalidDataError('Error while reading file', 'Please check if the file and the delimiter '
+                                                                 'are valid: ' + str(error))
+    except FileNotFoundError:
+        os.remove(temporary_filename)
+        raise model.InvalidInputError('No file selected', 'Please select a valid file')
+    except BaseException:
+        if os.path.exists(temporary_filename):
+            os.remove(temporary_filename)
+        raise
+    return PreparationResult(result_filename, rows)
@@ -0,0 +1,176 @@
+"""
+    This file is part of TraceConversionTool.
+    Copyright (c) 2022 Dennis Ziebart
+
+    TraceConversionTool is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    TraceConversionTool is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with TraceConversionTool.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import random
+import threading
+
+import numpy as np
+
+# Previews read only the lines that are shown. A LineIndex stores the byte offset of every stride-th line, so any
+# line is reached by one seek and reading at most stride lines. The index is built in a background thread,
+# lines that are already indexed can be read while it grows
+
+# Number of bytes read at once while indexing or reading backwards
+BLOCK_SIZE = 1 << 22
+
+
+def _decode(line):
+    """
+    :param line: Line as bytes
+    :return: Line as string without line break, undecodable bytes are replaced
+    """
+    return line.rstrip(b'\r\n').decode('UTF-8', errors='replace')
+
+
+class LineIndex:
+    """Byte offsets of every stride-th line of a text file"""
+
+    def __init__(self, filename, stride=1000):
+        """
+        :param filename: Text file
+        :param stride: Number of lines between two stored offsets
+        """
+        self.filename = filename
+        self.stride = stride
+        # offsets[i] is the byte offset of line i * stride
+        self.offsets = [0]
+        # Number of lines counted so far and the total number once the index is complete
+        self.lines_indexed = 0
+        self.line_count = None
+        self._stop = threading.Event()
+
+    def start(self):
+        """Builds the index in a daemon thread"""
+        threading.Thread(target=self.build, name="line-index", daemon=True).start()
+
+    def stop(self):
+        """Stops building the index"""
+        self._stop.set()
+
+    def build(self):
+        """Scans the file for line breaks block by block"""
+        newlines = 0
+        position = 0
+        last_byte = b'\n'
+        with open(self.filename, 'rb') as file:
+            for block in iter(lambda: file.read(BLOCK_SIZE), b''):
+                if self._stop.is_set():
+                    return
+                breaks = np.flatnonzero(np.frombuffer(block, dtype=np.uint8) == ord('\n'))
+                # Line numbers that start right after each line break of the block
+                line_numbers = newlines + 1 + np.arange(len(breaks))
+                marks = breaks[line_numbers % self.stride == 0]
+                self.offsets.extend((position + marks + 1).tolist())
+                newlines += len(breaks)
+                position += len(block)
+                last_byte = block[-1:]
+                self.lines_indexed = newlines
+        # A last line without line break counts as well
+        self.line_count = newlines + (1 if position > 0 and last_byte != b'\n' else 0)
+        self.lines_indexed = self.line_count
+
+    @property
+    def complete(self):
+        return self.line_count is not None
+
+    def read_lines(self, start, count):
+        """
+        :param start: Index of the first line
+        :param count: Number of lines
+        :return: List of lines as strings, shorter at the end of the file
+        """
+        block = min(start // self.stride, len(self.offsets) - 1)
+        with open(self.filename, 'rb') as file:
+            file.seek(self.offsets[block])
+            for _ in range(start - block * self.stride):
+                if not file.readline():
+                    return []
+            lines = []
+            for _ in range(count):
+                line = file.readline()
+                if not line:
+                    break
+                lines.append(_decode(line))
+        return lines
+
+
+def head(filename, count):
+    """
+    :param filename: Text file
+    :param count: Number of lines
+    :return: First lines of the file
+    """
+    lines = []
+    with open(filename, 'rb') as file:
+        for line in file:
+            if len(lines) == count:
+                break
+            lines.append(_decode(line))
+    return lines
+
+
+def tail(filename, count):
+    """
+    Reads the file backwards until enough lines are found
+    :param filename: Text file
+    :param count: Number of lines
+    :return: Last lines of the file
+    """
+    with open(filename, 'rb') as file:
+        end = file.seek(0, os.SEEK_END)
+        position = end
+        data = b''
+        # One more line break than lines is needed to know the first line is complete
+        while position > 0 and data.count(b'\n') <= count:
+            size = min(BLOCK_SIZE, position)
+            position -= size
+            file.seek(position)
+            data = file.read(size) + data
+    lines = data.split(b'\n')
+    if lines and lines[-1] == b'':
+        lines.pop()
+    return [_decode(line) for line in lines[-count:]] if count > 0 else []
+
+
+def sample(filename, count, seed=None):
+    """
+    Picks lines at random byte offsets, long lines are therefore more likely to be picked
+    :param filename: Text file
+    :param count: Number of lines
+    :param seed: Seed of the random generator
+    :return: Lines in file order, without the first line (usually the header)
+    """
+    size = os.path.getsize(filename)
+    generator = random.Random(seed)
+    offsets = sorted(generator.randrange(size) for _ in range(count)) if size > 0 else []
+    lines = []
+    last_end = 0
+    with open(filename, 'rb') as file:
+        for offset in offsets:
+            if offset < last_end:
+                continue
+            file.seek(offset)
+            # The line containing the offset is completed, the following line is taken
+            file.readline()
+            line = file.readline()
+            if not line:
+                break
+            last_end = file.tell()
+            lines.append(_decode(line))
+    return lines
@@ -0,0 +1,558 @@
+"""
+    This file is part of TraceConversionTool.
+    Copyright (c) 2022 Dennis Ziebart
+
+    TraceConversionTool is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    TraceConversionTool is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with TraceConversionTool.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import base64
+import concurrent.futures
+import math
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Names of the statistical characteristics in the traceheader
+STATISTIC_NAMES = ("mean", "median", "skewness", "kurtosis", "autocorrelation", "variance")
+
+# Number of values processed at once when a whole column is passed
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+# 'exact' selects the median from all values, 'approximate' estimates it with a QuantileSketch in bounded memory
+MEDIAN_STRATEGIES = ("exact", "approximate")
+
+# The moments are merged chunk by chunk instead of summed in one go like pandas does. Results agree with
+# pandas.Series.mean/median/skew/kurtosis/autocorr/var up to this relative tolerance. For ill-conditioned data
+# (mean about 1e6 standard deviations away from zero) the difference grows to about 1e-8, mostly due to the
+# rounding of pandas' plain summation
+PANDAS_RELATIVE_TOLERANCE = 1e-9
+
+
+class QuantileSketch:
+    """
+    KLL-style streaming quantile sketch. Values are stored in levels of compactors, an item on level h represents
+    2**h values of the input. A full level is sorted and every other item is promoted to the next level.
+    The normalized rank error is about 3.3 / k (99% confidence). A fixed seed keeps results reproducible
+    """
+
+    def __init__(self, k=200, seed=0):
+        """
+        :param k: Capacity of the highest level. Larger values need more memory and give smaller errors
+        :param seed: Seed for choosing which half of a level is promoted
+        """
+        self.k = k
+        self.count = 0
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level):
+        """
+        :param level: Index of the level
+        :return: Number of items the level may hold. Lower levels get geometrically smaller capacities
+        """
+        depth = len(self.levels) - level - 1
+        return max(int(math.ceil(self.k * (2 / 3) ** depth)), 2)
+
+    def _compress(self):
+        """Compacts every level that exceeds its capacity, from the lowest level upwards"""
+        level = 0
+        while level < len(self.levels):
+            if len(self.levels[level]) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(self.levels[level])
+                keep = items[len(items) - len(items) % 2:]
+                items = items[:len(items) - len(items) % 2]
+                promoted = items[self._rng.integers(2)::2]
+                self.levels[level + 1] = np.concatenate((self.levels[level + 1], promoted))
+                self.levels[level] = keep
+            level += 1
+
+    def update(self, values):
+        """
+        Adds values to the sketch
+        :param values: NumPy array without NaN values
+        """
+        if len(values) == 0:
+            return
+        self.levels[0] = np.concatenate((self.levels[0], np.asarray(values, dtype=np.float64)))
+        self.count += len(values)
+        self._compress()
+
+    def merge(self, other):
+        """
+        Adds the content of another sketch to this one
+        :param other: QuantileSketch
+        """
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level in range(len(other.levels)):
+            self.levels[level] = np.concatenate((self.levels[level], other.levels[level]))
+        self.count += other.count
+        self._compress()
+
+    def state(self):
+        """
+        :return: Content of the sketch as dictionary that can be stored as JSON, the levels as base64 encoded
+        little-endian doubles so they are kept exactly
+        """
+        return {"k": self.k, "count": self.count,
+                "levels": [base64.b64encode(level.astype('<f8').tobytes()).decode('ascii') for level in self.levels]}
+
+    @classmethod
+    def from_state(cls, state):
+        """
+        :param state: Dictionary returned by state
+        :return: QuantileSketch with the same content. The seed depends on the count, so sketches that are
+        restored and updated repeatedly don't promote the same halves every time
+        """
+        sketch = cls(int(state["k"]), seed=int(state["count"]))
+        sketch.count = int(state["count"])
+        sketch.levels = [np.frombuffer(base64.b64decode(level), dtype='<f8').astype(np.float64)
+                         for level in state["levels"]]
+        return sketch
+
+    def quantile(self, q):
+        """
+        :param q: Quantile between 0 and 1
+        :return: Approximate value of the quantile or NaN if the sketch is empty
+        """
+        if self.count == 0:
+            return math.nan
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(self.levels[level]), 2 ** level, dtype=np.int64)
+                                  for level in range(len(self.levels))])
+        order = np.argsort(items, kind='stable')
+        cumulative = np.cumsum(weights[order])
+        position = np.searchsorted(cumulative, q * cumulative[-1], side='left')
+        return float(items[order][min(position, len(items) - 1)])
+
+
+def sketch_size(error):
+    """
+    :param error: Normalized rank error the median may have, for example 0.01 for the 49th to 51st percentile
+    :return: Parameter k of a QuantileSketch that keeps the error with 99% confidence
+    """
+    return max(int(math.ceil(3.3 / error)), 2)
+
+
+class RunningStatistics:
+    """
+    Computes mean, variance, skewness, kurtosis, lag-1 autocorrelation and median of a column in a single pass
+    over chunks of the column. Each chunk is reduced to its central moments which are merged into the running
+    moments with the pairwise update formulas by Chan, Terriberry and Pebay. The autocorrelation uses the same
+    scheme for the co-moment of neighbouring values. NaN values are skipped like pandas does
+    """
+
+    def __init__(self, median='exact', sketch_size=200, capacity=None):
+        """
+        :param median: 'exact' keeps the values to select the median, 'approximate' uses a QuantileSketch
+        :param sketch_size: Parameter k of the QuantileSketch
+        :param capacity: Number of values of the column if known. The exact median then collects the values in a
+        single buffer and selects the median in place instead of concatenating copies of the chunks
+        """
+        if median not in MEDIAN_STRATEGIES:
+            raise ValueError("Median strategy must be 'exact' or 'approximate'")
+        self.median_strategy = median
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.m3 = 0.0
+        self.m4 = 0.0
+        self.max_abs = 0.0
+        # Co-moments of the pairs (x[i], x[i + 1])
+        self.pair_count = 0
+        self.pair_mean_a = 0.0
+        self.pair_mean_b = 0.0
+        self.pair_m2_a = 0.0
+        self.pair_m2_b = 0.0
+        self.pair_c = 0.0
+        self.last_value = math.nan
+        # Number of values collected for the exact median, restored statistics start without values
+        self._median_count = 0
+        self._median_values = []
+        self._median_buffer = np.empty(capacity) if capacity is not None and median == 'exact' else None
+        self.sketch = QuantileSketch(sketch_size) if median == 'approximate' else None
+
+    def update(self, chunk):
+        """
+        Adds the next chunk of the column
+        :param chunk: Sequence or NumPy array with numbers
+        """
+        chunk = as_float_array(chunk)
+        if len(chunk) == 0:
+            return
+        with_previous = np.concatenate(([self.last_value], chunk))
+        self.last_value = float(chunk[-1])
+        values = chunk[~np.isnan(chunk)]
+        if len(values) > 0:
+            self._add_moments(values)
+            self._add_median_values(values)
+        first, second = with_previous[:-1], with_previous[1:]
+        valid = ~(np.isnan(first) | np.isnan(second))
+        if valid.any():
+            self._add_pairs(first[valid], second[valid])
+
+    def _add_median_values(self, values):
+        """
+        :param values: NumPy array without NaN values
+        """
+        if self._median_buffer is not None:
+            self._median_buffer[self._median_count:self._median_count + len(values)] = values
+        elif self.sketch is None:
+            self._median_values.append(values)
+        else:
+            self.sketch.update(values)
+        self._median_count += len(values)
+
+    def add_median_values(self, chunk):
+        """
+        Passes values of the column to the exact median of restored statistics without changing the moments.
+        An exact median needs all values, so the values counted in the restored state are passed again
+        :param chunk: Sequence or NumPy array with numbers
+        """
+        if self.sketch is not None:
+            raise ValueError("Approximate medians are restored with their sketch")
+        chunk = as_float_array(chunk)
+        self._add_median_values(chunk[~np.isnan(chunk)])
+
+    def _add_moments(self, values):
+        """
+        Merges the central moments of values into the running moments
+        :param values: NumPy array without NaN values
+        """
+        n_b = len(values)
+        mean_b = float(values.mean())
+        deviation = values - mean_b
+        deviation2 = deviation * deviation
+        m2_b = float(deviation2.sum())
+        m3_b = float((deviation2 * deviation).sum())
+        m4_b = float((deviation2 * deviation2).sum())
+        self.max_abs = max(self.max_abs, float(np.abs(values).max()))
+        n_a = self.count
+        n = n_a + n_b
+        delta = mean_b - self.mean
+        m2_a, m3_a = self.m2, self.m3
+        self.m4 += (m4_b + delta ** 4 * n_a * n_b * (n_a * n_a - n_a * n_b + n_b * n_b) / n ** 3 +
+                    6 * delta ** 2 * (n_a * n_a * m2_b + n_b * n_b * m2_a) / n ** 2 +
+                    4 * delta * (n_a * m3_b - n_b * m3_a) / n)
+        self.m3 += (m3_b + delta ** 3 * n_a * n_b * (n_a - n_b) / n ** 2 +
+                    3 * delta * (n_a * m2_b - n_b * m2_a) / n)
+        self.m2 += m2_b + delta ** 2 * n_a * n_b / n
+        self.mean += delta * n_b / n
+        self.count = n
+
+    def _add_pairs(self, first, second):
+        """
+        Merges the co-moment of neighbouring values into the running co-moment
+        :param first: Values x[i]
+        :param second: Values x[i + 1]
+        """
+        n_b = len(first)
+        mean_a_b = float(first.mean())
+        mean_b_b = float(second.mean())
+        deviation_a = first - mean_a_b
+        deviation_b = second - mean_b_b
+        n_a = self.pair_count
+        n = n_a + n_b
+        delta_a = mean_a_b - self.pair_mean_a
+        delta_b = mean_b_b - self.pair_mean_b
+        self.pair_m2_a += float((deviation_a * deviation_a).sum()) + delta_a ** 2 * n_a * n_b / n
+        self.pair_m2_b += float((deviation_b * deviation_b).sum()) + delta_b ** 2 * n_a * n_b / n
+        self.pair_c += float((deviation_a * deviation_b).sum()) + delta_a * delta_b * n_a * n_b / n
+        self.pair_mean_a += delta_a * n_b / n
+        self.pair_mean_b += delta_b * n_b / n
+        self.pair_count = n
+
+    def median(self):
+        """
+        :return: Exact median (mean of the two middle values for an even count) or the estimate of the sketch
+        """
+        if self.sketch is not None:
+            return self.sketch.quantile(0.5)
+        if self.count == 0:
+            return math.nan
+        if self._median_count != self.count:
+            raise ValueError("The exact median needs all values of the column")
+        if self._median_buffer is not None:
+            values = self._median_buffer[:self.count]
+        else:
+            values = np.concatenate(self._median_values) if len(self._median_values) > 1 else self._median_values[0]
+        middle = self.count // 2
+        if self.count % 2:
+            values.partition(middle)
+            return float(values[middle])
+        values.partition((middle - 1, middle))
+        return float((values[middle - 1] + values[middle]) / 2)
+
+    def state(self):
+        """
+        :return: Sufficient statistics as dictionary that can be stored as JSON: the moments, the co-moments of
+        neighbouring values, the last value and the sketch of an approximate median. The values an exact median
+        is selected from are not part of it
+        """
+        return {"median strategy": self.median_strategy, "count": self.count, "mean": self.mean, "m2": self.m2,
+                "m3": self.m3, "m4": self.m4, "max abs": self.max_abs, "pair count": self.pair_count,
+                "pair mean a": self.pair_mean_a, "pair mean b": self.pair_mean_b, "pair m2 a": self.pair_m2_a,
+                "pair m2 b": self.pair_m2_b, "pair c": self.pair_c, "last value": self.last_value,
+                "sketch": self.sketch.state() if self.sketch is not None else None}
+
+    @classmethod
+    def from_state(cls, state, capacity=None):
+        """
+        Continues statistics from their sufficient statistics, further chunks are added with update
+        :param state: Dictionary returned by state
+        :param capacity: Number of values of the whole column including the restored ones if known, see __init__.
+        An exact median needs these values again, see add_median_values
+        :return: RunningStatistics
+        """
+        statistics = cls(state["median strategy"], capacity=capacity)
+        for name in ("count", "pair count"):
+            setattr(statistics, name.replace(' ', '_'), int(state[name]))
+        for name in ("mean", "m2", "m3", "m4", "max abs", "pair mean a", "pair mean b", "pair m2 a", "pair m2 b",
+                     "pair c", "last value"):
+            setattr(statistics, name.replace(' ', '_'), float(state[name]))
+        if statistics.sketch is not None:
+            statistics.sketch = QuantileSketch.from_state(state["sketch"])
+            statistics._median_count = statistics.count
+        return statistics
+
+    def result(self):
+        """
+        :return: Dictionary with the statistical characteristics as floats, NaN where pandas returns NaN
+        """
+        n = self.count
+        eps = np.finfo(np.float64).eps
+        # Moments below the floating point error of the summation are treated as zero like pandas does
+        m2 = 0.0 if abs(self.m2) < (eps * self.max_abs) ** 2 * n else self.m2
+        m3 = 0.0 if abs(self.m3) < (eps * self.max_abs) ** 3 * n else self.m3
+        m4 = 0.0 if abs(self.m4) < (eps * self.max_abs) ** 4 * n else self.m4
+        statistics = dict.fromkeys(STATISTIC_NAMES, math.nan)
+        if n > 0:
+            statistics["mean"] = self.mean
+            statistics["median"] = self.median()
+        if n > 1:
+            statistics["variance"] = self.m2 / (n - 1)
+        if n > 2:
+            statistics["skewness"] = 0.0 if m2 == 0 else n * (n - 1) ** 0.5 / (n - 2) * (m3 / m2 ** 1.5)
+        if n > 3:
+            denominator = (n - 2) * (n - 3) * m2 ** 2
+            statistics["kurtosis"] = 0.0 if denominator == 0 else \
+                (n * (n + 1) * (n - 1) * m4 / denominator - 3 * (n - 1) ** 2 / ((n - 2) * (n - 3)))
+        if self.pair_count > 1 and self.pair_m2_a > 0 and self.pair_m2_b > 0:
+            statistics["autocorrelation"] = self.pair_c / math.sqrt(self.pair_m2_a * self.pair_m2_b)
+        return statistics
+
+
+def as_float_array(column):
+    """
+    :param column: Sequence or NumPy array with numbers
+    :return: Column as float64 NumPy array
+    """
+    values = np.asarray(column)
+    if values.dtype.kind not in 'biuf':
+        raise TypeError("Tracedata column does not contain numbers")
+    return values.astype(np.float64, copy=False)
+
+
+def column_statistics(column, median='exact', chunk_size=DEFAULT_CHUNK_SIZE, sketch_size=200, state=False):
+    """
+    Computes the statistical characteristics of a whole column
+    :param column: Sequence or NumPy array with numbers
+    :param median: Median strategy, see RunningStatistics
+    :param chunk_size: Number of values processed at once
+    :param sketch_size: Parameter k of the QuantileSketch of the approximate median
+    :param state: If True the sufficient statistics are returned as well, under the key "state"
+    :return: Dictionary with the statistical characteristics as floats
+    """
+    statistics = RunningStatistics(median, sketch_size, len(column))
+    for start in range(0, len(column), chunk_size):
+        statistics.update(column[start:start + chunk_size])
+    result = statistics.result()
+    if state:
+        result["state"] = statistics.state()
+    return result
+
+
+def median_rank_error(column, value, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Measures how far a value is from being the median of a column, used to check approximate medians
+    :param column: Sequence or NumPy array with numbers, NaN values are skipped
+    :param value: Median to check
+    :param chunk_size: Number of values processed at once
+    :return: Distance between the ranks the value takes in the column and the rank of the median, as fraction of
+    the number of values. 0 if the value is a median, NaN if the column has no values
+    """
+    count = below = at_most = 0
+    for start in range(0, len(column), chunk_size):
+        chunk = as_float_array(column[start:start + chunk_size])
+        chunk = chunk[~np.isnan(chunk)]
+        count += len(chunk)
+        below += int(np.count_nonzero(chunk < value))
+        at_most += int(np.count_nonzero(chunk <= value))
+    return _rank_error(count, below, at_most)
+
+
+def _rank_error(count, below, at_most):
+    """
+    :param count: Number of values without NaN
+    :param below: Number of values smaller than the checked value
+    :param at_most: Number of values smaller than or equal to the checked value
+    :return: Rank error, see median_rank_error
+    """
+    if count == 0:
+        return math.nan
+    middle = count / 2
+    if below <= middle <= at_most:
+        return 0.0
+    return min(abs(below - middle), abs(at_most - middle)) / count
+
+
+class StreamedColumnStatistics:
+    """
+    Statistics of a column whose values arrive in pieces of any size, for example while a file is read. The pieces
+    are regrouped into the chunks column_statistics uses, so the results are identical to computing the whole
+    column at once. Optionally the rank error of a stored median is measured in the same pass
+    """
+
+    def __init__(self, median='exact', sketch_size=200, capacity=None, checked_median=None,
+                 chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        :param median: Median strategy, see RunningStatistics
+        :param sketch_size: Parameter k of the QuantileSketch of the approximate median
+        :param capacity: Number of values of the column if known, see RunningStatistics
+        :param checked_median: Median whose rank error is measured, see median_rank_error
+        :param chunk_size: Number of values passed to RunningStatistics at once
+        """
+        self.statistics = RunningStatistics(median, sketch_size, capacity)
+        self.checked_median = checked_median
+        self.chunk_size = chunk_size
+        self._pending = []
+        self._pending_count = 0
+        self._count = self._below = self._at_most = 0
+
+    def extend(self, values):
+        """
+        Adds the next values of the column
+        :param values: NumPy array with numbers
+        """
+        self._pending.append(values)
+        self._pending_count += len(values)
+        if self._pending_count >= self.chunk_size:
+            self._flush(False)
+
+    def _flush(self, final):
+        """
+        Passes the complete chunks of the pending values on
+        :param final: If True the remaining values are passed on as last chunk
+        """
+        values = np.concatenate(self._pending) if len(self._pending) > 1 else self._pending[0]
+        complete = len(values) if final else len(values) - len(values) % self.chunk_size
+        for start in range(0, complete, self.chunk_size):
+            chunk = as_float_array(values[start:start + self.chunk_size])
+            self.statistics.update(chunk)
+            if self.checked_median is not None:
+                chunk = chunk[~np.isnan(chunk)]
+                self._count += len(chunk)
+                self._below += int(np.count_nonzero(chunk < self.checked_median))
+                self._at_most += int(np.count_nonzero(chunk <= self.checked_median))
+        self._pending = [values[complete:]] if complete < len(values) else []
+        self._pending_count = len(values) - complete
+
+    def result(self):
+        """
+        Finishes the column
+        :return: Dictionary with the statistical characteristics as floats and the sufficient statistics under the
+        key "state", see column_statistics. With a checked median also its rank error under "median rank error"
+        """
+        if self._pending:
+            self._flush(True)
+        result = self.statistics.result()
+        result["state"] = self.statistics.state()
+        if self.checked_median is not None:
+            result["median rank error"] = _rank_error(self._count, self._below, self._at_most)
+        return result
+
+
+def _shared_column_statistics(name, dtype, length, median, sketch_size, state):
+    """
+    Computes the statistics of a column in a shared memory block, runs in a worker process
+    :param name: Name of the shared memory block
+    :param dtype: dtype string of the column
+    :param length: Number of values
+    :param median: Median strategy, see RunningStatistics
+    :param sketch_size: Parameter k of the QuantileSketch of the approximate median
+    :param state: If True the sufficient statistics are returned as well, see column_statistics
+    :return: Dictionary with the statistical characteristics as floats
+    """
+    memory = shared_memory.SharedMemory(name=name)
+    try:
+        column = np.ndarray(length, dtype=np.dtype(dtype), buffer=memory.buf)
+        statistics = column_statistics(column, median, sketch_size=sketch_size, state=state)
+        # The block can only be closed once no array uses it
+        del column
+        return statistics
+    finally:
+        memory.close()
+
+
+def columns_statistics(columns, workers=1, median='exact', on_column=None, sketch_size=200, state=False):
+    """
+    Computes the statistical characteristics of several columns. With more than one worker the columns are copied
+    into shared memory blocks once and computed in a process pool, the workers read the blocks without pickling
+    the values. Every column is computed exactly like column_statistics does, so the results don't depend on the
+    number of workers
+    :param columns: List of sequences or NumPy arrays with numbers
+    :param workers: Number of worker processes, 1 computes the columns one after another in this process
+    :param median: Median strategy, see RunningStatistics
+    :param on_column: Called with the index of each finished column, in the order the columns finish
+    :param sketch_size: Parameter k of the QuantileSketch of the approximate median
+    :param state: If True the sufficient statistics are returned as well, see column_statistics
+    :return: List with one dictionary of statistical characteristics per column
+    """
+    arrays = [np.asarray(column) for column in columns]
+    for values in arrays:
+        if values.dtype.kind not in 'biuf':
+            raise TypeError("Tracedata column does not contain numbers")
+    results = [None] * len(arrays)
+    if workers <= 1 or len(arrays) < 2:
+        for i in range(len(arrays)):
+            results[i] = column_statistics(arrays[i], median, sketch_size=sketch_size, state=state)
+            if on_column is not None:
+                on_column(i)
+        return results
+    blocks = []
+    try:
+        for values in arrays:
+            blocks.append(shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1)))
+            np.ndarray(len(values), dtype=values.dtype, buffer=blocks[-1].buf)[:] = values
+        # Worker processes are spawned, forking the GUI or the job threads is not safe
+        executor = concurrent.futures.ProcessPoolExecutor(min(workers, len(arrays)),
+                                                          mp_context=multiprocessing.get_context('spawn'))
+        try:
+            futures = {executor.submit(_shared_column_statistics, blocks[i].name, arrays[i].dtype.str,
+                                       len(arrays[i]), median, sketch_size, state): i for i in range(len(arrays))}
+            for future in concurrent.futures.as_completed(futures):
+                results[futures[future]] = future.result()
+                if on_column is not None:
+                    on_column(futures[future])
+        finally:
+            # Columns that are already computed finish in the background if a callback raised
+            executor.shutdown(wait=False, cancel_futures=True)
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+    return results
@@ -0,0 +1,221 @@
+"""
+    This file is part of TraceConversionTool.
+    Copyright (c) 2022 Dennis Ziebart
+
+    TraceConversionTool is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    TraceConversionTool is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with TraceConversionTool.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import argparse
+import calendar
+import datetime
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import trace_conversion_tool_model as model
+
+# Compares model.column_to_epoch with converting each cell on its own, the way df_columns_to_epoch did before it
+# converted whole columns. check_equivalence asserts that both give the same unix timestamps for every kind of
+# format in local time and in UTC, benchmark times both on a large frame:
+#
+#     python trace_conversion_tool_timestamp_benchmark.py --rows 2000000
+#
+# Naive timestamps in the hour repeated at the end of daylight saving time are left out: time.mktime resolves them
+# depending on its previous calls, column_to_epoch always takes the offset before the change
+
+# Time zone the comparison runs in, it has daylight saving time so the offset changes are covered
+TIME_ZONE = 'Europe/Berlin'
+
+# Formats compared by check_equivalence, with the format the values are written in
+FORMATS = {
+    "naive": ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M:%S'),
+    "offset": ('%Y-%m-%d %H:%M:%S%z', '%Y-%m-%d %H:%M:%S%z'),
+    "iso8601": ('ISO8601', '%Y-%m-%dT%H:%M:%S.%f'),
+    "epoch": ('%s', None),
+}
+
+
+def use_time_zone(time_zone):
+    """
+    Sets the local time zone of the process
+    :param time_zone: Name of the time zone, None for the one of the system
+    :return: Previous value of the TZ environment variable
+    """
+    previous = os.environ.get('TZ')
+    if time_zone is None:
+        os.environ.pop('TZ', None)
+    else:
+        os.environ['TZ'] = time_zone
+    time.tzset()
+    return previous
+
+
+def _ambiguous(moment):
+    """
+    :param moment: Naive datetime
+    :return: True if the local time zone skips or repeats the moment
+    """
+    return moment.replace(fold=0).timestamp() != moment.replace(fold=1).timestamp()
+
+
+def timestamp_column(rows, kind, seed=0):
+    """
+    Generates timestamps spread over three years
+    :param rows: Number of timestamps
+    :param kind: Key of FORMATS
+    :param seed: Seed of the random timestamps
+    :return: Series with the timestamps as strings, every tenth value is missing
+    """
+    rng = np.random.default_rng(seed)
+    start = calendar.timegm((2020, 1, 1, 0, 0, 0))
+    seconds = rng.integers(start, start + 3 * 365 * 86400, rows)
+    if kind == "epoch":
+        texts = seconds.astype(str).astype(object)
+    else:
+        # Few distinct days and many distinct times, like real traces
+        values = pd.to_datetime(seconds, unit='s')
+        if kind == "iso8601":
+            values = values + pd.to_timedelta(rng.integers(0, 10 ** 6, rows), unit='us')
+        texts = values.strftime(FORMATS[kind][1]).to_numpy(dtype=object)
+        if kind == "offset":
+            offsets = rng.choice(['+0000', '+0100', '+0200', '-0530'], rows)
+            texts = np.array([text + offset for text, offset in zip(texts, offsets)], dtype=object)
+        else:
+            unique = pd.unique(values.floor('s'))
+            skipped = {moment for moment in unique if _ambiguous(moment.to_pydatetime())}
+            texts[[moment in skipped for moment in values.floor('s')]] = None
+    texts[::10] = None
+    return pd.Series(texts, dtype=object)
+
+
+def per_cell_epoch(value, time_format, utc):
+    """
+    Converts one timestamp the way the model did cell by cell, the reference for column_to_epoch
+    :param value: Timestamp as string
+    :param time_format: Format of the timestamp, see model.timestamp_format_kind
+    :param utc: If True naive timestamps are UTC, otherwise local time
+    :return: Unix timestamp
+    """
+    kind = model.timestamp_format_kind(time_format)
+    if kind == 'epoch':
+        return float(value)
+    if kind == 'iso8601':
+        moment = datetime.datetime.fromisoformat(value)
+    else:
+        moment = datetime.datetime.strptime(value, time_format)
+    if not utc:
+        return time.mktime(moment.timetuple())
+    return float(calendar.timegm(moment.utctimetuple()))
+
+
+def per_cell_column(column, time_format, utc=False):
+    """
+    :param column: Series with timestamps
+    :param time_format: Format of the timestamps
+    :param utc: If True naive timestamps are UTC, otherwise local time
+    :return: List with the unix timestamp of each cell, NaN for missing values
+    """
+    return [np.nan if pd.isnull(value) else per_cell_epoch(value, time_format, utc) for value in column]
+
+
+def per_cell_dataframe(dataframe, columns, date_time_format):
+    """
+    The cell by cell loop of df_columns_to_epoch before it converted whole columns
+    :param dataframe: The dataframe, converted in place
+    :param columns: List with column indexes
+    :param date_time_format: List with timestamp formats
+    :return: Transformed dataframe
+    """
+    for i in range(len(columns)):
+        for j in range(len(dataframe.index)):
+            if not pd.isnull(dataframe.at[j, dataframe.columns[columns[i]]]):
+                dataframe.at[j, dataframe.columns[columns[i]]] = \
+                    model.date_time_to_epoch(dataframe.at[j, dataframe.columns[columns[i]]], date_time_format[i])
+    return dataframe
+
+
+def check_equivalence(rows=20000, seed=0):
+    """
+    Asserts that column_to_epoch gives the same unix timestamps as the per cell conversion for every format of
+    FORMATS, in local time and in UTC. Runs in TIME_ZONE
+    :param rows: Number of timestamps per format
+    :param seed: Seed of the random timestamps
+    :return: Number of compared timestamps
+    """
+    previous = use_time_zone(TIME_ZONE)
+    compared = 0
+    try:
+        for kind in FORMATS:
+            time_format = FORMATS[kind][0]
+            column = timestamp_column(rows, kind, seed)
+            for utc in (False, True):
+                expected = np.array(per_cell_column(column, time_format, utc), dtype=float)
+                computed = model.column_to_epoch(column, time_format, utc).to_numpy(dtype=float)
+                np.testing.assert_array_equal(computed, expected, err_msg=kind + (" UTC" if utc else " local"))
+                compared += int(np.count_nonzero(~np.isnan(expected)))
+    finally:
+        use_time_zone(previous)
+    return compared
+
+
+def benchmark(rows, per_cell_rows=None, seed=0):
+    """
+    Times df_columns_to_epoch against the per cell loop on a frame with one naive timestamp column in TIME_ZONE
+    :param rows: Number of rows
+    :param per_cell_rows: Number of rows the per cell loop converts, its time is scaled to all rows. All rows if
+    None
+    :param seed: Seed of the random timestamps
+    :return: Dictionary with the seconds of both and the speedup
+    """
+    time_format = FORMATS["naive"][0]
+    column = timestamp_column(rows, "naive", seed)
+    previous = use_time_zone(TIME_ZONE)
+    try:
+        frame = pd.DataFrame({"time": column, "value": np.arange(rows)})
+        start = time.perf_counter()
+        model.df_columns_to_epoch(frame, [0], [time_format])
+        column_seconds = time.perf_counter() - start
+        per_cell_rows = rows if per_cell_rows is None else min(per_cell_rows, rows)
+        frame = pd.DataFrame({"time": column[:per_cell_rows], "value": np.arange(per_cell_rows)})
+        start = time.perf_counter()
+        per_cell_dataframe(frame, [0], [time_format])
+        per_cell_seconds = (time.perf_counter() - start) * rows / per_cell_rows
+    finally:
+        use_time_zone(previous)
+    return {"rows": rows, "per cell seconds": per_cell_seconds, "column seconds": column_seconds,
+            "speedup": per_cell_seconds / column_seconds}
+
+
+def main(arguments=None):
+    """
+    Checks the equivalence and prints the benchmark results
+    :param arguments: Command line arguments without the program name, sys.argv is used if None
+    """
+    parser = argparse.ArgumentParser(description="Compare column_to_epoch with the per cell conversion")
+    parser.add_argument("--rows", type=int, default=2000000, help="rows of the benchmark frame")
+    parser.add_argument("--per-cell-rows", type=int,
+                        help="rows converted by the per cell loop, its time is scaled to all rows (default: all)")
+    parser.add_argument("--check-rows", type=int, default=20000, help="timestamps per format of the equivalence check")
+    arguments = parser.parse_args(sys.argv[1:] if arguments is None else arguments)
+    print("equivalence: " + str(check_equivalence(arguments.check_rows)) + " timestamps identical")
+    result = benchmark(arguments.rows, arguments.per_cell_rows)
+    print(str(result["rows"]) + " rows: per cell " + format(result["per cell seconds"], '.2f') + " s, column " +
+          format(result["column seconds"], '.2f') + " s, " + format(result["speedup"], '.0f') + "x faster")
+
+
+if __name__ == "__main__":
+    main()